@@ -2,6 +2,14 @@ import streamlit as st
 import pandas as pd
 from modules import data_viewer, plotting
 from modules import importer 
+from modules.history_utils import ProcessingHistory
+from modules import memory_utils
+
+# Copy-on-write: i passi della cronologia (rinomina, elimina, nuova colonna) condividono le
+# colonne invece di copiarle. Con pandas 2.x va attivato qui, una volta per tutta l'app;
+# da pandas 3 è sempre attivo e l'opzione è deprecata.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
 
 # --- 1. Configurazione Pagina ---
 st.set_page_config(
@@ -14,24 +22,55 @@ st.set_page_config(
 st.title("DataPlotter 🔬")
 st.write("Carica i tuoi dati e visualizzali in 2D e 3D.")
 
+# Se i dati di questa sessione erano stati scaricati su disco (budget di memoria del server)
+# tornano in session_state prima che qualunque modulo li legga
+if memory_utils.restore_current_session():
+    st.toast("Dati della sessione ricaricati dal disco.")
+
 # --- 3. Chiamata al Modulo di Caricamento Flessibile ---
 df_loaded = importer.load_data_flexible() 
 
 # --- 4. GESTIONE DELLO STATO (MODIFICATA) ---
 # Controlliamo se i dati sono stati caricati
 if df_loaded is not None:
-    
+
+    # L'importer calcola un'impronta del dataset (hash dei file + opzioni di parsing):
+    # confrontarla è O(1), invece di confrontare cella per cella due DataFrame a ogni rerun
+    fingerprint = st.session_state.get('import_fingerprint')
+    is_new_dataset = 'original_df' not in st.session_state or st.session_state.get('loaded_fingerprint') != fingerprint
+
+    # Modalità "segui file": sono arrivate solo righe nuove in coda al file.
+    # Le accodiamo senza resettare processamento e annotazioni: la cronologia applica i passi
+    # alle sole righe nuove se sono tutti riga per riga, altrimenti li riesegue da capo.
+    appended = st.session_state.pop('tail_appended', 0)
+    if appended and not is_new_dataset and len(st.session_state.original_df) + appended == len(df_loaded):
+        st.session_state.original_df = df_loaded
+        st.session_state.processed_df = st.session_state.history.rebase(df_loaded, appended)
+
     # Controlla se è un *nuovo* file o il primo caricamento
     # Questo resetta i dati processati solo quando cambi file
-    if 'original_df' not in st.session_state or not st.session_state.original_df.equals(df_loaded):
-        st.session_state.original_df = df_loaded.copy()
-        st.session_state.processed_df = df_loaded.copy()
+    elif is_new_dataset:
+        st.session_state.loaded_fingerprint = fingerprint
+        # Il DataFrame dell'importer non viene mai modificato: i dati processati sono
+        # una cronologia di passi sopra l'originale (colonne condivise, nessuna copia)
+        st.session_state.original_df = df_loaded
+        st.session_state.history = ProcessingHistory(df_loaded)
+        st.session_state.processed_df = st.session_state.history.current
         
+        # Nuovo dataset: il grafico riparte dalla vista predefinita (zoom non conservato)
+        st.session_state.dataset_revision = st.session_state.get('dataset_revision', 0) + 1
+
         # Resetta anche i punti di annotazione quando carichi un nuovo file
         if 'custom_points' in st.session_state:
             st.session_state.custom_points = []
         st.toast("Nuovo file caricato! Dati e annotazioni resettati.")
 
+    # Contabilità della memoria: se il server supera il budget, le sessioni inattive vanno su disco
+    session_bytes = memory_utils.track_current_session()
+    if session_bytes > memory_utils.session_memory.budget_bytes:
+        st.warning(f"Questa sessione occupa {session_bytes / 1024 / 1024:.0f} MB, oltre il budget di memoria "
+                   f"del server ({memory_utils.session_memory.budget_bytes / 1024 / 1024:.0f} MB).")
+
 # --- 5. LAYOUT CON TAB (Ora controlla se lo stato esiste) ---
 if 'processed_df' in st.session_state:
     
@@ -55,7 +94,11 @@ if 'processed_df' in st.session_state:
         
     with tab_settings:
         st.subheader("Opzioni Applicazione")
-        st.info("Questa è la sezione che puoi espandere in futuro per opzioni globali.")
+        importer.show_cache_settings()
 
 else:
-    st.info("Per iniziare, carica un file CSV, Excel, TXT, ASC o RAW usando il pannello di importazione.")
\ No newline at end of file
+    st.info("Per iniziare, carica un file CSV, Excel, TXT, ASC o RAW usando il pannello di importazione.")
+# --- 6. Fine del rerun: la pagina è disegnata e non usa più i dati ---
+# Ripiego del budget di memoria: le sessioni inattive vengono scaricate da enforce; se questa
+# è stata solo segnata (era occupata in quel momento), i suoi dati vanno su disco ora
+memory_utils.release_current_session()
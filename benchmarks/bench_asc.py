@@ -0,0 +1,63 @@
+"""
+Micro-benchmark del lettore ASC: confronta il vecchio percorso
+(decode + split su '#DATA' + StringIO + motore python con regex)
+con parse_utils.read_asc (memoryview + tokenizer vettoriale).
+
+Uso:  python benchmarks/bench_asc.py --files 500 --points 1024
+"""
+import argparse
+import os
+import sys
+import time
+from io import StringIO
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from modules import parse_utils  # noqa: E402
+from synthetic_data import make_asc_bytes  # noqa: E402
+
+
+def legacy_read_asc(raw):
+    """Il percorso originale di importer.load_data_flexible per i file .asc/.raw."""
+    file_content = raw.decode("utf-8")
+    data_block = file_content.split("#DATA", 1)[1].strip()
+    df = pd.read_csv(StringIO(data_block), sep=r'\t+|\s\s+', header=None, engine='python', skipinitialspace=True)
+    df.columns = ['Wavenumber', 'Intensity']
+    return df.dropna(how='all').reset_index(drop=True)
+
+
+def _time(func, payloads, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for raw in payloads:
+            func(raw)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=500, help="Numero di spettri nel batch")
+    parser.add_argument('--points', type=int, default=1024, help="Punti per spettro")
+    parser.add_argument('--repeat', type=int, default=3, help="Ripetizioni (si tiene il tempo migliore)")
+    args = parser.parse_args()
+
+    payloads = [make_asc_bytes(args.points, seed=i) for i in range(args.files)]
+    total_mb = sum(len(p) for p in payloads) / 1e6
+
+    # Verifica che i due percorsi diano gli stessi numeri
+    pd.testing.assert_frame_equal(legacy_read_asc(payloads[0]), parse_utils.read_asc(payloads[0]), check_dtype=False)
+
+    t_legacy = _time(legacy_read_asc, payloads, args.repeat)
+    t_new = _time(parse_utils.read_asc, payloads, args.repeat)
+
+    print(f"Batch: {args.files} file ASC x {args.points} punti ({total_mb:.1f} MB)")
+    print(f"  vecchio percorso (python/regex): {t_legacy:8.3f} s  ({total_mb / t_legacy:7.1f} MB/s)")
+    print(f"  read_asc (memoryview/numpy):     {t_new:8.3f} s  ({total_mb / t_new:7.1f} MB/s)")
+    print(f"  speedup: {t_legacy / t_new:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
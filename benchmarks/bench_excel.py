@@ -0,0 +1,110 @@
+"""
+Benchmark del lettore Excel: confronta il vecchio percorso
+(pd.read_excel con openpyxl, tutto il foglio in memoria) con
+parse_utils.read_excel_fast (calamine se installato, poi openpyxl in sola lettura).
+Con --memory misura anche il picco di memoria Python (tracemalloc, rallenta i tempi).
+
+Uso:  python benchmarks/bench_excel.py --rows 300000 --cols 6
+      python benchmarks/bench_excel.py --file misure.xlsx --sheet Dati --range A1:D --columns Tempo,Canale1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from modules import parse_utils  # noqa: E402
+
+
+def make_workbook(path, n_rows, n_cols, seed=0):
+    """Cartella di lavoro sintetica: colonna tempo + n_cols-1 canali numerici."""
+    import openpyxl
+
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=(n_rows, n_cols - 1)).round(6)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Dati')
+    ws.append(['Tempo'] + [f'Canale{i + 1}' for i in range(n_cols - 1)])
+    for i, row in enumerate(data.tolist()):
+        ws.append([i * 0.001] + row)
+    wb.save(path)
+
+
+def legacy_read_excel(path, sheet, columns):
+    """Il percorso originale di importer.load_data_flexible per i file .xlsx."""
+    df = pd.read_excel(path, sheet_name=sheet or 0, header=0)
+    return df[columns] if columns else df
+
+
+def _measure(func, memory=False):
+    """(tempo in secondi, picco di memoria in MB o None, risultato)."""
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300_000, help="Righe della cartella sintetica")
+    parser.add_argument('--cols', type=int, default=6, help="Colonne della cartella sintetica")
+    parser.add_argument('--file', help="Usa una cartella di lavoro esistente invece di generarla")
+    parser.add_argument('--sheet', default=None, help="Foglio da leggere (default: il primo)")
+    parser.add_argument('--range', default='', help="Intervallo di celle per il lettore veloce (es. A1:D)")
+    parser.add_argument('--columns', default='', help="Colonne da leggere, separate da virgola")
+    parser.add_argument('--memory', action='store_true', help="Misura anche il picco di memoria (tracemalloc)")
+    args = parser.parse_args()
+
+    columns = [c.strip() for c in args.columns.split(',') if c.strip()] or None
+    tmp_dir = None
+    path = args.file
+    if path is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, 'bench.xlsx')
+        print(f"Generazione cartella sintetica: {args.rows} righe x {args.cols} colonne...")
+        make_workbook(path, args.rows, args.cols)
+
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"File: {path} ({size_mb:.1f} MB)")
+
+    results = []
+    t, mem, legacy_df = _measure(lambda: legacy_read_excel(path, args.sheet, columns), args.memory)
+    results.append(("pd.read_excel (openpyxl)", t, mem))
+
+    readers = [('calamine', True)] if parse_utils.HAS_CALAMINE else []
+    readers.append(('openpyxl sola lettura', False))
+    has_calamine = parse_utils.HAS_CALAMINE
+    try:
+        for label, use_calamine in readers:
+            parse_utils.HAS_CALAMINE = use_calamine
+            t, mem, (fast_df, _) = _measure(lambda: parse_utils.read_excel_fast(
+                path, sheet=args.sheet, cell_range=args.range, columns=columns), args.memory)
+            results.append((f"read_excel_fast ({label})", t, mem))
+            if not args.range:
+                # Verifica che i due percorsi diano gli stessi numeri
+                pd.testing.assert_frame_equal(legacy_df.reset_index(drop=True), fast_df, check_dtype=False)
+    finally:
+        parse_utils.HAS_CALAMINE = has_calamine
+
+    base = results[0][1]
+    for label, t, mem in results:
+        mem_label = f"  picco {mem:8.1f} MB" if mem is not None else ""
+        print(f"  {label:40s} {t:8.2f} s{mem_label}  speedup {base / t:5.1f}x")
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
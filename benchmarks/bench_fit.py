@@ -0,0 +1,78 @@
+"""
+Benchmark del fit multi-picco su una serie di spettri: ogni spettro con la stima iniziale
+(cold start), con warm start dai parametri dello spettro precedente, con warm start a blocchi
+in un pool di processi e infine il rerun servito dalla cache.
+
+Uso:  python benchmarks/bench_fit.py --spectra 300 --points 2000 --peaks 3 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from modules import fit_utils  # noqa: E402
+
+
+def make_spectra(n_spectra, n_points, n_peaks, noise=0.02, seed=0):
+    """Serie sintetica: lorentziane che si spostano e crescono lentamente su una linea di base lineare."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 100, n_points)
+    centers = np.linspace(15, 85, n_peaks)
+    drift = np.linspace(0, 5, n_spectra)[:, None]
+    growth = np.linspace(1, 1.5, n_spectra)[:, None]
+    values = 0.5 + 0.01 * x + np.zeros((n_spectra, 1))
+    for k, center in enumerate(centers):
+        width = 3 + 2 * k % 5
+        values += (3 + k) * growth / (1 + 4 * ((x - center - drift) / width) ** 2)
+    return x, values + rng.normal(scale=noise, size=values.shape)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spectra', type=int, default=300, help="Numero di spettri")
+    parser.add_argument('--points', type=int, default=2000, help="Punti per spettro")
+    parser.add_argument('--peaks', type=int, default=3, help="Picchi del modello")
+    parser.add_argument('--workers', type=int, default=fit_utils.DEFAULT_WORKERS, help="Processi del pool")
+    args = parser.parse_args()
+
+    x, values = make_spectra(args.spectra, args.points, args.peaks)
+    print(f"{args.spectra} spettri x {args.points} punti, {args.peaks} lorentziane + linea di base lineare")
+
+    def fit(**options):
+        return fit_utils.fit_series(x, values, 'lorentzian', args.peaks, 1, **options)
+
+    # Avvio dei processi escluso dalle misure (nell'app il pool condiviso resta vivo tra i rerun)
+    if args.workers > 1:
+        fit_utils.fit_series(x, values[:2 * args.workers], 'lorentzian', args.peaks, 1,
+                             max_workers=args.workers, use_cache=False, min_parallel_curves=0)
+
+    runs = [
+        ("Cold start, un processo", dict(warm_start=False, use_cache=False)),
+        ("Warm start, un processo", dict(use_cache=False)),
+        (f"Warm start, {args.workers} processi", dict(max_workers=args.workers, use_cache=False, min_parallel_curves=0)),
+    ]
+    baseline = None
+    for label, options in runs:
+        t, (_, results) = timed(lambda: fit(**options))
+        baseline = baseline or t
+        iterations = sum(r['iterations'] for r in results)
+        worst = min(r['r2'] for r in results)
+        print(f"  {label:32s} {t:8.3f} s  iterazioni {iterations:6d}  R² minimo {worst:.5f}  "
+              f"speedup {baseline / t:5.1f}x")
+
+    fit()
+    t_cached, _ = timed(fit)
+    print(f"  {'Rerun dalla cache':32s} {t_cached:8.3f} s  speedup {baseline / t_cached:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
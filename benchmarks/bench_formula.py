@@ -0,0 +1,90 @@
+"""
+Benchmark della calcolatrice: confronta il vecchio percorso
+(DataFrame.eval con engine='python', una formula alla volta, nuova colonna a ogni passo)
+con formula_engine (formula compilata una volta, NumPy o numexpr, blocco in un passaggio).
+
+Uso:  python benchmarks/bench_formula.py --rows 5000000
+      python benchmarks/bench_formula.py --formula "y = sqrt(a**2 + b**2) * sin(c)"
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from modules import formula_engine  # noqa: E402
+
+DEFAULT_BLOCK = [
+    "r = sqrt(a**2 + b**2)",
+    "fase = arctan2(b, a)",
+    "y = r * sin(c) + log1p(abs(fase))",
+    "mask = (y > 0) & (c < 50)",
+]
+
+
+def make_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'a': rng.normal(size=n_rows),
+        'b': rng.normal(size=n_rows),
+        'c': rng.uniform(0, 100, size=n_rows),
+    })
+
+
+def legacy_block(df, formulas):
+    """Il percorso originale: un df.eval(..., inplace=True, engine='python') per formula."""
+    df = df.copy()
+    for line in formulas:
+        df.eval(line, inplace=True, engine='python')
+    return df
+
+
+def engine_block(df, formulas):
+    return df.assign(**formula_engine.evaluate_formulas(df, formulas))
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_000_000, help="Righe del DataFrame sintetico")
+    parser.add_argument('--formula', action='append', help="Formula 'nome = espressione' (ripetibile)")
+    parser.add_argument('--repeat', type=int, default=3, help="Ripetizioni (si tiene il tempo migliore)")
+    args = parser.parse_args()
+
+    lines = args.formula or DEFAULT_BLOCK
+    formulas = [formula_engine.split_assignment(line) for line in lines]
+    df = make_frame(args.rows)
+    print(f"{args.rows:,} righe, {len(formulas)} formule (numexpr: {'sì' if formula_engine.HAS_NUMEXPR else 'no'})")
+
+    t_legacy, legacy_df = best_time(lambda: legacy_block(df, lines), args.repeat)
+
+    has_numexpr = formula_engine.HAS_NUMEXPR
+    results = [("DataFrame.eval (engine='python')", t_legacy)]
+    try:
+        for label, use_numexpr in [('NumPy', False)] + ([('numexpr', True)] if has_numexpr else []):
+            formula_engine.HAS_NUMEXPR = use_numexpr
+            formula_engine.compile_formula.cache_clear()
+            t, fast_df = best_time(lambda: engine_block(df, formulas), args.repeat)
+            results.append((f"formula_engine ({label})", t))
+            pd.testing.assert_frame_equal(legacy_df, fast_df, check_dtype=False)
+    finally:
+        formula_engine.HAS_NUMEXPR = has_numexpr
+        formula_engine.compile_formula.cache_clear()
+
+    for label, t in results:
+        print(f"  {label:40s} {t:8.3f} s  speedup {t_legacy / t:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
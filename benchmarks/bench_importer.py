@@ -0,0 +1,154 @@
+"""
+Benchmark dell'importer fuori da Streamlit: per ogni formato supportato
+(CSV con vari delimitatori, TXT a spazi, ASC, XLSX) e per ogni dimensione
+genera un file sintetico e misura parsing + pulizia dei nomi colonna
+(parse_utils.parse_file_payload, lo stesso percorso di load_data_flexible).
+
+Registra tempo, throughput (MB/s e righe/s) e picco di memoria Python
+(tracemalloc, in un secondo passaggio) e salva tutto in JSON per confrontare le release.
+
+Uso:  python benchmarks/bench_importer.py --rows 10000,100000,1000000
+      python benchmarks/bench_importer.py --formats csv_virgola,asc --output risultati.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from modules import parse_utils  # noqa: E402
+import synthetic_data  # noqa: E402
+
+FORMATS = list(synthetic_data.TEXT_VARIANTS) + ['asc', 'xlsx']
+DEFAULT_OPTIONS = {'delimiter': '', 'skip_rows': 0, 'header_arg': 'infer'}
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def make_payload(fmt, n_rows, n_cols):
+    """(nome file, bytes) del file sintetico per il formato richiesto."""
+    if fmt == 'asc':
+        return 'bench.asc', synthetic_data.make_asc_bytes(n_rows)
+    if fmt == 'xlsx':
+        return 'bench.xlsx', synthetic_data.make_xlsx_bytes(n_rows, n_cols)
+    extension, delimiter, decimal, header = synthetic_data.TEXT_VARIANTS[fmt]
+    payload = synthetic_data.make_text_bytes(n_rows, n_cols, delimiter, decimal, header)
+    return f'bench.{extension}', payload
+
+
+def run_once(filename, payload):
+    """Parsing + pulizia dei nomi. Restituisce (secondi totali, secondi di pulizia, df, info)."""
+    start = time.perf_counter()
+    df, info = parse_utils.parse_file_payload(filename, payload, DEFAULT_OPTIONS)
+    total = time.perf_counter() - start
+
+    # La pulizia dei nomi è già inclusa sopra: la rimisuriamo da sola su una copia superficiale
+    start = time.perf_counter()
+    parse_utils.clean_column_names(df.copy(deep=False), parse_utils.file_extension(filename), DEFAULT_OPTIONS['header_arg'])
+    cleanup = time.perf_counter() - start
+    return total, cleanup, df, info
+
+
+def peak_memory_mb(filename, payload):
+    """Picco di memoria allocata da Python/NumPy durante un parsing (pyarrow escluso)."""
+    tracemalloc.start()
+    parse_utils.parse_file_payload(filename, payload, DEFAULT_OPTIONS)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def environment():
+    """Versioni e commit: servono per confrontare risultati di release diverse."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'pyarrow': parse_utils.HAS_PYARROW,
+        'calamine': parse_utils.HAS_CALAMINE,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10000,100000,1000000', help="Dimensioni (righe) separate da virgola")
+    parser.add_argument('--cols', type=int, default=4, help="Colonne dei file tabellari (l'ASC ne ha sempre 2)")
+    parser.add_argument('--formats', default=','.join(FORMATS), help=f"Formati da provare: {', '.join(FORMATS)}")
+    parser.add_argument('--xlsx-max-rows', type=int, default=100_000,
+                        help="Dimensione massima per l'XLSX (la generazione con openpyxl è lenta)")
+    parser.add_argument('--repeat', type=int, default=3, help="Ripetizioni (si tiene il tempo migliore)")
+    parser.add_argument('--no-memory', action='store_true', help="Salta la misura del picco di memoria")
+    parser.add_argument('--output', default=None, help="File JSON dei risultati (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.rows.split(',') if s.strip()]
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        parser.error(f"Formati sconosciuti: {', '.join(unknown)}")
+
+    results = []
+    for fmt in formats:
+        for n_rows in sizes:
+            if fmt == 'xlsx' and n_rows > args.xlsx_max_rows:
+                print(f"{fmt:18s} {n_rows:>10,} righe  saltato (--xlsx-max-rows {args.xlsx_max_rows:,})")
+                continue
+            filename, payload = make_payload(fmt, n_rows, args.cols)
+            size_mb = len(payload) / 1e6
+
+            best, best_cleanup = float('inf'), float('inf')
+            for _ in range(args.repeat):
+                total, cleanup, df, info = run_once(filename, payload)
+                best, best_cleanup = min(best, total), min(best_cleanup, cleanup)
+            peak = None if args.no_memory else peak_memory_mb(filename, payload)
+
+            record = {
+                'format': fmt,
+                'rows': n_rows,
+                'columns': df.shape[1],
+                'rows_parsed': len(df),
+                'size_mb': round(size_mb, 3),
+                'seconds': best,
+                'cleanup_seconds': best_cleanup,
+                'mb_per_s': size_mb / best if best > 0 else None,
+                'rows_per_s': len(df) / best if best > 0 else None,
+                'peak_mb': peak,
+                'engine': (info or {}).get('engine', 'numpy' if fmt == 'asc' else None),
+            }
+            results.append(record)
+            peak_label = f"  picco {peak:8.1f} MB" if peak is not None else ""
+            print(f"{fmt:18s} {n_rows:>10,} righe  {size_mb:8.1f} MB  {best:7.3f} s  "
+                  f"{record['mb_per_s']:7.1f} MB/s  pulizia {best_cleanup * 1000:6.2f} ms{peak_label}")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"importer-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'environment': environment(),
+            'repeat': args.repeat,
+            'peak_mb_note': "tracemalloc: allocazioni Python/NumPy, esclusi i buffer interni di pyarrow",
+            'results': results,
+        }, f, indent=2)
+    print(f"Risultati salvati in {output}")
+
+
+if __name__ == '__main__':
+    main()
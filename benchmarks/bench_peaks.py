@@ -0,0 +1,71 @@
+"""
+Benchmark del rilevamento picchi su molti spettri: peak_utils su tutta la matrice in una
+passata, contro la stessa funzione chiamata spettro per spettro e (se installato)
+scipy.signal.find_peaks in un ciclo sugli spettri.
+
+Uso:  python benchmarks/bench_peaks.py --spectra 500 --points 2000 --prominence 0.5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from modules import peak_utils  # noqa: E402
+
+try:
+    from scipy.signal import find_peaks as scipy_find_peaks
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+
+def make_spectra(n_spectra, n_points, n_bands=15, noise=0.05, seed=0):
+    """Spettri sintetici tipo Raman: somma di lorentziane su rumore gaussiano."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(200, 3200, n_points)
+    centers = rng.uniform(300, 3100, (n_spectra, n_bands))
+    amplitudes = rng.uniform(1, 10, (n_spectra, n_bands))
+    values = np.zeros((n_spectra, n_points))
+    for band in range(n_bands):
+        values += amplitudes[:, band, None] / (1 + ((x - centers[:, band, None]) / 8) ** 2)
+    return x, values + rng.normal(scale=noise, size=values.shape)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spectra', type=int, default=500, help="Numero di spettri")
+    parser.add_argument('--points', type=int, default=2000, help="Punti per spettro")
+    parser.add_argument('--prominence', type=float, default=0.5, help="Prominenza minima")
+    args = parser.parse_args()
+
+    x, values = make_spectra(args.spectra, args.points)
+    print(f"{args.spectra} spettri x {args.points} punti, prominenza minima {args.prominence:g}")
+
+    t_batch, batch = timed(lambda: peak_utils.find_peaks(values, x, prominence=args.prominence))
+    t_loop, _ = timed(lambda: [peak_utils.find_peaks(row, x, prominence=args.prominence) for row in values])
+    results = [("peak_utils, spettro per spettro", t_loop)]
+    if HAS_SCIPY:
+        t_scipy, scipy_peaks = timed(lambda: [scipy_find_peaks(row, prominence=args.prominence)[0] for row in values])
+        results.append(("scipy.signal.find_peaks in un ciclo", t_scipy))
+        found = sum(len(p) for p in scipy_peaks)
+        print(f"  Picchi trovati: {len(batch['row'])} (scipy: {found})")
+    else:
+        print(f"  Picchi trovati: {len(batch['row'])} (scipy non installato: confronto saltato)")
+
+    for label, t in results:
+        print(f"  {label:40s} {t:8.3f} s")
+    print(f"  {'peak_utils, matrice intera':40s} {t_batch:8.3f} s  "
+          f"speedup {results[0][1] / t_batch:5.1f}x" + (f" / {results[1][1] / t_batch:5.1f}x su scipy" if HAS_SCIPY else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark del ricampionamento su griglia comune: resample_utils (np.interp, searchsorted,
+bincount) contro il percorso pandas equivalente (reindex sull'unione delle x + interpolate
+per l'interpolazione lineare, groupby su pd.cut per la media per intervallo).
+
+Uso:  python benchmarks/bench_resample.py --rows 5000000 --points 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from modules import resample_utils  # noqa: E402
+
+
+def pandas_linear(x, y, grid):
+    series = pd.Series(y, index=x)
+    series = series[~series.index.duplicated()]
+    union = series.index.union(pd.Index(grid))
+    return series.reindex(union).interpolate(method='index', limit_area='inside').reindex(grid).to_numpy()
+
+
+def pandas_mean(x, y, grid):
+    middle = (grid[1:] + grid[:-1]) / 2
+    edges = np.concatenate(([2 * grid[0] - middle[0]], middle, [2 * grid[-1] - middle[-1]]))
+    cells = pd.cut(x, edges, right=False, labels=False)
+    return pd.Series(y).groupby(cells).mean().reindex(range(len(grid))).to_numpy()
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5_000_000, help="Campioni della curva sintetica")
+    parser.add_argument('--points', type=int, default=1_000_000, help="Punti della griglia")
+    parser.add_argument('--repeat', type=int, default=3, help="Ripetizioni (si tiene il tempo migliore)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    x = np.sort(rng.uniform(0, 100, args.rows))
+    y = np.sin(x) + rng.normal(scale=0.01, size=args.rows)
+    grid = resample_utils.uniform_grid(0, 100, args.points)
+    print(f"{args.rows:,} campioni -> {args.points:,} punti di griglia")
+
+    for label, method, baseline in (("Lineare", 'linear', pandas_linear), ("Media per intervallo", 'mean', pandas_mean)):
+        t_pandas, expected = best_time(lambda: baseline(x, y, grid), args.repeat)
+        t_fast, result = best_time(lambda: resample_utils.resample(x, y, grid, method), args.repeat)
+        np.testing.assert_allclose(result, expected, rtol=1e-9, atol=1e-9)
+        print(f"  {label:22s} pandas {t_pandas:7.3f} s   resample_utils {t_fast:7.3f} s   "
+              f"speedup {t_pandas / t_fast:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
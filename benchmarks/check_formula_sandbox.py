@@ -0,0 +1,126 @@
+"""
+Verifica della sandbox della calcolatrice: le formule che provano a uscire dalle operazioni
+ammesse (accesso ad attributi, indicizzazione, lambda, nomi dunder, builtin) devono essere
+rifiutate con un ValueError, e una colonna con il nome di una funzione resta una colonna.
+Verifica anche che le colonne con alias interno (nomi tra apici inversi, nomi di funzione)
+passino davvero da numexpr sopra NUMEXPR_MIN_ROWS righe, invece di ripiegare su NumPy.
+
+Uso:  python benchmarks/check_formula_sandbox.py
+      python benchmarks/check_formula_sandbox.py --formula "x.__class__"
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from modules import formula_engine  # noqa: E402
+
+# Formule che devono essere rifiutate: (descrizione, espressione)
+REJECTED = [
+    ("attributo", "x.real"),
+    ("attributo dunder", "x.__class__"),
+    ("catena verso i builtin", "x.__class__.__mro__[1].__subclasses__()"),
+    ("indicizzazione", "x[0]"),
+    ("slice", "x[::2]"),
+    ("lambda", "lambda: 1"),
+    ("lambda chiamata", "(lambda: x)()"),
+    ("nome dunder", "__builtins__"),
+    ("nome dunder in una funzione", "sqrt(__class__)"),
+    ("builtin", "__import__('os')"),
+    ("builtin non ammesso", "open('/etc/passwd')"),
+    ("comprensione", "[v for v in x]"),
+    ("assegnazione in espressione", "(y := x)"),
+]
+
+# Colonne con il nome di una funzione: (nome della colonna, espressione, risultato atteso)
+COLUMNS_FIRST = [
+    ('log', "log * 2", lambda df: df['log'].to_numpy() * 2),
+    ('log', "log(log)", lambda df: np.log(df['log'].to_numpy())),
+    ('sqrt', "where(x > 1, sqrt, 0)", lambda df: np.where(df['x'].to_numpy() > 1, df['sqrt'].to_numpy(), 0)),
+]
+
+
+# Formule con colonne che ricevono un alias interno: devono usare numexpr
+NUMEXPR_CASES = [
+    ("nome con spazi", "sqrt(`valore x`) * 2"),
+    ("nome di funzione", "log * 2 + 1"),
+]
+
+
+def make_frame(extra_column=None):
+    df = pd.DataFrame({'x': np.array([1.0, 2.0, 3.0])})
+    if extra_column:
+        df[extra_column] = np.array([4.0, 9.0, 16.0])
+    return df
+
+
+def check_rejected(expression):
+    """Messaggio d'errore se la formula viene rifiutata, None se viene accettata."""
+    try:
+        formula_engine.evaluate_formulas(make_frame(), [('y', expression)])
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def check_numexpr(expression):
+    """True se la formula viene valutata da numexpr (chiamate contate sostituendo numexpr.evaluate)."""
+    n_rows = formula_engine.NUMEXPR_MIN_ROWS
+    df = pd.DataFrame({'valore x': np.linspace(1, 2, n_rows), 'log': np.linspace(1, 2, n_rows)})
+    calls = []
+    evaluate = formula_engine.numexpr.evaluate
+
+    def counting_evaluate(*args, **kwargs):
+        result = evaluate(*args, **kwargs)
+        calls.append(args[0])
+        return result
+
+    formula_engine.numexpr.evaluate = counting_evaluate
+    try:
+        formula_engine.evaluate_formulas(df, [('y', expression)])
+    finally:
+        formula_engine.numexpr.evaluate = evaluate
+    return bool(calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--formula', action='append', help="Formula aggiuntiva da verificare (ripetibile)")
+    args = parser.parse_args()
+
+    cases = REJECTED + [("da riga di comando", f) for f in args.formula or []]
+    failures = 0
+    print("Formule da rifiutare:")
+    for label, expression in cases:
+        error = check_rejected(expression)
+        status = "rifiutata" if error is not None else "ACCETTATA"
+        failures += error is None
+        print(f"  {label:30s} {expression:45s} {status}")
+        if error is not None:
+            print(f"  {'':30s} -> {error[:90]}")
+
+    print("Colonne con il nome di una funzione:")
+    for column, expression, expected in COLUMNS_FIRST:
+        df = make_frame(column)
+        result = formula_engine.evaluate_formulas(df, [('y', expression)])['y']
+        ok = np.allclose(result, expected(df))
+        failures += not ok
+        print(f"  colonna '{column}': {expression:30s} {'ok' if ok else 'ERRATO'}")
+
+    print(f"numexpr con colonne con alias ({formula_engine.NUMEXPR_MIN_ROWS:,} righe):")
+    if not formula_engine.HAS_NUMEXPR:
+        print("  numexpr non installato: verifica saltata")
+    for label, expression in NUMEXPR_CASES if formula_engine.HAS_NUMEXPR else []:
+        used = check_numexpr(expression)
+        failures += not used
+        print(f"  {label:30s} {expression:30s} {'numexpr' if used else 'RIPIEGO SU NUMPY'}")
+
+    print(f"Esito: {'tutto in ordine' if not failures else f'{failures} problemi'}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Generatori di file sintetici per i benchmark dell'importer, in tutti i formati
+supportati: CSV (vari delimitatori), TXT separato da spazi, ASC con '#DATA' e XLSX.
+Ogni generatore restituisce i byte del file, come li riceve load_data_flexible.
+"""
+from io import BytesIO
+
+import numpy as np
+
+# Varianti di testo: nome -> (estensione, delimitatore, separatore decimale, intestazione)
+TEXT_VARIANTS = {
+    'csv_virgola': ('csv', ',', '.', True),
+    'csv_puntoevirgola': ('csv', ';', ',', True),
+    'csv_tab': ('csv', '\t', '.', True),
+    'csv_pipe': ('csv', '|', '.', True),
+    'txt_spazi': ('txt', ' ', '.', False),
+}
+
+
+def _matrix(n_rows, n_cols, seed):
+    """Colonna tempo crescente + canali casuali (valori realistici, 6 decimali)."""
+    rng = np.random.default_rng(seed)
+    data = np.empty((n_rows, n_cols))
+    data[:, 0] = np.arange(n_rows) * 0.001
+    data[:, 1:] = rng.normal(loc=100.0, scale=15.0, size=(n_rows, n_cols - 1))
+    return data
+
+
+def column_names(n_cols):
+    # Nomi "sporchi" apposta: spazi, unità e parentesi passano dalla normalizzazione regex
+    return ['Tempo (s)'] + [f'Canale {i} [mV]' for i in range(1, n_cols)]
+
+
+def make_text_bytes(n_rows, n_cols=4, delimiter=',', decimal='.', header=True, seed=0):
+    """File CSV/TXT: numeri con '%.6f', delimitatore e separatore decimale a scelta."""
+    data = _matrix(n_rows, n_cols, seed)
+    buffer = BytesIO()
+    if header:
+        buffer.write((delimiter.join(column_names(n_cols)) + '\n').encode('utf-8'))
+    np.savetxt(buffer, data, fmt='%.6f', delimiter=delimiter)
+    raw = buffer.getvalue()
+    if decimal != '.':
+        raw = raw.replace(b'.', decimal.encode('ascii'))
+    return raw
+
+
+def make_asc_bytes(n_points, seed=0):
+    """Spettro sintetico in formato ASC (intestazione + #DATA + due colonne)."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(100.0, 3200.0, n_points)
+    y = 1000 * np.exp(-((x - 1600) / 40) ** 2) + rng.normal(0, 5, n_points) + 200
+    header = "#Acquired=01.01.2024 10:00:00\n#Exposure time (s)=1\n#Accumulations=10\n#DATA\n"
+    body = "\n".join(f"{a:.4f}\t{b:.3f}" for a, b in zip(x, y))
+    return (header + body + "\n").encode("utf-8")
+
+
+def make_xlsx_bytes(n_rows, n_cols=4, seed=0):
+    """Cartella di lavoro con un foglio 'Dati' (scritta in modalità write-only di openpyxl)."""
+    import openpyxl
+
+    data = _matrix(n_rows, n_cols, seed).round(6)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Dati')
+    ws.append(column_names(n_cols))
+    for row in data.tolist():
+        ws.append(row)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
@@ -3,6 +3,7 @@ import plotly.graph_objects as go
 import numpy as np 
 import pandas as pd 
 import re 
+import modules.stats_utils as stats_utils
 
 # *** INIZIO MODIFICA: DIZIONARIO CORRETTO ***
 # Questi simboli sono validi sia in 2D che in 3D
@@ -245,8 +246,7 @@ def add_reference_line(fig, var, val, slope=None, df=None):
             
             x_col = st.session_state.get(x_col_key, df.columns[0])
             
-            x_min = df[x_col].min()
-            x_max = df[x_col].max()
+            x_min, x_max = stats_utils.column_range(df[x_col])
             x_line = np.linspace(x_min, x_max, 100)
             y_line = m * x_line + q 
             fig.add_trace(go.Scatter(x=x_line, y=y_line, mode='lines', name=f"Rif. Y={m}X+{q}", line=dict(color='orange', width=2, dash='dot')))
@@ -0,0 +1,341 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from modules import parse_utils
+
+# pyarrow serve per la cache su disco (formato Arrow IPC / Feather, mappabile in memoria)
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Budget di default della cache in memoria dei file parsati
+DEFAULT_PARSE_CACHE_MB = 1024
+
+# Cache persistente su disco (sopravvive alla chiusura dell'app)
+DEFAULT_DISK_CACHE_MB = 4096
+DEFAULT_DISK_CACHE_DIR = os.environ.get(
+    'DATAPLOTTER_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.dataplotter', 'cache')
+)
+
+
+def hash_bytes(payload):
+    """Impronta (hex) del contenuto di un file: blake2b è veloce anche su file grandi."""
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def hash_file(path, block_bytes=8 * 1024 * 1024):
+    """Impronta di un file locale letta a blocchi (il file non viene caricato tutto in memoria)."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_bytes), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_parse_key(digest, filename, options):
+    """
+    Chiave di cache: hash del file, estensione (sceglie il parser: stessi byte come .csv e
+    come .asc danno tabelle diverse), versione dei parser e opzioni che cambiano il risultato.
+    """
+    excel = (options.get('excel_sheet'), options.get('excel_range') or '', tuple(options.get('excel_columns') or ()))
+    return (digest, parse_utils.file_extension(filename), parse_utils.PARSER_VERSION,
+            options.get('delimiter'), int(options.get('skip_rows', 0)), options.get('header_arg'), excel)
+
+
+def dataset_fingerprint(*parts):
+    """
+    Impronta di un dataset importato (hash dei file + opzioni di parsing), calcolata una volta:
+    confrontarla costa O(1), a differenza di DataFrame.equals su milioni di righe.
+    """
+    return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def column_token(values):
+    """
+    Identità dei dati di una colonna (o dell'indice) senza leggerli: indirizzo, forma e dtype
+    dell'array NumPy. Con il copy-on-write una colonna non toccata da un passo mantiene lo
+    stesso buffer. None se la colonna non è un array NumPy (es. stringhe Arrow): niente riuso.
+    """
+    if isinstance(values, pd.RangeIndex):
+        return ('range', values.start, values.stop, values.step)
+    if not isinstance(values.dtype, np.dtype):
+        return None
+    array = values.to_numpy()
+    return (array.__array_interface__['data'][0], array.shape, array.strides, array.dtype.str)
+
+
+def frame_nbytes(df):
+    """Occupazione in memoria di un DataFrame (stringhe comprese)."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ParseCache:
+    """
+    Cache LRU dei DataFrame già parsati, condivisa da tutte le sessioni del server.
+    Limita la memoria totale (in byte): quando si supera il budget vengono
+    eliminati gli elementi usati meno di recente.
+    I DataFrame in cache vanno trattati come immutabili.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_PARSE_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (valore, byte)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0  # Cambia a ogni modifica del contenuto (vedi buffer_keys)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return  # Troppo grande per la cache: non la svuotiamo per un solo file
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            self.generation += 1
+            self._evict()
+
+    def set_budget(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def buffer_keys(self):
+        """
+        Buffer NumPy delle colonne dei DataFrame in cache, come (indirizzo, byte): chi li
+        condivide (es. i dati di una sessione) non li libererebbe togliendo i propri riferimenti.
+        """
+        with self._lock:
+            frames = [value['df'] for value, _ in self._entries.values()
+                      if isinstance(value, dict) and value.get('df') is not None]
+        keys = set()
+        for df in frames:
+            for i in range(df.shape[1]):
+                column = df.iloc[:, i]
+                if isinstance(column.dtype, np.dtype):
+                    array = column.to_numpy()
+                    keys.add((array.__array_interface__['data'][0], array.nbytes))
+        return keys
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.current_bytes -= nbytes
+            self.evictions += 1
+            self.generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.generation += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'used_mb': self.current_bytes / 1024 / 1024,
+                'budget_mb': self.max_bytes / 1024 / 1024,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+# Istanza unica per il processo server (i moduli sopravvivono ai rerun di Streamlit)
+parse_cache = ParseCache()
+
+
+class _DigestMemo:
+    """
+    Ricorda l'hash dei file caricati (per file_id di Streamlit, o percorso + data di
+    modifica per i file locali), così un rerun non deve ricalcolare l'hash di file
+    grandi che non sono cambiati.
+    """
+
+    def __init__(self, max_items=1024):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def digest(self, uploaded_file):
+        file_id = getattr(uploaded_file, 'file_id', None)
+        memo_key = (file_id, uploaded_file.name, getattr(uploaded_file, 'size', None)) if file_id else None
+        if memo_key is not None:
+            with self._lock:
+                if memo_key in self._items:
+                    self._items.move_to_end(memo_key)
+                    return self._items[memo_key]
+
+        local_path = getattr(uploaded_file, 'path', None)
+        digest = hash_file(local_path) if local_path else hash_bytes(uploaded_file.getbuffer())
+
+        if memo_key is not None:
+            with self._lock:
+                self._items[memo_key] = digest
+                if len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+        return digest
+
+
+_digest_memo = _DigestMemo()
+
+
+def file_digest(uploaded_file):
+    """Hash del contenuto di un file caricato (memorizzato per file_id)."""
+    return _digest_memo.digest(uploaded_file)
+
+
+class DiskCache:
+    """
+    Cache persistente dei dataset parsati in file Arrow IPC (Feather v2) non compressi.
+    La lettura usa il memory-mapping: le colonne numeriche puntano direttamente al file
+    senza passare di nuovo dal parsing del testo.
+    Dimensione totale limitata: si eliminano i file usati meno di recente (mtime).
+    """
+
+    SUFFIX = '.arrow'
+    # Formato dei file in cache (schema, metadati): entra nel nome del file insieme alla chiave
+    # (che contiene la versione dei parser), così i file scritti da codice precedente non vengono più letti
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory=DEFAULT_DISK_CACHE_DIR, max_bytes=DEFAULT_DISK_CACHE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def available(self):
+        return HAS_PYARROW
+
+    def _path_for(self, key):
+        versioned = (self.FORMAT_VERSION, key)
+        name = hashlib.blake2b(repr(versioned).encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, name + self.SUFFIX)
+
+    def _files(self):
+        if not os.path.isdir(self.directory):
+            return []
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.SUFFIX):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    META_KEY = b'dataplotter_header'
+
+    def get(self, key):
+        """Restituisce (DataFrame memory-mapped, intestazione del file) oppure None."""
+        if not self.available:
+            return None
+        path = self._path_for(key)
+        try:
+            # Il file si chiude subito: la mappatura resta viva finché le colonne la usano
+            # e viene rilasciata con loro (su Windows solo allora il file si può eliminare)
+            with pa.memory_map(path, 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+            schema_meta = table.schema.metadata or {}
+            header = json.loads(schema_meta.get(self.META_KEY, b'{}'))
+            # split_blocks evita di ricopiare le colonne numeriche in un unico blocco
+            df = table.to_pandas(split_blocks=True)
+            os.utime(path)  # Aggiorna l'ordine LRU
+        except (FileNotFoundError, OSError, pa.ArrowInvalid):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return df, header
+
+    def put(self, key, df, header=None):
+        """Scrive il DataFrame in cache (scrittura atomica) e applica il limite di spazio."""
+        if not self.available:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+            schema_meta = dict(table.schema.metadata or {})
+            schema_meta[self.META_KEY] = json.dumps(header or {}, default=str).encode('utf-8')
+            table = table.replace_schema_metadata(schema_meta)
+            # Un solo record batch: in lettura le colonne numeriche restano zero-copy sul file mappato
+            feather.write_feather(table, tmp_path, compression='uncompressed', chunksize=max(len(df), 1))
+            os.replace(tmp_path, path)
+        except Exception:
+            # La cache è un'ottimizzazione: un errore di scrittura non deve bloccare l'import
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            files = sorted(self._files())
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass  # File ancora mappato (Windows): riproveremo al prossimo giro
+
+    def set_budget(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._files():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        files = self._files()
+        total = self.hits + self.misses
+        return {
+            'entries': len(files),
+            'used_mb': sum(size for _, size, _ in files) / 1024 / 1024,
+            'budget_mb': self.max_bytes / 1024 / 1024,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+disk_cache = DiskCache()
+
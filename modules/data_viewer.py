@@ -1,7 +1,10 @@
 import streamlit as st
-import pandas as pd
-import numpy as np 
 import re 
+import plotly.graph_objects as go
+from modules.parse_utils import SOURCE_COLUMN
+from modules.spectra_utils import SpectralMatrix, NORMALIZATIONS, replace_spectra
+from modules import formula_engine, signal_utils, filter_engine, table_utils, dedup_utils, resample_utils, stats_utils
+from modules.history_utils import ProcessingHistory, operation, column_operation
 # from pandas.core.computation.ops import UndefinedVariableError # Rimossa
 
 # Funzione convert_df_to_csv rimossa
@@ -27,19 +30,36 @@ def show_data_processor():
     if 'col_pending_deletion' not in st.session_state:
         st.session_state.col_pending_deletion = None
 
-    # --- 1. Controlli Principali (Reset, Duplicati) ---
-    col1, col2 = st.columns(2)
+    history = _history()
+
+    # --- 1. Controlli Principali (Annulla/Ripeti, Reset, Duplicati) ---
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
-        if st.button("Resetta ai Dati Originali", use_container_width=True):
-            st.session_state.processed_df = st.session_state.original_df.copy()
-            st.session_state.confirm_delete = False 
-            st.rerun()
+        if st.button("↶ Annulla", use_container_width=True, disabled=not history.can_undo):
+            _move_history(history.undo)
     with col2:
+        if st.button("↷ Ripeti", use_container_width=True, disabled=not history.can_redo):
+            _move_history(history.redo)
+    with col3:
+        # Il reset torna al passo 0 della cronologia: nessuna copia dei dati originali
+        if st.button("Resetta ai Dati Originali", use_container_width=True, disabled=not history.can_undo):
+            _move_history(history.reset)
+    with col4:
         if st.button("Rimuovi Righe Duplicate", use_container_width=True):
-            st.session_state.processed_df = st.session_state.processed_df.drop_duplicates()
-            st.session_state.confirm_delete = False
+            _apply_dedup_rules([{'columns': None, 'tolerance': 0.0}])
             st.rerun()
 
+    # Righe tolte da ogni regola dell'ultima rimozione dei duplicati
+    for description, removed in st.session_state.pop('dedup_report', []):
+        st.success(f"Rimosse {removed} righe ({description}).")
+    _show_dedup_rules()
+
+    if history.steps:
+        with st.expander(f"Cronologia ({history.cursor} di {len(history.steps)} passi applicati)"):
+            for i, (label, applied) in enumerate(history.labels(), start=1):
+                st.markdown(f"{i}. {label}" if applied else f"{i}. ~~{label}~~")
+            _show_step_editor(history)
+
     st.markdown("---")
 
     # --- 2. Gestione Colonne (Rinomina/Elimina) ---
@@ -62,7 +82,8 @@ def show_data_processor():
                 if new_col_name in st.session_state.processed_df.columns:
                     st.error(f"Errore: Il nome '{new_col_name}' esiste già.")
                 else:
-                    st.session_state.processed_df.rename(columns={col_to_rename: new_col_name}, inplace=True)
+                    _apply_step('rename', f"Rinomina '{col_to_rename}' in '{new_col_name}'",
+                                old=col_to_rename, new=new_col_name)
                     st.rerun()
             else:
                 st.warning("Inserisci un nuovo nome valido.")
@@ -82,8 +103,7 @@ def show_data_processor():
             c1, c2 = st.columns(2)
             with c1:
                 if st.button("Sì, Elimina", use_container_width=True, type="primary"):
-                    st.session_state.processed_df.drop(columns=[col_to_delete], inplace=True)
-                    st.session_state.confirm_delete = False
+                    _apply_step('drop_column', f"Elimina colonna '{col_to_delete}'", column=col_to_delete)
                     st.session_state.col_pending_deletion = None
                     st.rerun()
             with c2:
@@ -106,66 +126,59 @@ def show_data_processor():
     st.caption("Colonne disponibili: `" + "`, `".join(col_list) + "`")
 
     with st.expander("Mostra funzioni e sintassi"):
-        st.markdown("""
+        functions = ", ".join(f"`{name}`" for name in formula_engine.FUNCTIONS if name not in signal_utils.SIGNAL_FUNCTIONS)
+        signal_help = "\n".join(f"            - `{usage}`: {text}" for usage, text in signal_utils.SIGNAL_HELP.items())
+        st.markdown(f"""
         - **Sintassi:** `NomeNuovaColonna = Colonna_A * 2 + Colonna_B`
+        - **Più formule:** una per riga, calcolate insieme; ogni riga può usare i risultati delle precedenti
         - **Nomi con spazi:** Se un nome ha spazi, usa gli apici inversi: `` `Mia Colonna` * 2 ``
-        - **Operatori:** `+`, `-`, `*`, `/`, `**` (potenza)
-        - **Funzioni:** `log(A)`, `log10(A)`, `sin(A)`, `cos(A)`, `tan(A)`, `sqrt(A)`, `abs(A)`
-        - **Costanti:** `pi`, `e`
+        - **Operatori:** `+`, `-`, `*`, `/`, `//`, `%`, `**` (potenza), confronti `<`, `>`, `==`, logici `&`, `|`, `~`
+        - **Funzioni:** {functions}
+        - **Costanti:** `pi`, `e`, `nan`, `inf`
+        - **Segnali e spettri** (su tutta la colonna, es. `liscio = savgol(Intensita, 21, 3)`):
+{signal_help}
         """)
 
     # Definisci la callback per gestire il calcolo e il reset
     def _calculate_and_reset():
         formula_str = st.session_state.formula_input_unified # Leggi dallo stato
-        if not formula_str or '=' not in formula_str:
-            st.error("Formula non valida. Manca '='. Es: `NuovaCol = Colonna_A * 2`")
-            return
-
         try:
-            parts = formula_str.split('=', 1)
-            new_col_name_raw = parts[0].strip()
-            formula_expression = parts[1].strip()
-
-            if not new_col_name_raw or not formula_expression:
-                st.error("Formula incompleta. Assicurati di specificare un nome e un'espressione.")
+            # Analisi e validazione (nomi, funzioni, sintassi) prima di toccare i dati
+            formulas = formula_engine.split_formulas(formula_str or "")
+            if not formulas:
+                st.error("Formula non valida. Manca '='. Es: `NuovaCol = Colonna_A * 2`")
                 return
 
-            safe_col_name = new_col_name_raw.replace(" ", "_") # Rendi il nome sicuro
-            
-            if safe_col_name in st.session_state.processed_df.columns:
-                st.error(f"Errore: La colonna '{safe_col_name}' esiste già.")
-                return
-            
-            df = st.session_state.processed_df
-            
-            df.eval(f"`{safe_col_name}` = {formula_expression}", inplace=True, engine='python')
-            st.session_state.processed_df = df
+            if len(formulas) == 1:
+                name, expression = formulas[0]
+                _apply_step('formula', f"Formula {name} = {expression}", name=name, expression=expression)
+            else:
+                _apply_step('formula_block', f"Formule: {', '.join(name for name, _ in formulas)}",
+                            text="\n".join(f"{name} = {expression}" for name, expression in formulas))
             st.session_state.formula_input_unified = "" # Reset sicuro dello stato
 
-        except SyntaxError as e:
-            st.error(f"Errore di sintassi: {e}. Controlla la formula.")
+        except ValueError as e:
+            st.error(str(e))
         except Exception as e:
-            err_str = str(e)
-            if "UndefinedVariableError" in err_str:
-                st.error(f"Errore: Nome colonna non trovato: {e}. Controlla maiuscole/minuscole. Se il nome ha spazi, usa `` `Nome Colonna` ``.")
-            else:
-                st.error(f"Errore nella formula: {e}")
+            st.error(f"Errore nella formula: {e}")
 
     # Inizializza lo stato per il campo di testo unificato
     if 'formula_input_unified' not in st.session_state:
         st.session_state.formula_input_unified = ""
         
     # Disegna il widget
-    formula_str_input = st.text_input(
-        "Formula (es. `Nuova_Col = Colonna_A * 2` o `` `Col C` = `Col A` + `Col B` ``)", 
-        key="formula_input_unified"
+    formula_str_input = st.text_area(
+        "Formule, una per riga (es. `Nuova_Col = Colonna_A * 2` o `` `Col C` = `Col A` + `Col B` ``)", 
+        key="formula_input_unified",
+        height=100
     )
 
-    # Logica per i Suggerimenti ("Autocompilamento")
+    # Logica per i Suggerimenti ("Autocompilamento") sull'ultima riga
     suggestions = []
-    if formula_str_input and '=' in formula_str_input:
+    last_line = formula_str_input.splitlines()[-1] if formula_str_input and formula_str_input.strip() else ""
+    if '=' in last_line:
         try:
-            expression_part = formula_str_input.split('=', 1)[1]
+            expression_part = last_line.split('=', 1)[1]
             last_word_match = re.split(r'[+\-*/\s()]', expression_part)
             
             if last_word_match:
@@ -187,39 +200,19 @@ def show_data_processor():
     
     st.markdown("---")
 
-    # --- 4. Filtro per Range ---
-    st.subheader("Filtra per Range")
-    
-    col_to_filter = st.selectbox(
-        "Seleziona colonna da filtrare", 
-        st.session_state.processed_df.columns,
-        key="filter_col"
-    )
-    
-    try:
-        numeric_col = pd.to_numeric(st.session_state.processed_df[col_to_filter])
-        min_default = float(numeric_col.min())
-        max_default = float(numeric_col.max())
-        
-        min_val, max_val = st.slider(
-            f"Seleziona range per '{col_to_filter}'",
-            min_value=min_default,
-            max_value=max_default,
-            value=(min_default, max_default)
-        )
-        
-        if st.button("Applica Filtro Range"):
-            st.session_state.processed_df = st.session_state.processed_df[
-                (numeric_col >= min_val) &
-                (numeric_col <= max_val)
-            ]
-            st.session_state.confirm_delete = False 
-            st.rerun()
-            
-    except ValueError:
-        st.warning(f"La colonna '{col_to_filter}' non è numerica e non può essere filtrata con uno slider.")
-    except Exception as e:
-        st.error(f"Errore durante il filtraggio: {e}")
+    # --- 4. Filtri (più condizioni su più colonne) ---
+    _show_filter_builder()
+
+    # --- 4b. Operazioni per File (solo import multi-file) ---
+    if SOURCE_COLUMN in st.session_state.processed_df.columns:
+        _show_source_operations()
+
+    # --- 4c. Matrice Spettrale (batch ASC in formato largo) ---
+    if 'spectral_matrix' in st.session_state:
+        _show_spectral_operations()
+
+    # --- 4d. Ricampionamento su una griglia di x comune ---
+    _show_resampling()
 
     # --- 5. Esportazione CSV ---
     # SEZIONE RIMOSSA COME RICHIESTO
@@ -228,5 +221,479 @@ def show_data_processor():
 
     # --- 6. Visualizzazione Tabella ---
     with st.expander("Visualizzazione Dati (Tabella)", expanded=True):
-        st.info(f"Visualizzazione di **{len(st.session_state.processed_df)}** righe di dati processati.")
-        st.dataframe(st.session_state.processed_df)
\ No newline at end of file
+        _show_table(st.session_state.processed_df)
+
+
+def _show_table(df):
+    """
+    Tabella paginata: al browser arriva solo la pagina visibile. L'ordinamento è fatto
+    sul server con una permutazione calcolata una volta per colonna.
+    """
+    st.info(f"Visualizzazione di **{len(df)}** righe di dati processati.")
+    # Colonne scelte che non esistono più (rinomina, undo...) vengono tolte
+    if 'table_columns' in st.session_state:
+        st.session_state.table_columns = [c for c in st.session_state.table_columns if c in df.columns]
+    c1, c2, c3 = st.columns([3, 2, 1])
+    with c1:
+        columns = st.multiselect("Colonne", list(df.columns), key="table_columns",
+                                 placeholder="Tutte le colonne")
+    with c2:
+        sort_by = st.selectbox("Ordina per", [None] + list(df.columns), key="table_sort",
+                               format_func=lambda c: "(ordine originale)" if c is None else str(c))
+    with c3:
+        descending = st.checkbox("Decrescente", key="table_descending", disabled=sort_by is None)
+
+    c1, c2 = st.columns([1, 3])
+    with c1:
+        page_size = st.selectbox("Righe per pagina", table_utils.PAGE_SIZES, key="table_page_size",
+                                 index=table_utils.PAGE_SIZES.index(table_utils.DEFAULT_PAGE_SIZE))
+    n_pages = table_utils.page_count(len(df), page_size)
+    # Dopo un filtro o un cambio di pagina le pagine possono essere meno di prima
+    if st.session_state.get('table_page', 1) > n_pages:
+        st.session_state.table_page = n_pages
+    with c2:
+        page = st.number_input(f"Pagina (di {n_pages})", min_value=1, max_value=n_pages, step=1, key="table_page")
+
+    try:
+        rows = table_utils.page_rows(df, page, page_size, columns=columns or None,
+                                     sort_by=sort_by, ascending=not descending)
+    except TypeError as e:
+        # Colonne con tipi misti non confrontabili
+        st.error(f"Impossibile ordinare per '{sort_by}': {e}")
+        rows = table_utils.page_rows(df, page, page_size, columns=columns or None)
+    st.dataframe(rows, use_container_width=True)
+    first = (page - 1) * page_size
+    st.caption(f"Righe {min(first + 1, len(df))}–{first + len(rows)} di {len(df)}.")
+
+
+def _show_dedup_rules():
+    """
+    Regole per i duplicati: colonne chiave e tolleranza sulle colonne float.
+    Ogni regola diventa un passo della cronologia (in ordine), così se ne vede l'effetto.
+    """
+    df = st.session_state.processed_df
+    if 'dedup_rules' not in st.session_state:
+        st.session_state.dedup_rules = []
+    rules = [r for r in st.session_state.dedup_rules if all(c in df.columns for c in r['columns'] or [])]
+    st.session_state.dedup_rules = rules
+
+    with st.expander("Duplicati: colonne chiave e tolleranza"):
+        c1, c2 = st.columns([3, 1])
+        with c1:
+            columns = st.multiselect("Colonne chiave", list(df.columns), key="dedup_columns",
+                                     placeholder="Tutte le colonne")
+        with c2:
+            tolerance = st.number_input("Tolleranza (colonne float)", min_value=0.0, value=0.0,
+                                        format="%g", key="dedup_tolerance")
+        st.caption("Con tolleranza > 0 i valori float vengono arrotondati a multipli della tolleranza prima del confronto.")
+        rule = {'columns': columns or None, 'tolerance': float(tolerance)}
+
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            if st.button("Aggiungi regola", use_container_width=True):
+                st.session_state.dedup_rules = rules + [rule]
+                st.rerun()
+        with c2:
+            if st.button("Applica solo questa regola", use_container_width=True):
+                _apply_dedup_rules([rule])
+                st.rerun()
+        with c3:
+            if st.button("Svuota regole", use_container_width=True, disabled=not rules):
+                st.session_state.dedup_rules = []
+                st.rerun()
+
+        if rules:
+            for i, r in enumerate(rules, start=1):
+                st.markdown(f"{i}. Rimuovi {dedup_utils.describe_rule(r['columns'], r['tolerance'])}")
+            if st.button("Applica regole", type="primary"):
+                _apply_dedup_rules(rules)
+                st.session_state.dedup_rules = []
+                st.rerun()
+
+
+def _apply_dedup_rules(rules):
+    """Un passo della cronologia per regola; le righe tolte da ciascuna vanno nel riepilogo."""
+    report = []
+    for rule in rules:
+        description = dedup_utils.describe_rule(rule['columns'], rule['tolerance'])
+        before = len(st.session_state.processed_df)
+        _apply_step('drop_duplicates', f"Rimuovi {description}", **rule)
+        report.append((description, before - len(st.session_state.processed_df)))
+    st.session_state.dedup_report = report
+
+
+# --- Cronologia: ogni modifica ai dati processati passa da qui ---
+
+def _history():
+    """Cronologia del processamento della sessione (ricreata se i dati originali sono cambiati)."""
+    history = st.session_state.get('history')
+    if history is None or history.original is not st.session_state.original_df:
+        history = ProcessingHistory(st.session_state.original_df)
+        st.session_state.history = history
+        st.session_state.processed_df = history.current
+    return history
+
+
+def _apply_step(kind, label, **params):
+    """Applica un'operazione registrata e aggiorna i dati processati (solleva in caso di errore)."""
+    st.session_state.processed_df = st.session_state.history.apply(kind, label, **params)
+    st.session_state.confirm_delete = False
+
+
+def _show_step_editor(history):
+    """
+    Modifica o rimozione di un passo già applicato: vengono ricalcolati solo i passi
+    successivi, e le colonne calcolate i cui input non cambiano sono riusate dalla cache.
+    """
+    index = st.selectbox("Passo da modificare", range(len(history.steps)),
+                         format_func=lambda i: f"{i + 1}. {history.steps[i].label}", key="history_step")
+    step = history.steps[index]
+    editable = _editable_params(step.params)
+    new_params = {}
+    for name, value in editable.items():
+        # I blocchi di formule sono su più righe
+        widget = st.text_area if isinstance(value, str) and "\n" in value else st.text_input
+        text = widget(name, value=str(value), key=f"history_param_{index}_{name}")
+        try:
+            new_params[name] = type(value)(text)
+        except ValueError:
+            st.error(f"Valore non valido per '{name}': {text}")
+            return
+
+    c1, c2 = st.columns(2)
+    with c1:
+        if st.button("Aggiorna passo", use_container_width=True, disabled=not editable or new_params == editable):
+            changed = {k: v for k, v in new_params.items() if v != editable[k]}
+            label = step.label + " → " + ", ".join(f"{k}={v}" for k, v in changed.items())
+            _change_history(history.edit_step, index, label=label, **_rebuild_params(step.params, new_params))
+    with c2:
+        if st.button("Rimuovi passo", use_container_width=True):
+            _change_history(history.remove_step, index)
+
+
+def _is_simple(value):
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def _editable_params(params):
+    """
+    Parametri modificabili di un passo: testo e numeri. Delle condizioni di un filtro
+    si possono cambiare i limiti numerici ("1.low", "1.high", ...); le liste di colonne no.
+    """
+    editable = {k: v for k, v in params.items() if _is_simple(v)}
+    for i, predicate in enumerate(params.get('predicates', []), start=1):
+        editable.update((f"{i}.{k}", v) for k, v in predicate.items() if _is_simple(v) and not isinstance(v, str))
+    return editable
+
+
+def _rebuild_params(params, new_params):
+    """Inverso di _editable_params: riporta i valori modificati nelle condizioni del filtro."""
+    rebuilt = {k: v for k, v in new_params.items() if "." not in k}
+    if 'predicates' in params:
+        predicates = [dict(p) for p in params['predicates']]
+        for key, value in new_params.items():
+            if "." in key:
+                position, field = key.split(".", 1)
+                predicates[int(position) - 1][field] = value
+        rebuilt['predicates'] = predicates
+    return rebuilt
+
+
+def _change_history(change, *args, **kwargs):
+    """Modifica la pipeline; se i passi a valle non sono più applicabili mostra l'errore."""
+    try:
+        st.session_state.processed_df = change(*args, **kwargs)
+    except Exception as e:
+        st.error(f"Impossibile applicare la modifica: {e}")
+        return
+    st.session_state.confirm_delete = False
+    st.rerun()
+
+
+def _move_history(move):
+    """Annulla / ripeti / reset: cambia solo il punto della cronologia, poi ridisegna."""
+    st.session_state.processed_df = move()
+    st.session_state.confirm_delete = False
+    st.rerun()
+
+
+# Filtro "Uguale a": oltre questo numero di valori distinti la lista non è utilizzabile
+MAX_EQUALITY_OPTIONS = 500
+
+
+def _show_filter_builder():
+    """
+    Costruttore di filtri: le condizioni (intervalli, uguaglianze, NaN) si accumulano e
+    vengono applicate insieme come un solo passo della cronologia. Gli intervalli sulle
+    colonne numeriche usano indici ordinati (searchsorted) costruiti al primo uso.
+    """
+    st.subheader("Filtri")
+    df = st.session_state.processed_df
+    if 'filter_predicates' not in st.session_state:
+        st.session_state.filter_predicates = []
+    # Condizioni su colonne non più presenti (rinomina, undo...) vengono scartate
+    predicates = [p for p in st.session_state.filter_predicates if p['column'] in df.columns]
+    st.session_state.filter_predicates = predicates
+
+    c1, c2 = st.columns(2)
+    with c1:
+        col_to_filter = st.selectbox("Seleziona colonna da filtrare", df.columns, key="filter_col")
+    with c2:
+        kind_label = st.radio("Condizione", list(filter_engine.PREDICATE_KINDS), horizontal=True, key="filter_kind")
+    kind = filter_engine.PREDICATE_KINDS[kind_label]
+
+    predicate = None
+    try:
+        if kind == 'range':
+            bounds = filter_engine.column_bounds(df[col_to_filter])
+            if bounds is None:
+                st.warning(f"La colonna '{col_to_filter}' non contiene valori numerici.")
+            elif bounds[0] == bounds[1]:
+                st.info(f"La colonna '{col_to_filter}' ha un solo valore ({bounds[0]:g}).")
+            else:
+                min_val, max_val = st.slider(
+                    f"Seleziona range per '{col_to_filter}'",
+                    min_value=bounds[0],
+                    max_value=bounds[1],
+                    value=bounds
+                )
+                predicate = {'column': col_to_filter, 'kind': 'range', 'low': min_val, 'high': max_val}
+        elif kind == 'equal':
+            options = df[col_to_filter].dropna().unique()
+            if len(options) > MAX_EQUALITY_OPTIONS:
+                st.warning(f"La colonna '{col_to_filter}' ha troppi valori distinti ({len(options)}): usa un intervallo.")
+            else:
+                values = st.multiselect(f"Valori di '{col_to_filter}'", sorted(options.tolist(), key=str), key="filter_values")
+                if values:
+                    predicate = {'column': col_to_filter, 'kind': 'equal', 'values': values}
+        else:
+            keep = st.radio("Righe con NaN", ["Escludi", "Mantieni solo quelle"], horizontal=True, key="filter_nan") != "Escludi"
+            predicate = {'column': col_to_filter, 'kind': 'nan', 'keep': keep}
+    except ValueError:
+        st.warning(f"La colonna '{col_to_filter}' non è numerica e non può essere filtrata con uno slider.")
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        if st.button("Aggiungi condizione", use_container_width=True, disabled=predicate is None):
+            st.session_state.filter_predicates = predicates + [predicate]
+            st.rerun()
+    with c2:
+        # Filtro rapido: la condizione corrente da sola, come il vecchio "Applica Filtro Range"
+        if st.button("Applica solo questa", use_container_width=True, disabled=predicate is None):
+            _apply_step('filter', f"Filtra {filter_engine.describe_predicate(predicate)}", predicates=[predicate])
+            st.rerun()
+    with c3:
+        if st.button("Svuota condizioni", use_container_width=True, disabled=not predicates):
+            st.session_state.filter_predicates = []
+            st.rerun()
+
+    if predicates:
+        mode_label = st.radio("Combina le condizioni", ["Tutte (E)", "Almeno una (O)"], horizontal=True, key="filter_mode")
+        mode = 'all' if mode_label.startswith("Tutte") else 'any'
+        for i, p in enumerate(predicates, start=1):
+            st.markdown(f"{i}. {filter_engine.describe_predicate(p)}")
+        try:
+            n_selected = len(filter_engine.select_rows(df, predicates, mode))
+            st.caption(f"Righe selezionate: **{n_selected}** su {len(df)}.")
+            if st.button("Applica filtri", type="primary"):
+                _apply_step('filter', f"Filtra {filter_engine.describe_filters(predicates, mode)}",
+                            predicates=predicates, mode=mode)
+                st.session_state.filter_predicates = []
+                st.rerun()
+        except Exception as e:
+            st.error(f"Errore durante il filtraggio: {e}")
+
+
+def _show_resampling():
+    """
+    Porta le colonne scelte su una griglia di x comune (uniforme o indicata a mano),
+    eventualmente file per file: le curve si possono poi sovrapporre o combinare punto per punto.
+    """
+    df = st.session_state.processed_df
+    numeric_cols = list(df.select_dtypes(include='number').columns)
+    if len(numeric_cols) < 2:
+        return
+
+    with st.expander("Ricampiona su una griglia di x comune"):
+        st.caption("Il risultato contiene solo la colonna x, le colonne ricampionate e (se scelto) la colonna dei file.")
+        c1, c2 = st.columns([1, 2])
+        with c1:
+            x_col = st.selectbox("Colonna x", numeric_cols, key="resample_x")
+        with c2:
+            y_options = [c for c in numeric_cols if c != x_col]
+            columns = st.multiselect("Colonne da ricampionare", y_options, default=y_options,
+                                     key=f"resample_columns_{x_col}")
+
+        c1, c2 = st.columns(2)
+        with c1:
+            method_label = st.radio("Metodo", list(resample_utils.METHODS), horizontal=True, key="resample_method")
+        with c2:
+            grid_mode = st.radio("Griglia", ["Uniforme", "Valori indicati"], horizontal=True, key="resample_grid_mode")
+        method = resample_utils.METHODS[method_label]
+
+        params = {}
+        try:
+            if grid_mode == "Uniforme":
+                low, high = stats_utils.column_range(df[x_col])
+                # Di default tanti punti quanti i campioni di un file
+                n_sources = df[SOURCE_COLUMN].nunique() if SOURCE_COLUMN in df.columns else 1
+                n_default = len(df) // max(n_sources, 1)
+                c1, c2, c3 = st.columns(3)
+                with c1:
+                    start = st.number_input("Da", value=float(low), format="%g", key=f"resample_start_{x_col}")
+                with c2:
+                    stop = st.number_input("A", value=float(high), format="%g", key=f"resample_stop_{x_col}")
+                with c3:
+                    points = st.number_input("Punti", min_value=2, value=max(2, n_default), step=1, key="resample_points")
+                grid = resample_utils.uniform_grid(start, stop, points)
+                params.update(start=float(start), stop=float(stop), points=int(points))
+            else:
+                text = st.text_area("Valori di x (separati da spazi o virgole)", key="resample_grid_text")
+                grid = resample_utils.parse_grid(text)
+                params['grid'] = grid.tolist()
+        except ValueError as e:
+            st.warning(str(e))
+            return
+
+        by_source = False
+        if SOURCE_COLUMN in df.columns:
+            by_source = st.checkbox("Ricampiona ogni file separatamente", value=True, key="resample_by_source")
+
+        if st.button("Ricampiona", disabled=not columns):
+            _apply_step('resample', resample_utils.describe_resample(x_col, columns, method, len(grid)),
+                        x=x_col, columns=columns, method=method, by_source=by_source, **params)
+            st.rerun()
+
+
+# Operazioni di gruppo per file: nome visualizzato -> (suffisso colonna, funzione vettoriale)
+SOURCE_OPERATIONS = {
+    "Normalizza al massimo (y / max)": ('norm', lambda col, grp: col / grp.transform('max')),
+    "Normalizza min-max (0-1)": ('minmax', lambda col, grp: (col - grp.transform('min')) / (grp.transform('max') - grp.transform('min'))),
+    "Sottrai la media": ('centrato', lambda col, grp: col - grp.transform('mean')),
+    "Standardizza (z-score)": ('zscore', lambda col, grp: (col - grp.transform('mean')) / grp.transform('std')),
+}
+
+
+def _show_source_operations():
+    """
+    Operazioni per file sulla colonna categorica 'source'.
+    Ogni operazione è un groupby vettoriale sui codici interi, senza cicli sui file.
+    """
+    st.markdown("---")
+    st.subheader("Operazioni per File")
+    df = st.session_state.processed_df
+    numeric_cols = [c for c in df.select_dtypes(include='number').columns]
+
+    if not numeric_cols:
+        st.warning("Nessuna colonna numerica disponibile per le operazioni per file.")
+        return
+
+    c1, c2 = st.columns(2)
+    with c1:
+        col_source_op = st.selectbox("Colonna", numeric_cols, key="source_op_col")
+    with c2:
+        op_label = st.selectbox("Operazione", list(SOURCE_OPERATIONS.keys()), key="source_op_type")
+
+    suffix = SOURCE_OPERATIONS[op_label][0]
+    if st.button("Applica a ogni file", key="source_op_btn"):
+        new_name = f"{col_source_op}_{suffix}"
+        if new_name in df.columns:
+            st.error(f"Errore: La colonna '{new_name}' esiste già.")
+        else:
+            _apply_step('source_operation', f"{op_label} per file: '{col_source_op}'",
+                        column=col_source_op, operation=op_label)
+            st.rerun()
+
+    with st.expander("Statistiche per file"):
+        stats = df.groupby(SOURCE_COLUMN, observed=True)[numeric_cols].agg(['min', 'max', 'mean'])
+        st.dataframe(stats, use_container_width=True)
+
+
+@column_operation('source_operation', reads=lambda df, column, operation: [column, SOURCE_COLUMN])
+def _source_operation(df, column, operation):
+    suffix, func = SOURCE_OPERATIONS[operation]
+    grouped = df[column].groupby(df[SOURCE_COLUMN], observed=True)
+    return {f"{column}_{suffix}": func(df[column], grouped)}
+
+
+def _current_spectral_matrix():
+    """
+    Matrice spettrale costruita dai dati processati (rispecchia filtri, rinomine ed eliminazioni).
+    None se l'asse o tutti gli spettri non sono più presenti.
+    """
+    layout = st.session_state.spectral_matrix
+    return _spectral_matrix(st.session_state.processed_df, layout.axis_name, layout.column_names)
+
+
+def _spectral_matrix(df, axis_name, column_names):
+    columns = [c for c in column_names if c in df.columns]
+    if axis_name not in df.columns or not columns:
+        return None
+    return SpectralMatrix.from_frame(df, axis_name, columns)
+
+
+# Operazioni sulla matrice spettrale, riproducibili dalla cronologia
+
+@operation('spectral_normalize')
+def _spectral_normalize(df, axis_name, columns, method):
+    return replace_spectra(df, _spectral_matrix(df, axis_name, columns).normalize(method))
+
+
+@operation('spectral_subtract')
+def _spectral_subtract(df, axis_name, columns, reference):
+    matrix = _spectral_matrix(df, axis_name, columns)
+    ref_values = matrix.mean() if reference is None else matrix.values[matrix.column_names.index(reference)]
+    return replace_spectra(df, matrix.subtract(ref_values))
+
+
+@column_operation('spectral_stats', reads=lambda df, axis_name, columns: [axis_name] + [c for c in columns if c in df.columns])
+def _spectral_stats(df, axis_name, columns):
+    matrix = _spectral_matrix(df, axis_name, columns)
+    return {'media_spettri': matrix.mean(), 'devstd_spettri': matrix.std()}
+
+
+def _show_spectral_operations():
+    """
+    Operazioni sull'intero batch di spettri: ogni operazione è un'unica
+    operazione NumPy sulla matrice (spettri x punti), senza cicli sui file.
+    """
+    st.markdown("---")
+    st.subheader("Matrice Spettrale")
+    matrix = _current_spectral_matrix()
+    if matrix is None:
+        st.warning("Le colonne della matrice spettrale non sono più presenti nei dati processati.")
+        return
+
+    st.caption(f"{matrix.n_spectra} spettri x {matrix.n_points} punti su asse `{matrix.axis_name}` "
+               f"({matrix.nbytes / 1024 / 1024:.1f} MB).")
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        norm_label = st.selectbox("Normalizzazione", list(NORMALIZATIONS.keys()), key="spectral_norm")
+        if st.button("Normalizza tutti gli spettri", use_container_width=True):
+            _apply_step('spectral_normalize', f"Normalizza gli spettri: {norm_label}",
+                        axis_name=matrix.axis_name, columns=matrix.column_names, method=norm_label)
+            st.rerun()
+    with c2:
+        reference = st.selectbox("Riferimento", ["Spettro medio"] + matrix.column_names, key="spectral_reference")
+        if st.button("Sottrai il riferimento", use_container_width=True):
+            _apply_step('spectral_subtract', f"Sottrai agli spettri: {reference}",
+                        axis_name=matrix.axis_name, columns=matrix.column_names,
+                        reference=None if reference == "Spettro medio" else reference)
+            st.rerun()
+    with c3:
+        st.markdown("**Statistiche sul batch**")
+        if st.button("Aggiungi media e dev. standard", use_container_width=True):
+            existing = [c for c in ("media_spettri", "devstd_spettri") if c in st.session_state.processed_df.columns]
+            if existing:
+                st.error(f"Errore: La colonna '{existing[0]}' esiste già.")
+            else:
+                _apply_step('spectral_stats', "Media e dev. standard degli spettri",
+                            axis_name=matrix.axis_name, columns=matrix.column_names)
+                st.rerun()
+
+    with st.expander("Mappa degli spettri (heatmap)"):
+        # Una sola traccia per tutto il batch: la matrice va direttamente a Plotly
+        fig = go.Figure(go.Heatmap(z=matrix.values, x=matrix.axis, y=matrix.column_names, colorscale='Viridis'))
+        fig.update_layout(xaxis_title=matrix.axis_name, yaxis_title="Spettro", height=max(300, 18 * matrix.n_spectra))
+        st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+# --- Rimozione dei duplicati a blocchi, con tolleranza sulle colonne float ---
+# Ogni riga (ristretta alle colonne chiave) diventa un hash a 64 bit; gli hash già visti, con la
+# posizione della loro prima riga, stanno in pochi array ordinati di uint64 (16 byte per riga
+# distinta). La memoria resta limitata al blocco corrente più l'insieme degli hash, invece delle
+# tabelle di fattorizzazione di tutte le colonne che costruisce DataFrame.drop_duplicates.
+# L'hash serve solo a trovare i candidati: ogni riga scartata viene confrontata con i valori
+# della riga che la sostituisce, e le rare collisioni si risolvono con un confronto esatto.
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def _key_frame(chunk, tolerance):
+    """
+    Colonne chiave pronte per l'hash: con tolleranza > 0 le colonne float vengono portate
+    sulla griglia di passo `tolerance` (valori nella stessa cella = uguali).
+    Sempre -0.0 -> 0.0, come nel confronto di drop_duplicates.
+    """
+    keys = {}
+    for i, name in enumerate(chunk.columns):
+        column = chunk.iloc[:, i]
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind == 'f':
+            values = column.to_numpy()
+            if tolerance > 0:
+                values = np.floor(values / tolerance + 0.5)
+            keys[i] = values + 0.0
+        else:
+            keys[i] = column.to_numpy()
+    return pd.DataFrame(keys, copy=False)
+
+
+def _hash_keys(keys):
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def row_hashes(chunk, tolerance=0.0):
+    """Hash a 64 bit di ogni riga del blocco (le colonne sono già quelle chiave)."""
+    return _hash_keys(_key_frame(chunk, tolerance))
+
+
+def _same_rows(df, keys, rows, references, tolerance):
+    """
+    Per ogni riga `rows` del blocco (frame delle chiavi `keys`), True se le sue chiavi sono
+    uguali a quelle della riga `references` di df (NaN uguale a NaN, come drop_duplicates).
+    Si confronta una colonna alla volta, leggendo solo le righe coinvolte.
+    """
+    equal = np.ones(len(rows), dtype=bool)
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        if isinstance(column.dtype, np.dtype):
+            other = column.to_numpy()[references]
+            if column.dtype.kind == 'f':
+                other = (np.floor(other / tolerance + 0.5) if tolerance > 0 else other) + 0.0
+        else:
+            other = column.take(references).to_numpy()
+        mine = keys.iloc[:, i].to_numpy()[rows]
+        mine_na, other_na = pd.isna(mine), pd.isna(other)
+        same = mine_na & other_na
+        valid = ~(mine_na | other_na)
+        same[valid] = mine[valid] == other[valid]
+        equal &= same
+    return equal
+
+
+class _SeenHashes:
+    """
+    Hash già visti con la posizione della loro prima riga: una pila di array ordinati le cui
+    lunghezze decrescono almeno di un fattore 2 (due array simili vengono fusi con una
+    fusione lineare). Così ogni hash viene rifuso O(log n) volte e una ricerca tocca
+    O(log n) array.
+    """
+
+    def __init__(self):
+        self.runs = []  # (hash ordinati, posizioni)
+
+    def lookup(self, values):
+        """
+        Posizione della prima riga con lo stesso hash, -1 per gli hash mai visti.
+        values ordinati: la ricerca binaria procede in avanti (accessi in cache).
+        """
+        found = np.full(len(values), -1, dtype=np.int64)
+        for hashes, positions in self.runs:
+            index = np.minimum(np.searchsorted(hashes, values), len(hashes) - 1)
+            hit = hashes[index] == values
+            found[hit] = positions[index[hit]]
+        return found
+
+    def add(self, values, positions):
+        """Nuovi hash (ordinati) con la posizione della loro prima riga."""
+        if not len(values):
+            return
+        self.runs.append((values, positions))
+        while len(self.runs) > 1 and len(self.runs[-2][0]) < 2 * len(self.runs[-1][0]):
+            (h_new, p_new), (h_old, p_old) = self.runs.pop(), self.runs.pop()
+            # Posto di ogni hash nuovo nel risultato: i vecchi riempiono gli altri posti in ordine
+            slots = np.searchsorted(h_old, h_new) + np.arange(len(h_new))
+            old = np.ones(len(h_old) + len(h_new), dtype=bool)
+            old[slots] = False
+            hashes = np.empty(len(old), dtype=h_old.dtype)
+            positions = np.empty(len(old), dtype=p_old.dtype)
+            hashes[slots], hashes[old] = h_new, h_old
+            positions[slots], positions[old] = p_new, p_old
+            self.runs.append((hashes, positions))
+
+
+def unique_rows(df, columns=None, tolerance=0.0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Posizioni (ordinate) della prima occorrenza di ogni riga distinta sulle colonne chiave
+    (tutte se columns è None). Il risultato è esatto: una collisione di hash non fa mai
+    scartare una riga diversa.
+    """
+    if columns:
+        missing = [c for c in columns if c not in df.columns]
+        if missing:
+            raise ValueError(f"Colonne non trovate: {', '.join(map(str, missing))}")
+        df = df[list(columns)]
+    if tolerance < 0:
+        raise ValueError("La tolleranza non può essere negativa.")
+
+    seen = _SeenHashes()
+    kept = []
+    collided = []
+    for start in range(0, len(df), chunk_rows):
+        keys = _key_frame(df.iloc[start:start + chunk_rows], tolerance)
+        hashes = _hash_keys(keys)
+        # Hash del blocco ordinati: ogni gruppo di hash uguali ha come prima riga la minima
+        order = np.argsort(hashes)
+        hashes_sorted = hashes[order]
+        group = np.concatenate(([True], hashes_sorted[1:] != hashes_sorted[:-1]))
+        starts = np.flatnonzero(group)
+        values = hashes_sorted[starts]
+        first = np.minimum.reduceat(order, starts) + start
+        found = seen.lookup(values)
+        new = found < 0
+        seen.add(values[new], first[new])
+        kept.append(first[new])
+
+        # Riga che sostituisce ogni riga scartata: la prima con lo stesso hash (qui o prima)
+        representative = np.where(new, first, found)[np.cumsum(group) - 1] - start
+        dropped = np.flatnonzero(representative != order)
+        if len(dropped):
+            representative = representative[dropped] + start
+            dropped = order[dropped]
+            mismatch = ~_same_rows(df, keys, dropped, representative, tolerance)
+            if mismatch.any():
+                collided.append(hashes[dropped[mismatch]])
+
+    kept = np.concatenate(kept) if kept else np.arange(0)
+    if collided:
+        kept = _resolve_collisions(df, kept, np.unique(np.concatenate(collided)), tolerance, chunk_rows)
+    return np.sort(kept)
+
+
+def _resolve_collisions(df, kept, collided, tolerance, chunk_rows):
+    """Righe con hash in collisione: prime occorrenze ricalcolate con il confronto esatto di pandas."""
+    rows = []
+    for start in range(0, len(df), chunk_rows):
+        hashes = row_hashes(df.iloc[start:start + chunk_rows], tolerance)
+        rows.append(np.flatnonzero(np.isin(hashes, collided)) + start)
+    rows = np.concatenate(rows)
+    exact = rows[~_key_frame(df.take(rows), tolerance).duplicated().to_numpy()]
+    return np.union1d(np.setdiff1d(kept, rows), exact)
+
+
+def drop_duplicates(df, columns=None, tolerance=0.0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Come DataFrame.drop_duplicates(subset=columns), con tolleranza e memoria limitata."""
+    rows = unique_rows(df, columns, tolerance, chunk_rows)
+    if len(rows) == len(df):
+        return df
+    return df.take(rows)
+
+
+def describe_rule(columns=None, tolerance=0.0):
+    """Descrizione leggibile di una regola (per la cronologia e il riepilogo)."""
+    keys = ", ".join(f"'{c}'" for c in columns) if columns else "tutte le colonne"
+    return f"duplicati su {keys}" + (f" (tolleranza {tolerance:g})" if tolerance > 0 else "")
@@ -0,0 +1,191 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from modules import stats_utils
+from modules.cache_utils import column_token
+
+# --- Filtri componibili su più colonne con indici ordinati ---
+
+# Sotto questa dimensione una maschera booleana costa meno che costruire l'indice
+INDEX_MIN_ROWS = 10_000
+# Indici ordinati conservati (LRU): ognuno occupa circa 16 byte per riga
+MAX_SORTED_INDEXES = 8
+
+# Tipi di condizione: nome visualizzato -> chiave
+PREDICATE_KINDS = {
+    "Intervallo": 'range',
+    "Uguale a": 'equal',
+    "Valori mancanti": 'nan',
+}
+
+
+def numeric_values(series):
+    """Valori float64 di una colonna (ValueError se non è numerica)."""
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biuf':
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return pd.to_numeric(series).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class SortedIndex:
+    """
+    Indice ordinato di una colonna numerica: permutazione che ordina i valori (argsort)
+    e valori ordinati. Un intervallo diventa due searchsorted e una slice della permutazione,
+    O(log n + k) invece di una maschera O(n). I NaN finiscono in fondo.
+    """
+
+    def __init__(self, values):
+        self.sorter = np.argsort(values, kind='stable')
+        self.sorted = values[self.sorter]
+        self.n_valid = len(values) - int(np.count_nonzero(np.isnan(self.sorted)))
+
+    @property
+    def nbytes(self):
+        return self.sorter.nbytes + self.sorted.nbytes
+
+    def bounds(self):
+        """(minimo, massimo) dei valori non NaN, in O(1)."""
+        if not self.n_valid:
+            return None
+        return float(self.sorted[0]), float(self.sorted[self.n_valid - 1])
+
+    def range(self, low, high):
+        """Posizioni (non ordinate) delle righe con low <= valore <= high."""
+        start = np.searchsorted(self.sorted[:self.n_valid], low, side='left')
+        stop = np.searchsorted(self.sorted[:self.n_valid], high, side='right')
+        return self.sorter[start:stop]
+
+    def equal(self, values):
+        return np.concatenate([self.range(v, v) for v in values]) if values else self.sorter[:0]
+
+    def nan(self):
+        return self.sorter[self.n_valid:]
+
+
+class _IndexCache:
+    """Indici ordinati per identità del buffer della colonna (LRU, condivisa tra le sessioni)."""
+
+    def __init__(self, max_items=MAX_SORTED_INDEXES):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, series):
+        token = column_token(series)
+        if token is None:
+            return None
+        with self._lock:
+            if token in self._items:
+                self._items.move_to_end(token)
+                return self._items[token][1]
+        index = SortedIndex(numeric_values(series))
+        with self._lock:
+            # La colonna resta referenziata: il suo buffer (e quindi il token) resta valido
+            self._items[token] = (series, index)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return index
+
+
+_index_cache = _IndexCache()
+
+
+def sorted_index(series):
+    """Indice ordinato della colonna (costruito al primo uso), None se non conviene o non è numerica."""
+    if len(series) < INDEX_MIN_ROWS or not isinstance(series.dtype, np.dtype) or series.dtype.kind not in 'biuf':
+        return None
+    return _index_cache.get(series)
+
+
+def column_bounds(series):
+    """(minimo, massimo) di una colonna numerica; con l'indice ordinato è O(1)."""
+    index = sorted_index(series)
+    if index is not None:
+        return index.bounds()
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biuf':
+        stats = stats_utils.column_stats(series)
+        return (stats.min, stats.max) if stats.numeric else None
+    values = numeric_values(series)
+    if np.isnan(values).all():
+        return None
+    return float(np.nanmin(values)), float(np.nanmax(values))
+
+
+def _predicate_rows(df, predicate):
+    """Righe che soddisfano una condizione: posizioni (via indice) oppure maschera booleana."""
+    series = df[predicate['column']]
+    kind = predicate['kind']
+    index = sorted_index(series)
+
+    if kind == 'range':
+        if index is not None:
+            return index.range(predicate['low'], predicate['high'])
+        values = numeric_values(series)
+        return (values >= predicate['low']) & (values <= predicate['high'])
+    if kind == 'equal':
+        if index is not None:
+            return index.equal([float(v) for v in predicate['values']])
+        return series.isin(predicate['values']).to_numpy()
+    if kind == 'nan':
+        rows = index.nan() if index is not None else series.isna().to_numpy()
+        if predicate.get('keep', False):
+            return rows
+        mask = _to_mask(rows, len(series))
+        return ~mask
+    raise ValueError(f"Tipo di condizione sconosciuto: {kind}")
+
+
+def _to_mask(rows, n):
+    if rows.dtype == bool:
+        return rows
+    mask = np.zeros(n, dtype=bool)
+    mask[rows] = True
+    return mask
+
+
+def select_rows(df, predicates, mode='all'):
+    """
+    Posizioni (ordinate) delle righe che soddisfano tutte (mode='all') o almeno una
+    (mode='any') delle condizioni. Nessuna colonna viene copiata.
+    """
+    n = len(df)
+    if not predicates:
+        return np.arange(n)
+    combined = None
+    for predicate in predicates:
+        mask = _to_mask(_predicate_rows(df, predicate), n)
+        if combined is None:
+            combined = mask
+        elif mode == 'any':
+            combined |= mask
+        else:
+            combined &= mask
+    return np.flatnonzero(combined)
+
+
+def apply_filters(df, predicates, mode='all'):
+    """DataFrame filtrato: tutte le condizioni in un'unica selezione di righe (una sola copia)."""
+    rows = select_rows(df, predicates, mode)
+    if len(rows) == len(df):
+        return df
+    return df.take(rows)
+
+
+def describe_predicate(predicate):
+    """Descrizione leggibile di una condizione (per la cronologia e l'elenco dei filtri)."""
+    column = predicate['column']
+    kind = predicate['kind']
+    if kind == 'range':
+        return f"{predicate['low']:g} ≤ '{column}' ≤ {predicate['high']:g}"
+    if kind == 'equal':
+        values = ", ".join(str(v) for v in predicate['values'][:5])
+        more = "…" if len(predicate['values']) > 5 else ""
+        return f"'{column}' in ({values}{more})"
+    return f"'{column}' è NaN" if predicate.get('keep') else f"'{column}' non è NaN"
+
+
+def describe_filters(predicates, mode='all'):
+    joiner = " E " if mode == 'all' else " O "
+    return joiner.join(describe_predicate(p) for p in predicates)
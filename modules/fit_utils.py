@@ -0,0 +1,340 @@
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from modules import peak_utils, pool_utils
+from modules.cache_utils import hash_bytes
+
+# --- Fit multi-picco (gaussiane, lorentziane, pseudo-Voigt) con linea di base ---
+# Levenberg-Marquardt in NumPy con jacobiano analitico. Per una serie di spettri ogni fit parte
+# dai parametri dello spettro precedente (warm start: di solito bastano poche iterazioni);
+# le serie lunghe sono divise in blocchi contigui eseguiti nel pool di processi condiviso, e i
+# risultati sono in cache per impronta dei dati e modello.
+
+# Forme di riga: nome visualizzato -> chiave
+SHAPES = {
+    "Gaussiana": 'gaussian',
+    "Lorentziana": 'lorentzian',
+    "Pseudo-Voigt": 'pseudo_voigt',
+}
+MAX_ITERATIONS = 200
+TOLERANCE = 1e-10
+MAX_CACHED_FITS = 4096
+DEFAULT_WORKERS = pool_utils.DEFAULT_WORKERS
+# Sotto questo numero di curve da calcolare il fit resta in serie: con il warm start
+# bastano pochi millisecondi a curva, meno dello scambio dati con i processi
+PARALLEL_MIN_CURVES = 200
+
+_GAUSS = 4 * np.log(2)  # exp(-_GAUSS u²) vale 1/2 per u = 1/2: la larghezza è la FWHM
+
+
+class FitModel:
+    """
+    Modello: n_peaks picchi della forma scelta (ampiezza, centro, FWHM e, per la pseudo-Voigt,
+    frazione lorentziana) più un polinomio di grado `degree` nella x riscalata in [-1, 1].
+    La riscalatura è fissata per tutta la serie, così i parametri passano da uno spettro all'altro.
+    """
+
+    def __init__(self, shape, n_peaks, degree, x_min, x_max):
+        if shape not in SHAPES.values():
+            raise ValueError(f"Forma di riga sconosciuta: {shape}")
+        self.shape = shape
+        self.n_peaks = int(n_peaks)
+        self.degree = int(degree)
+        self.center = (x_max + x_min) / 2
+        self.scale = ((x_max - x_min) / 2) or 1.0
+        self.span = (x_max - x_min) or 1.0
+        self.x_min, self.x_max = x_min, x_max
+
+    @property
+    def per_peak(self):
+        return 4 if self.shape == 'pseudo_voigt' else 3
+
+    @property
+    def key(self):
+        return (self.shape, self.n_peaks, self.degree, self.center, self.scale)
+
+    def split(self, params):
+        """Vettore dei parametri -> (picchi (n_peaks x per_peak), coefficienti della linea di base)."""
+        cut = self.n_peaks * self.per_peak
+        return params[:cut].reshape(self.n_peaks, self.per_peak), params[cut:]
+
+    def bounds(self, dx):
+        """
+        Limiti dei parametri (inferiori, superiori): ampiezze >= 0, centri nell'intervallo,
+        FWHM tra dx e l'intero intervallo, frazione lorentziana in [0, 1]; linea di base libera.
+        """
+        low = np.full((self.n_peaks, self.per_peak), -np.inf)
+        high = np.full((self.n_peaks, self.per_peak), np.inf)
+        low[:, 0] = 0
+        low[:, 1], high[:, 1] = self.x_min, self.x_max
+        low[:, 2], high[:, 2] = dx, self.span
+        if self.per_peak == 4:
+            low[:, 3], high[:, 3] = 0, 1
+        free = np.full(self.degree + 1, np.inf)
+        return np.concatenate([low.ravel(), -free]), np.concatenate([high.ravel(), free])
+
+    def profiles(self, x, peaks):
+        """Profili unitari dei picchi (n_peaks x n) e loro derivata rispetto a u = (x - c) / w."""
+        u = (x[None, :] - peaks[:, 1, None]) / peaks[:, 2, None]
+        if self.shape == 'lorentzian':
+            lorentz = 1 / (1 + 4 * u * u)
+            return lorentz, -8 * u * lorentz * lorentz, u, None
+        gauss = np.exp(-_GAUSS * u * u)
+        if self.shape == 'gaussian':
+            return gauss, -2 * _GAUSS * u * gauss, u, None
+        lorentz = 1 / (1 + 4 * u * u)
+        eta = peaks[:, 3, None]
+        profile = eta * lorentz + (1 - eta) * gauss
+        slope = eta * (-8 * u * lorentz * lorentz) + (1 - eta) * (-2 * _GAUSS * u * gauss)
+        return profile, slope, u, lorentz - gauss
+
+    def baseline_matrix(self, x):
+        return np.vander((x - self.center) / self.scale, self.degree + 1, increasing=True)
+
+    def evaluate(self, x, params, jacobian=False):
+        """Modello in x; con jacobian=True anche la matrice delle derivate (n x parametri)."""
+        peaks, coeffs = self.split(params)
+        profile, slope, u, mix = self.profiles(x, peaks)
+        basis = self.baseline_matrix(x)
+        values = peaks[:, 0] @ profile + basis @ coeffs
+        if not jacobian:
+            return values
+        amplitude, width = peaks[:, 0, None], peaks[:, 2, None]
+        columns = [profile, -amplitude * slope / width, -amplitude * slope * u / width]
+        if mix is not None:
+            columns.append(amplitude * mix)
+        derivatives = np.stack(columns, axis=1).reshape(-1, len(x))  # picco per picco, come i parametri
+        return values, np.hstack([derivatives.T, basis])
+
+    def components(self, x, params):
+        """Linea di base e singoli picchi (n_peaks x n) per il grafico."""
+        peaks, coeffs = self.split(params)
+        profile = self.profiles(x, peaks)[0]
+        return self.baseline_matrix(x) @ coeffs, peaks[:, 0, None] * profile
+
+
+def initial_guess(model, x, y):
+    """
+    Parametri iniziali dai picchi più prominenti (posizione, prominenza, FWHM misurata) e
+    linea di base costante al 10° percentile. Se i picchi trovati sono meno di quelli richiesti,
+    i restanti partono con ampiezza nulla distribuiti nell'intervallo.
+    """
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+    order = np.argsort(x)
+    x, y = x[order], y[order]
+    found = peak_utils.find_peaks(y, x)
+    best = np.argsort(found['prominence'])[::-1][:model.n_peaks]
+    dx = float(np.median(np.diff(x))) if len(x) > 1 else 1.0
+    peaks = np.zeros((model.n_peaks, model.per_peak))
+    peaks[:, 1] = np.linspace(model.x_min, model.x_max, model.n_peaks + 2)[1:-1]
+    peaks[:, 2] = max(model.span / (4 * max(model.n_peaks, 1)), dx)
+    peaks[:len(best), 0] = found['prominence'][best]
+    peaks[:len(best), 1] = found['x'][best]
+    peaks[:len(best), 2] = np.maximum(found['width'][best], dx)
+    if model.per_peak == 4:
+        peaks[:, 3] = 0.5
+    coeffs = np.zeros(model.degree + 1)
+    coeffs[0] = np.percentile(y, 10) if len(y) else 0.0
+    return np.concatenate([peaks.ravel(), coeffs])
+
+
+def levenberg_marquardt(model, x, y, params, max_iterations=MAX_ITERATIONS, tolerance=TOLERANCE):
+    """
+    Minimi quadrati non lineari con smorzamento adattivo e vincoli a scatola. I parametri
+    fermi su un limite verso cui il gradiente spinge sono esclusi dal passo (colonna del
+    jacobiano azzerata): senza, la proiezione annullerebbe ogni passo e il fit si bloccherebbe.
+    """
+    dx = float(np.median(np.abs(np.diff(x)))) if len(x) > 1 else 1.0
+    low, high = model.bounds(dx)
+    params = np.clip(np.array(params, dtype=np.float64), low, high)
+    values, jac = model.evaluate(x, params, jacobian=True)
+    residual = y - values
+    cost = residual @ residual
+    damping = 1e-3
+    iterations = 0
+    converged = False
+    for iterations in range(1, max_iterations + 1):
+        gradient = jac.T @ residual
+        active = ((params <= low) & (gradient < 0)) | ((params >= high) & (gradient > 0))
+        if active.any():
+            jac = jac.copy()
+            jac[:, active] = 0
+            gradient[active] = 0
+        normal = jac.T @ jac
+        diagonal = np.diag(normal).copy()
+        diagonal[diagonal == 0] = 1.0
+        improved = False
+        while damping < 1e12:
+            try:
+                step = np.linalg.solve(normal + damping * np.diag(diagonal), gradient)
+            except np.linalg.LinAlgError:
+                damping *= 10
+                continue
+            candidate = np.clip(params + step, low, high)
+            new_values, new_jac = model.evaluate(x, candidate, jacobian=True)
+            new_residual = y - new_values
+            new_cost = new_residual @ new_residual
+            if new_cost < cost:
+                improved = True
+                break
+            damping *= 4
+        if not improved:
+            converged = True  # Nessun passo riduce ancora il residuo: minimo locale
+            break
+        decrease = (cost - new_cost) / max(cost, 1e-300)
+        params, jac, residual, cost = candidate, new_jac, new_residual, new_cost
+        damping = max(damping / 3, 1e-12)
+        if decrease < tolerance:
+            converged = True
+            break
+    total = y - y.mean()
+    r2 = 1 - cost / (total @ total) if len(y) > 1 and total @ total > 0 else 1.0
+    return {
+        'params': params,
+        'r2': float(r2),
+        'rmse': float(np.sqrt(cost / max(len(y), 1))),
+        'iterations': iterations,
+        'converged': converged,
+    }
+
+
+def _clean(x, y):
+    valid = ~(np.isnan(x) | np.isnan(y))
+    return x[valid], y[valid]
+
+
+def fit_chunk(job):
+    """
+    Fit di spettri consecutivi (eseguibile in un processo del pool): il primo parte da
+    `start`, ognuno dei successivi dai parametri del precedente. Le curve con meno punti
+    che parametri non si adattano (risultato con R² NaN) e non cambiano la partenza.
+    job = (chiave del modello, x_min, x_max, [(x, y), ...], parametri di partenza).
+    """
+    (shape, n_peaks, degree, _, _), x_min, x_max, curves, start = job
+    model = FitModel(shape, n_peaks, degree, x_min, x_max)
+    results = []
+    params = start
+    n_params = len(start)
+    for x, y in curves:
+        if len(x) < n_params:
+            results.append({'params': np.full(n_params, np.nan), 'r2': np.nan, 'rmse': np.nan,
+                            'iterations': 0, 'converged': False})
+            continue
+        result = levenberg_marquardt(model, x, y, params)
+        params = result['params']
+        results.append(result)
+    return results
+
+
+class _FitCache:
+    """Risultati dei fit per (impronta di x e y, modello): LRU condivisa tra le sessioni."""
+
+    def __init__(self, max_items=MAX_CACHED_FITS):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+            return None
+
+    def put(self, key, result):
+        with self._lock:
+            self._items[key] = result
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+_fit_cache = _FitCache()
+
+def fit_series(x, values, shape='gaussian', n_peaks=3, degree=1, max_workers=1, warm_start=True, use_cache=True,
+               min_parallel_curves=PARALLEL_MIN_CURVES):
+    """
+    Fit di tutte le curve (righe di values, x per riga o comune; NaN ignorati) con lo stesso
+    modello. I parametri iniziali vengono dallo spettro medio; poi ogni curva parte da quella
+    precedente. Le curve già in cache non si ricalcolano (e fanno da partenza per le vicine);
+    le altre sono divise in blocchi contigui, uno per processo, solo se sono almeno
+    min_parallel_curves (altrimenti in serie nel processo corrente).
+    Restituisce (modello, lista di risultati nell'ordine delle curve).
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    x = np.broadcast_to(np.asarray(x, dtype=np.float64), values.shape)
+    curves = [_clean(x[i], values[i]) for i in range(len(values))]
+    valid_x = x[~np.isnan(x)]
+    if not len(valid_x):
+        raise ValueError("Nessun valore di x valido da adattare.")
+    model = FitModel(shape, n_peaks, degree, float(valid_x.min()), float(valid_x.max()))
+
+    # Stima iniziale dallo spettro medio se le curve hanno le stesse x, altrimenti dalla più lunga
+    if len(values) > 1 and np.array_equal(x, np.broadcast_to(x[0], x.shape), equal_nan=True):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # Posizioni senza dati in nessuna curva
+            start = initial_guess(model, x[0], np.nanmean(values, axis=0))
+    else:
+        start = initial_guess(model, *max(curves, key=lambda curve: len(curve[0])))
+
+    keys = [(hash_bytes(cx.tobytes() + cy.tobytes()), model.key) for cx, cy in curves]
+    results = [_fit_cache.get(key) if use_cache else None for key in keys]
+
+    # Tratti contigui di curve da calcolare, ognuno con la propria partenza
+    runs = []
+    i = 0
+    while i < len(curves):
+        if results[i] is not None:
+            i += 1
+            continue
+        j = i
+        while j < len(curves) and results[j] is None:
+            j += 1
+        previous = results[i - 1]['params'] if i > 0 else None
+        usable = warm_start and previous is not None and not np.isnan(previous).any()
+        runs.append((i, j, previous if usable else start))
+        i = j
+
+    # I tratti lunghi si dividono in blocchi per i processi: ogni blocco riparte dalla stima
+    # iniziale. Senza warm start ogni curva è un blocco a sé.
+    pending = sum(j - i for i, j, _ in runs)
+    if pending < min_parallel_curves:
+        max_workers = 1
+    chunk = max(1, -(-pending // max(max_workers, 1))) if warm_start else 1
+    jobs, targets = [], []
+    for i, j, run_start in runs:
+        for first in range(i, j, chunk):
+            last = min(first + chunk, j)
+            jobs.append((model.key, model.x_min, model.x_max, curves[first:last], run_start if first == i else start))
+            targets.append(range(first, last))
+    for target, chunk_results in zip(targets, pool_utils.run_jobs(fit_chunk, jobs, max_workers)):
+        for k, result in zip(target, chunk_results):
+            results[k] = result
+            if use_cache:
+                _fit_cache.put(keys[k], result)
+    return model, results
+
+
+def fit_table(labels, model, results):
+    """
+    Tabella dei fit: una riga per curva con R², RMSE, convergenza (False se il fit si è fermato
+    al limite di iterazioni) e i parametri dei picchi ordinati per centro.
+    """
+    rows = []
+    for label, result in zip(labels, results):
+        peaks, _ = model.split(result['params'])
+        peaks = peaks[np.argsort(peaks[:, 1])]
+        row = {'Curva': label, 'R²': result['r2'], 'RMSE': result['rmse'], 'Iterazioni': result['iterations'],
+               'Convergenza': result['converged']}
+        for k, peak in enumerate(peaks, start=1):
+            row[f"Centro {k}"] = peak[1]
+            row[f"Ampiezza {k}"] = peak[0]
+            row[f"FWHM {k}"] = peak[2]
+            if model.per_peak == 4:
+                row[f"Frazione L. {k}"] = peak[3]
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,259 @@
+import ast
+import difflib
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from modules import signal_utils
+
+# numexpr è opzionale: valuta le espressioni aritmetiche in un solo passaggio, a blocchi e multi-thread
+try:
+    import numexpr
+    HAS_NUMEXPR = True
+except ImportError:
+    HAS_NUMEXPR = False
+
+# --- Motore della calcolatrice: formule compilate una volta e valutate in modo vettoriale ---
+
+# Funzioni disponibili nelle formule: nome -> funzione NumPy (vettoriale)
+FUNCTIONS = {
+    'log': np.log, 'log10': np.log10, 'log2': np.log2, 'log1p': np.log1p, 'exp': np.exp,
+    'sqrt': np.sqrt, 'abs': np.abs, 'sign': np.sign,
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+    'arcsin': np.arcsin, 'arccos': np.arccos, 'arctan': np.arctan, 'arctan2': np.arctan2,
+    'sinh': np.sinh, 'cosh': np.cosh, 'tanh': np.tanh,
+    'floor': np.floor, 'ceil': np.ceil, 'round': np.round,
+    'minimum': np.minimum, 'maximum': np.maximum, 'clip': np.clip,
+    'where': np.where, 'isnan': np.isnan,
+}
+# Funzioni su finestre e su tutto l'array (smoothing, derivate, integrali, FFT, linea di base)
+FUNCTIONS.update(signal_utils.SIGNAL_FUNCTIONS)
+
+CONSTANTS = {'pi': np.pi, 'e': np.e, 'nan': np.nan, 'inf': np.inf}
+
+# Funzioni per cui numexpr conviene (stessi nomi in NumPy): solo queste formule passano da numexpr.
+# Le trigonometriche inverse sono escluse: in numexpr sono più lente delle versioni SIMD di NumPy.
+NUMEXPR_FUNCTIONS = {
+    'log', 'log10', 'log1p', 'exp', 'sqrt', 'abs', 'sin', 'cos', 'tan', 'where', 'floor', 'ceil',
+}
+# Sotto questa dimensione l'avvio di numexpr costa più del calcolo
+NUMEXPR_MIN_ROWS = 100_000
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load,
+    ast.Constant, ast.keyword,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.USub, ast.UAdd, ast.Invert, ast.BitAnd, ast.BitOr, ast.BitXor,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+_NUMEXPR_NODES = tuple(n for n in _ALLOWED_NODES if n not in (ast.FloorDiv, ast.keyword, ast.BitXor))
+
+# "Nome = espressione": il primo '=' che non fa parte di ==, <=, >=, !=
+_ASSIGNMENT = re.compile(r'^\s*(`[^`]+`|[^=`]+?)\s*(?<![<>!=])=(?!=)\s*(.+?)\s*$')
+_BACKTICK = re.compile(r'`([^`]+)`')
+_IDENTIFIER = re.compile(r'[A-Za-z_]\w*')
+
+
+class CompiledFormula:
+    """
+    Una formula già analizzata: albero sintattico validato, colonne citate e codice compilato.
+    Non dipende dal DataFrame, quindi si può riusare (è in cache per testo della formula).
+    """
+
+    def __init__(self, target, expression, tree, names, aliases, use_numexpr):
+        self.target = target
+        self.expression = expression
+        self.names = names  # Nomi citati (colonne o risultati di formule precedenti)
+        self.functions = {node.func.id for node in ast.walk(tree) if isinstance(node, ast.Call)}
+        self._aliases = aliases  # Identificatore interno -> nome colonna (nomi tra apici inversi)
+        self.use_numexpr = use_numexpr
+        self._numexpr_source = ast.unparse(tree) if use_numexpr else None
+        self._code = compile(tree, '<formula>', 'eval')
+
+    def evaluate(self, values, n_rows):
+        """values: nome -> array. Restituisce un array di n_rows elementi."""
+        local = {identifier: values[name] for identifier, name in self._aliases.items()}
+        aliased = self._aliases.values()
+        local.update((name, values[name]) for name in self.names
+                     if name.isidentifier() and name not in aliased and name in values)
+        result = None
+        if self.use_numexpr and n_rows >= NUMEXPR_MIN_ROWS:
+            try:
+                result = numexpr.evaluate(self._numexpr_source, local_dict={**CONSTANTS, **local}, global_dict={})
+            except (TypeError, ValueError, KeyError, NotImplementedError):
+                result = None  # Tipi non gestiti da numexpr (es. colonne di testo): si passa a NumPy
+        if result is None:
+            # L'albero è già stato validato: nessun builtin, solo funzioni e nomi ammessi
+            result = eval(self._code, {'__builtins__': {}, **CONSTANTS, **FUNCTIONS, **local})
+        result = np.asarray(result)
+        if result.ndim == 0:  # Formula costante: la si ripete su tutte le righe
+            return np.full(n_rows, result[()])
+        if result.shape != (n_rows,):
+            raise ValueError(f"La formula per '{self.target}' produce {result.size} valori invece di {n_rows}.")
+        return result
+
+
+def split_assignment(line):
+    """'Nome = espressione' -> (nome, espressione). Gli spazi nel nome diventano '_'."""
+    match = _ASSIGNMENT.match(line)
+    if not match:
+        raise ValueError("Formula non valida. Manca '='. Es: `NuovaCol = Colonna_A * 2`")
+    target = match.group(1).strip().strip('`').strip().replace(" ", "_")
+    if not target:
+        raise ValueError("Formula incompleta. Assicurati di specificare un nome e un'espressione.")
+    return target, match.group(2)
+
+
+def split_formulas(text):
+    """Righe di un blocco di formule: una per riga, righe vuote e commenti (#) ignorati."""
+    return [split_assignment(line) for line in text.splitlines() if line.strip() and not line.strip().startswith('#')]
+
+
+@lru_cache(maxsize=256)
+def compile_formula(target, expression):
+    """
+    Analizza l'espressione (una volta sola: il risultato è in cache per testo) e la valida:
+    sono ammessi solo operatori aritmetici/di confronto, numeri, nomi e le funzioni di FUNCTIONS.
+    Un nome è una funzione solo se viene chiamato: altrove è una colonna (o una costante),
+    anche se coincide con il nome di una funzione. I nomi che iniziano con '__' sono rifiutati.
+    """
+    aliases = {}
+    taken = set(_IDENTIFIER.findall(expression))
+
+    def _new_alias(name):
+        # Identificatore interno per una colonna: senza '__' (numexpr rifiuta quei nomi)
+        # e diverso da ogni nome scritto nella formula
+        if name not in aliases:
+            number = len(aliases)
+            while f"_c{number}_" in taken:
+                number += 1
+            aliases[name] = f"_c{number}_"
+            taken.add(aliases[name])
+        return aliases[name]
+
+    def _alias(match):
+        name = match.group(1)
+        if name.isidentifier() and not name.startswith('__'):
+            return name
+        return _new_alias(name)
+
+    source = _BACKTICK.sub(_alias, expression)
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Errore di sintassi in '{expression}': {e.msg}. Se un nome ha spazi, usa `` `Nome Colonna` ``.")
+
+    tree = ast.fix_missing_locations(_BooleanToBitwise().visit(tree))
+    reverse = {identifier: name for name, identifier in aliases.items()}
+    called = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    names = []
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Elemento non consentito nella formula '{expression}': {type(node).__name__}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                func = getattr(node.func, 'id', ast.unparse(node.func))
+                raise ValueError(f"Funzione sconosciuta: '{func}'.{_suggest(func, FUNCTIONS)}")
+        elif isinstance(node, ast.Name) and id(node) not in called:
+            if node.id.startswith('__') and node.id not in reverse:
+                raise ValueError(f"Nome non consentito nella formula '{expression}': {node.id}")
+            if node.id in FUNCTIONS:
+                # Colonna con il nome di una funzione: un identificatore interno evita che
+                # nella valutazione la colonna nasconda la funzione (o viceversa)
+                identifier = _new_alias(node.id)
+                reverse[identifier] = node.id
+                node.id = identifier
+            name = reverse.get(node.id, node.id)
+            if name not in names:
+                names.append(name)
+        elif isinstance(node, ast.Compare) and len(node.ops) > 1:
+            raise ValueError(f"Confronti concatenati non supportati in '{expression}': usa (a < b) & (b < c).")
+        elif isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float, str))):
+            raise ValueError(f"Valore non consentito nella formula '{expression}': {node.value!r}")
+
+    return CompiledFormula(target, expression, tree, names, reverse, _numexpr_compatible(tree))
+
+
+def _numexpr_compatible(tree):
+    if not HAS_NUMEXPR:
+        return False
+    for node in ast.walk(tree):
+        if not isinstance(node, _NUMEXPR_NODES):
+            return False
+        if isinstance(node, ast.Call) and node.func.id not in NUMEXPR_FUNCTIONS:
+            return False
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return False
+    return True
+
+
+class _BooleanToBitwise(ast.NodeTransformer):
+    """and / or / not (sintassi di DataFrame.eval) -> & | ~, che funzionano elemento per elemento."""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = ast.BinOp(left=result, op=op, right=value)
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=node.operand)
+        return node
+
+
+def _suggest(name, candidates):
+    close = difflib.get_close_matches(name, list(candidates), n=3)
+    return f" Forse intendevi: {', '.join(close)}?" if close else ""
+
+
+def referenced_columns(formulas, columns):
+    """Colonne di partenza lette da un blocco di formule (esclusi i risultati del blocco stesso)."""
+    created, used = set(), []
+    for target, expression in formulas:
+        for name in compile_formula(target, expression).names:
+            if name in columns and name not in created and name not in used:
+                used.append(name)
+        created.add(target)
+    return used
+
+
+def row_local(formulas):
+    """
+    True se ogni formula calcola una riga solo dai valori della stessa riga: nessuna funzione
+    di segnale (finestre, derivate, integrali, FFT leggono anche le righe vicine).
+    """
+    return not any(compile_formula(target, expression).functions & signal_utils.SIGNAL_FUNCTIONS.keys()
+                   for target, expression in formulas)
+
+
+def evaluate_formulas(df, formulas):
+    """
+    Valuta un blocco di formule [(nome, espressione), ...] in un solo passaggio:
+    ogni formula vede le colonne di df e i risultati delle formule precedenti.
+    Restituisce {nome: array}; df non viene modificato né copiato
+    (basta un unico df.assign alla fine).
+    """
+    results = {}
+    columns = set(df.columns)
+    for target, expression in formulas:
+        compiled = compile_formula(target, expression)
+        if target in columns or target in results:
+            raise ValueError(f"Errore: La colonna '{target}' esiste già.")
+        values = {}
+        for name in compiled.names:
+            if name in results:
+                values[name] = results[name]
+            elif name in columns:
+                values[name] = df[name].to_numpy()
+            elif name in CONSTANTS:
+                continue
+            else:
+                raise ValueError(f"Errore: Nome colonna non trovato: '{name}'. Controlla maiuscole/minuscole."
+                                 f"{_suggest(name, list(columns) + list(results))}")
+        results[target] = compiled.evaluate(values, len(df))
+    return results
@@ -0,0 +1,295 @@
+from collections import OrderedDict
+
+import pandas as pd
+
+from modules import formula_engine, filter_engine, dedup_utils, resample_utils
+from modules.cache_utils import column_token
+
+# --- Pipeline del processamento: passi riproducibili sui dati originali ---
+
+# Risultati intermedi conservati (LRU): il ricalcolo riparte dal più vicino
+MAX_CACHED_RESULTS = 8
+
+# Registro delle operazioni: tipo -> funzione(df, **parametri) che restituisce un nuovo DataFrame.
+# Le funzioni non devono modificare df: la pipeline deve poterle rieseguire.
+OPERATIONS = {}
+# Operazioni che aggiungono colonne: tipo -> funzione(df, **parametri) con le colonne lette.
+# Per queste la funzione registrata restituisce solo {nome: valori} delle colonne nuove.
+COLUMN_READS = {}
+# Operazioni riga per riga: tipo -> True o funzione(**parametri) che lo decide.
+# Ogni riga del risultato dipende solo dalla stessa riga dell'input, quindi le righe accodate
+# si possono processare da sole e aggiungere al risultato precedente.
+ROW_LOCAL = {}
+
+
+def operation(kind, row_local=False):
+    """Decoratore: registra una funzione come operazione riproducibile della pipeline."""
+    def register(func):
+        OPERATIONS[kind] = func
+        ROW_LOCAL[kind] = row_local
+        return func
+    return register
+
+
+def column_operation(kind, reads, row_local=False):
+    """
+    Decoratore per le operazioni che aggiungono colonne calcolate da altre (reads(df, **parametri)).
+    Se nel ricalcolo le colonne lette sono gli stessi array della volta precedente,
+    le colonne prodotte vengono riusate senza rieseguire il calcolo.
+    """
+    def register(func):
+        OPERATIONS[kind] = func
+        COLUMN_READS[kind] = reads
+        ROW_LOCAL[kind] = row_local
+        return func
+    return register
+
+
+# Dipende dalle righe già viste: le righe accodate vanno confrontate con tutte le altre
+@operation('drop_duplicates')
+def _drop_duplicates(df, columns=None, tolerance=0.0):
+    return dedup_utils.drop_duplicates(df, columns, tolerance)
+
+
+@operation('rename', row_local=True)
+def _rename(df, old, new):
+    return df.rename(columns={old: new}, errors='raise')
+
+
+@operation('drop_column', row_local=True)
+def _drop_column(df, column):
+    return df.drop(columns=[column])
+
+
+@column_operation('formula', reads=lambda df, name, expression: formula_engine.referenced_columns([(name, expression)], df.columns),
+                  row_local=lambda name, expression: formula_engine.row_local([(name, expression)]))
+def _formula(df, name, expression):
+    return formula_engine.evaluate_formulas(df, [(name, expression)])
+
+
+@column_operation('formula_block', reads=lambda df, text: formula_engine.referenced_columns(formula_engine.split_formulas(text), df.columns),
+                  row_local=lambda text: formula_engine.row_local(formula_engine.split_formulas(text)))
+def _formula_block(df, text):
+    # Tutte le formule in un passaggio: le colonne intermedie non creano DataFrame intermedi
+    return formula_engine.evaluate_formulas(df, formula_engine.split_formulas(text))
+
+
+@operation('filter', row_local=True)
+def _filter(df, predicates, mode='all'):
+    # Tutte le condizioni in un'unica selezione di righe: una sola copia per passo
+    return filter_engine.apply_filters(df, predicates, mode)
+
+
+@operation('resample')
+def _resample(df, x, columns, method='linear', start=None, stop=None, points=None, grid=None, by_source=False):
+    # Griglia uniforme (start, stop, points) oppure valori indicati dall'utente
+    if grid is None:
+        grid = resample_utils.uniform_grid(start, stop, points)
+    return resample_utils.resample_frame(df, x, columns, grid, method, by_source)
+
+
+class Step:
+    """
+    Un nodo della pipeline: tipo di operazione, parametri ed etichetta da mostrare.
+    Per le operazioni che aggiungono colonne conserva l'ultimo calcolo (memo) insieme
+    all'identità delle colonne lette.
+    """
+
+    def __init__(self, kind, params, label):
+        self.kind = kind
+        self.params = dict(params)
+        self.label = label
+        self._memo = None  # (identità degli input, riferimenti agli input, colonne prodotte)
+
+    def apply(self, df):
+        if self.kind not in COLUMN_READS:
+            return OPERATIONS[self.kind](df, **self.params)
+
+        inputs = [df.index] + [df[c] for c in COLUMN_READS[self.kind](df, **self.params)]
+        tokens = [column_token(values) for values in inputs]
+        if self._memo is not None and None not in tokens and self._memo[0] == tokens:
+            columns = self._memo[2]
+        else:
+            columns = OPERATIONS[self.kind](df, **self.params)
+            # I riferimenti agli input tengono vivi i buffer: gli indirizzi restano validi
+            self._memo = (tokens, inputs, columns)
+        return df.assign(**columns)
+
+    @property
+    def row_local(self):
+        """True se il passo si può applicare alle sole righe accodate (vedi ROW_LOCAL)."""
+        rule = ROW_LOCAL.get(self.kind, False)
+        return rule(**self.params) if callable(rule) else rule
+
+    def update(self, params, label=None):
+        self.params.update(params)
+        if label is not None:
+            self.label = label
+        self._memo = None
+
+
+class ProcessingHistory:
+    """
+    Stato del processamento come pipeline di passi sopra il DataFrame originale (mai modificato).
+
+    Il risultato è calcolato in modo pigro e memoizzato: i risultati intermedi restano in una
+    cache LRU (MAX_CACHED_RESULTS) e le colonne non toccate sono condivise grazie al copy-on-write.
+    Annulla/ripeti spostano solo il cursore; modificare o rimuovere un passo invalida i soli
+    risultati a valle, e nel ricalcolo le colonne calcolate i cui input non sono cambiati
+    vengono riusate. Il reset è il ritorno al passo 0 (e si può annullare con "Ripeti").
+    """
+
+    def __init__(self, original, max_cached=MAX_CACHED_RESULTS):
+        self.original = original
+        self.steps = []
+        self.cursor = 0  # Numero di passi applicati: steps[cursor:] sono i passi da "ripetere"
+        self.max_cached = max_cached
+        self.results = OrderedDict()  # Numero di passi -> DataFrame risultante
+
+    @property
+    def current(self):
+        """DataFrame dopo i primi `cursor` passi (calcolato solo se non è in cache)."""
+        return self._materialize(self.cursor)
+
+    @property
+    def can_undo(self):
+        return self.cursor > 0
+
+    @property
+    def can_redo(self):
+        return self.cursor < len(self.steps)
+
+    def apply(self, kind, label, **params):
+        """
+        Esegue un nuovo passo sul DataFrame corrente e lo registra.
+        Se l'operazione solleva un'eccezione la pipeline resta invariata.
+        I passi annullati (non ancora ripetuti) vengono scartati.
+        """
+        step = Step(kind, params, label)
+        df = step.apply(self.current)
+
+        del self.steps[self.cursor:]
+        self._invalidate(self.cursor + 1)
+        self.steps.append(step)
+        self.cursor += 1
+        self._store(self.cursor, df)
+        return df
+
+    def undo(self):
+        if self.can_undo:
+            self.goto(self.cursor - 1)
+        return self.current
+
+    def redo(self):
+        if self.can_redo:
+            self.goto(self.cursor + 1)
+        return self.current
+
+    def reset(self):
+        """Torna ai dati originali senza copiarli; i passi restano disponibili per "Ripeti"."""
+        return self.goto(0)
+
+    def goto(self, target):
+        """Porta la pipeline al passo target (0 = dati originali)."""
+        self.cursor = max(0, min(int(target), len(self.steps)))
+        return self.current
+
+    def edit_step(self, index, label=None, **params):
+        """
+        Cambia i parametri del passo index (0 = primo passo) e ricalcola solo i passi a valle.
+        Se il ricalcolo fallisce il passo torna com'era e l'eccezione viene rilanciata.
+        """
+        step = self.steps[index]
+        previous = (dict(step.params), step.label, step._memo)
+        step.update(params, label)
+        stale = self._invalidate(index + 1)
+        try:
+            return self.current
+        except Exception:
+            step.params, step.label, step._memo = previous
+            self._invalidate(index + 1)
+            self.results.update(stale)
+            raise
+
+    def remove_step(self, index):
+        """Rimuove il passo index e ricalcola i passi a valle (stessa gestione degli errori)."""
+        step = self.steps.pop(index)
+        cursor = self.cursor
+        if index < self.cursor:
+            self.cursor -= 1
+        stale = self._invalidate(index + 1)
+        try:
+            return self.current
+        except Exception:
+            self.steps.insert(index, step)
+            self.cursor = cursor
+            self._invalidate(index + 1)
+            self.results.update(stale)
+            raise
+
+    def rebase(self, original, appended=0):
+        """
+        Nuovi dati originali con le stesse colonne (es. righe accodate in modalità "segui file"):
+        anche le righe nuove passano da filtri e formule. Se le ultime `appended` righe sono
+        state solo accodate e tutti i passi applicati sono riga per riga, i passi girano sulle
+        sole righe nuove e il risultato viene accodato a quello corrente; altrimenti si
+        rieseguono tutti i passi.
+        """
+        previous = self.results.get(self.cursor) if self.cursor else None
+        incremental = (previous is not None and appended > 0 and self.original is not None
+                       and len(self.original) + appended == len(original)
+                       and all(step.row_local for step in self.steps[:self.cursor]))
+        if incremental:
+            df = original.iloc[len(self.original):]
+            for step in self.steps[:self.cursor]:
+                df = step.apply(df)
+            current = pd.concat([previous, df])
+        self.original = original
+        self.results.clear()
+        if incremental:
+            self._store(self.cursor, current)
+        return self.current
+
+    def release(self):
+        """Libera risultati intermedi e memo (i dati della sessione vengono scaricati su disco)."""
+        self.original = None
+        self.results.clear()
+        for step in self.steps:
+            step._memo = None
+
+    def reattach(self, original, current):
+        """Ricollega la pipeline ai dati ricaricati dal disco: il risultato corrente non va ricalcolato."""
+        self.original = original
+        if self.cursor:
+            self._store(self.cursor, current)
+
+    def _materialize(self, target):
+        if target == 0:
+            return self.original
+        if target in self.results:
+            self.results.move_to_end(target)
+            return self.results[target]
+        # Si riparte dal risultato in cache più vicino prima di target
+        base = max((i for i in self.results if i < target), default=0)
+        df = self.results[base] if base else self.original
+        for i in range(base, target):
+            df = self.steps[i].apply(df)
+            self._store(i + 1, df)
+        return df
+
+    def _store(self, index, df):
+        self.results[index] = df
+        self.results.move_to_end(index)
+        while len(self.results) > self.max_cached:
+            self.results.popitem(last=False)
+
+    def _invalidate(self, first):
+        """Scarta i risultati da `first` passi in poi; restituisce quelli scartati."""
+        stale = {i: df for i, df in self.results.items() if i >= first}
+        for i in stale:
+            del self.results[i]
+        return stale
+
+    def labels(self):
+        """Etichette dei passi, con l'indicazione di quelli applicati."""
+        return [(step.label, i < self.cursor) for i, step in enumerate(self.steps)]
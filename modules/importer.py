@@ -1,7 +1,209 @@
 import streamlit as st
-import pandas as pd
-from io import StringIO
-import re # Necessario per le espressioni regolari (regex)
+import time
+from modules import parse_utils, cache_utils, local_file_utils, spectra_utils, memory_utils
+
+# streamlit_js_eval serve solo per il selettore file dell'app desktop
+try:
+    from streamlit_js_eval import streamlit_js_eval
+except ImportError:
+    streamlit_js_eval = None
+
+def _stream_text_file(uploaded_file, delimiter, skip_rows, header_arg):
+    """
+    Importa un file di testo a blocchi mostrando barra di avanzamento,
+    conteggio righe e anteprima delle prime righe mentre il resto si carica.
+    Limita la memoria solo per i file aperti da disco: un file caricato via upload
+    è già interamente in memoria.
+    """
+    progress_bar = st.progress(0.0, text=f"Lettura di '{uploaded_file.name}'...")
+    row_counter = st.empty()
+    preview_slot = st.empty()
+    preview_shown = [False]
+
+    def _on_progress(bytes_read, total_bytes, n_rows, store):
+        fraction = bytes_read / total_bytes if total_bytes else 1.0
+        progress_bar.progress(min(fraction, 1.0), text=f"Lettura di '{uploaded_file.name}': {fraction:.0%}")
+        row_counter.caption(f"Righe caricate: **{n_rows:,}**")
+        if not preview_shown[0] and n_rows > 0:
+            preview_slot.dataframe(store.preview(parse_utils.PREVIEW_ROWS))
+            preview_shown[0] = True
+
+    try:
+        return parse_utils.stream_text_table(
+            uploaded_file, delimiter, skip_rows, header_arg, on_progress=_on_progress
+        )
+    finally:
+        progress_bar.empty()
+        row_counter.empty()
+        preview_slot.empty()
+
+
+def _local_files_panel():
+    """
+    Apertura diretta da disco (app desktop): i percorsi arrivano dal dialogo nativo
+    di pywebview (Api.pick_local_files) oppure scritti a mano, uno per riga.
+    I file non passano dall'upload HTTP: vengono letti/mappati dal disco.
+    Solo nella build desktop: sul server condiviso il pannello non viene mostrato.
+    """
+    if not local_file_utils.desktop_mode():
+        return []
+
+    # Risposta del dialogo: va gestita prima di creare il campo di testo dei percorsi
+    pick_key = st.session_state.get('local_pick_key')
+    if pick_key and streamlit_js_eval is not None:
+        picked = streamlit_js_eval(js_expressions=local_file_utils.PICK_FILES_JS, key=pick_key)
+        if picked is not None:
+            st.session_state.local_pick_key = None
+            if picked == local_file_utils.NO_DESKTOP:
+                st.warning("Il selettore file è disponibile solo nell'app desktop: scrivi i percorsi nel campo qui sotto.")
+            elif picked:
+                st.session_state.local_file_paths = "\n".join(picked)
+
+    col_paths, col_browse = st.columns([4, 1])
+    with col_browse:
+        if streamlit_js_eval is not None and st.button("Sfoglia...", use_container_width=True,
+                                                       help="Apre il dialogo file del sistema (solo app desktop)."):
+            st.session_state.local_pick_key = f"local_pick_{time.time_ns()}"
+            st.rerun()
+    with col_paths:
+        paths_text = st.text_area(
+            "Apri da disco (percorsi dei file, uno per riga)",
+            key="local_file_paths",
+            height=68,
+            help="I file vengono letti direttamente dal disco, senza upload: nessun limite di dimensione."
+        )
+
+    col_follow, col_interval = st.columns([4, 1])
+    with col_follow:
+        st.checkbox(
+            "Segui file (acquisizione in corso)",
+            key="follow_mode",
+            help="Per un solo file locale CSV/TXT o ASC: vengono lette solo le righe aggiunte dallo strumento, "
+                 "a intervalli regolari, e accodate ai dati già caricati. I file caricati via upload vengono ignorati."
+        )
+    with col_interval:
+        st.number_input("Aggiorna ogni (s)", min_value=0.5, value=2.0, step=0.5, key="follow_interval")
+
+    local_files, errors = local_file_utils.open_local_files(local_file_utils.split_paths(paths_text))
+    for message in errors:
+        st.error(f"File locale {message}")
+    return local_files
+
+
+def _follow_local_file(local_files, options):
+    """
+    Restituisce i dati del file seguito (prima lettura completa, poi solo le righe nuove).
+    Il controllo delle righe aggiunte gira in un fragment con aggiornamento periodico.
+    """
+    if len(local_files) != 1:
+        st.info("Modalità 'segui file': indica un solo file locale nel campo 'Apri da disco'.")
+        st.session_state.pop('tail_follower', None)
+        return None
+
+    path = local_files[0].path
+    follower = st.session_state.get('tail_follower')
+    if follower is None or follower.path != path or follower.options != options:
+        follower = parse_utils.TailFollower(path, options)
+        try:
+            follower.load()
+        except ValueError as ve:
+            st.warning(f"'{local_files[0].name}': {ve}. Nuovo tentativo al prossimo aggiornamento.")
+            st.session_state.pop('tail_follower', None)
+            st.session_state.tail_retry_at = time.time() + float(st.session_state.get('follow_interval', 2.0))
+            st.fragment(_poll_tail_follower, run_every=float(st.session_state.get('follow_interval', 2.0)))()
+            return None
+        except Exception as e:
+            st.error(f"Errore generico nel leggere il file '{local_files[0].name}': {e}.")
+            st.session_state.pop('tail_follower', None)
+            return None
+        st.session_state.tail_follower = follower
+        st.session_state.pop('tail_appended', None)
+
+    # L'impronta non cambia quando arrivano righe nuove: app.py le accoda senza resettare
+    st.session_state.import_fingerprint = cache_utils.dataset_fingerprint('segui', path, options, follower.loaded_at)
+    st.fragment(_poll_tail_follower, run_every=float(st.session_state.get('follow_interval', 2.0)))()
+    return follower.frame()
+
+
+def _poll_tail_follower():
+    """
+    Eseguita a intervalli: legge solo i byte aggiunti al file seguito.
+    Se ci sono righe nuove rilancia l'app, che le accoda ai dati (tail_appended).
+    """
+    follower = st.session_state.get('tail_follower')
+    if follower is None:
+        # Il file non era ancora leggibile: riprova la prima lettura rilanciando l'app
+        if time.time() >= st.session_state.get('tail_retry_at', float('inf')):
+            st.session_state.pop('tail_retry_at', None)
+            st.rerun()
+        return
+    try:
+        n_new = follower.poll()
+    except ValueError as ve:
+        st.warning(f"{ve}: il file verrà riletto da capo.")
+        st.session_state.pop('tail_follower', None)
+        st.rerun()
+        return
+    st.caption(
+        f"Segui '{follower.path}': **{len(follower.store):,}** righe, "
+        f"{follower.offset / 1e6:.1f} MB letti — ultimo controllo {time.strftime('%H:%M:%S')}"
+    )
+    if n_new:
+        st.session_state.tail_appended = st.session_state.get('tail_appended', 0) + n_new
+        st.rerun()
+
+
+def _excel_options_panel(excel_files, skip_rows, header_arg):
+    """
+    Opzioni dei file Excel: foglio, intervallo di celle e colonne da leggere.
+    Fogli e intestazione vengono letti dal primo file Excel (solo la riga necessaria).
+    """
+    st.subheader("Opzioni Excel")
+    first = excel_files[0]
+    payload = getattr(first, 'path', None) or first.getvalue()
+
+    col_sheet, col_range = st.columns(2)
+    with col_sheet:
+        try:
+            sheets = parse_utils.excel_sheet_names(payload)
+        except Exception as e:
+            st.error(f"Impossibile leggere i fogli di '{first.name}': {e}")
+            return {}
+        sheet = st.selectbox("Foglio", sheets, help=f"Fogli di '{first.name}'. Gli altri file Excel usano lo stesso nome di foglio.")
+    with col_range:
+        cell_range = st.text_input(
+            "Intervallo di celle (opzionale)", "",
+            help="Es. A1:D5000, B:D oppure A10: (dalla riga 10 in giù). Vuoto = foglio intero."
+        )
+
+    try:
+        parse_utils.parse_cell_range(cell_range)
+    except ValueError as ve:
+        st.error(str(ve))
+        return {}
+
+    # L'intestazione si rilegge solo se cambiano file, foglio o intervallo
+    memo = st.session_state.setdefault('excel_header_memo', {})
+    memo_key = (cache_utils.file_digest(first), sheet, cell_range, int(skip_rows), header_arg)
+    if memo_key not in memo:
+        try:
+            memo[memo_key] = parse_utils.excel_header(payload, sheet, cell_range, header_arg, int(skip_rows))
+        except Exception as e:
+            st.error(f"Impossibile leggere l'intestazione di '{first.name}': {e}")
+            return {}
+    columns = st.multiselect(
+        "Colonne da leggere (vuoto = tutte)",
+        memo[memo_key],
+        key=f"excel_columns_{sheet}_{cell_range}",
+        help="Vengono lette solo le colonne scelte: meno memoria e import più veloce."
+    )
+    if parse_utils.HAS_CALAMINE:
+        st.caption("Lettore Excel: **calamine**.")
+    else:
+        st.caption("Lettore Excel: **openpyxl (sola lettura)**. Installa `python-calamine` per import molto più veloci.")
+
+    return {'excel_sheet': sheet, 'excel_range': cell_range, 'excel_columns': columns or None}
+
 
 def load_data_flexible():
     """
@@ -18,6 +220,10 @@ def load_data_flexible():
             type=["csv", "xlsx", "xls", "txt", "asc", "raw"],
             accept_multiple_files=True  # <-- Modifica Chiave
         )
+
+        # File aperti direttamente dal disco (app desktop), uniti a quelli caricati
+        local_files = _local_files_panel()
+        uploaded_files = list(uploaded_files or []) + local_files
         
         st.subheader("Configurazione Parsing (Solo per file di testo)")
         
@@ -25,7 +231,7 @@ def load_data_flexible():
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            delimiter = st.text_input("Delimitatore CSV/TXT (Opzionale)", ",", help="Lascia vuoto per rilevazione automatica.")
+            delimiter = st.text_input("Delimitatore CSV/TXT (Opzionale)", "", help="Lascia vuoto per rilevazione automatica. Usa \\t per il TAB.")
         
         with col2:
             skip_rows = st.number_input("Salta righe all'inizio (solo per file generici)", min_value=0, value=0)
@@ -37,6 +243,44 @@ def load_data_flexible():
                 index=0
             )
 
+        col_stream, col_workers, col_disk, col_matrix = st.columns(4)
+
+        with col_stream:
+            streaming_mode = st.checkbox(
+                "Importazione in streaming (file di testo grandi)",
+                value=False,
+                help="Legge i file CSV/TXT a blocchi, con barra di avanzamento e anteprima durante il caricamento. "
+                     "La memoria resta limitata solo per i file aperti da disco (app desktop): un file caricato "
+                     "via upload è già tutto in memoria."
+            )
+
+        with col_workers:
+            n_workers = st.number_input(
+                "Processi paralleli (import multi-file)",
+                min_value=1,
+                max_value=parse_utils.DEFAULT_WORKERS,
+                value=1,
+                help="Numero di processi usati per leggere più file contemporaneamente. 1 = lettura in serie. "
+                     f"Il pool si usa solo se i file superano {parse_utils.PARALLEL_MIN_BYTES // 2**20} MB in totale."
+            )
+
+        with col_disk:
+            use_disk_cache = st.checkbox(
+                "Cache su disco (riapertura veloce)",
+                value=False,
+                disabled=not cache_utils.disk_cache.available,
+                help="Salva i dati letti in formato Arrow nella cartella di cache: alla prossima apertura "
+                     "degli stessi file vengono mappati in memoria invece di essere riparsati. Richiede pyarrow."
+            )
+
+        with col_matrix:
+            spectral_mode = st.checkbox(
+                "Matrice spettrale (batch ASC)",
+                value=False,
+                help="Più spettri .asc/.raw diventano una tabella larga: un solo asse dei numeri d'onda "
+                     "(interpolato se le griglie differiscono) e una colonna per spettro."
+            )
+
         # 3. Logica di Caricamento (modificata per il ciclo)
         
         # Converte l'opzione header in un argomento valido per Pandas
@@ -46,79 +290,110 @@ def load_data_flexible():
         elif header_option == "Indovina":
             header_arg = 'infer'
             
+        # Modalità "segui file": un solo file locale letto in modo incrementale
+        if local_file_utils.desktop_mode() and st.session_state.get('follow_mode'):
+            follow_options = {'delimiter': delimiter, 'skip_rows': skip_rows, 'header_arg': header_arg}
+            return _follow_local_file(local_files, follow_options)
+
         all_dfs = [] # Lista per raccogliere i DataFrame di ogni file
         all_filenames = [] # Lista per i messaggi di successo
+        all_results = [] # Risultati completi (per la tabella dei metadati)
+        all_keys = [] # Chiavi di cache dei file letti (impronta del dataset)
 
         if uploaded_files: # Se la lista non è vuota
             
+            options = {'delimiter': delimiter, 'skip_rows': skip_rows, 'header_arg': header_arg}
+
+            # I file Excel hanno opzioni in più (foglio, intervallo, colonne)
+            excel_files = [f for f in uploaded_files if parse_utils.file_extension(f.name) in parse_utils.EXCEL_EXTENSIONS]
+            excel_options = dict(options, **_excel_options_panel(excel_files, skip_rows, header_arg)) if excel_files else options
+            file_options = [
+                excel_options if parse_utils.file_extension(f.name) in parse_utils.EXCEL_EXTENSIONS else options
+                for f in uploaded_files
+            ]
+
+            # Cache per hash del contenuto + opzioni: un file invariato non viene mai riparsato
+            cache_keys = [
+                cache_utils.make_parse_key(cache_utils.file_digest(f), f.name, f_options)
+                for f, f_options in zip(uploaded_files, file_options)
+            ]
+            cached = [cache_utils.parse_cache.get(key) for key in cache_keys]
+
+            # Secondo livello: cache persistente su disco (file Arrow mappati in memoria)
+            if use_disk_cache:
+                for i, key in enumerate(cache_keys):
+                    if cached[i] is None:
+                        disk_hit = cache_utils.disk_cache.get(key)
+                        if disk_hit is not None:
+                            df_disk, header = disk_hit
+                            cached[i] = {'df': df_disk, 'info': None, 'header': header, 'error': None, 'origin': 'disco'}
+                            cache_utils.parse_cache.put(key, cached[i], cache_utils.frame_nbytes(df_disk))
+
+            # I file di testo in streaming restano nel processo principale (barra e anteprima live),
+            # tutti gli altri vengono parsati dal pool di processi
+            streamed = [
+                streaming_mode and parse_utils.file_extension(f.name) in parse_utils.TEXT_EXTENSIONS
+                for f in uploaded_files
+            ]
+            # I file locali viaggiano come percorso: il worker li legge dal disco
+            jobs = [
+                (f.name, getattr(f, 'path', None) or f.getvalue(), f_options)
+                for f, f_options, s_flag, hit in zip(uploaded_files, file_options, streamed, cached)
+                if not s_flag and hit is None
+            ]
+            pooled_results = iter(parse_utils.parse_jobs(jobs, max_workers=int(n_workers)))
+
             # *** INIZIO MODIFICA: CICLO SUI FILE CARICATI ***
-            for uploaded_file in uploaded_files:
-                df_single = None # Resetta il dataframe per ogni file
-                
-                try:
-                    file_extension = uploaded_file.name.split('.')[-1].lower()
-                    
-                    if file_extension in ['xlsx', 'xls']:
-                        df_single = pd.read_excel(uploaded_file, skiprows=skip_rows, header=header_arg)
-                        
-                    elif file_extension in ['csv', 'txt']:
-                        string_data = StringIO(uploaded_file.getvalue().decode("utf-8"))
-                        final_sep = delimiter if delimiter not in ['', ' '] else r'\s*,\s*|\t+|\s+'
-                        
-                        df_single = pd.read_csv(
-                            string_data,
-                            sep=final_sep, 
-                            skiprows=skip_rows,
-                            header=header_arg,
-                            engine='python',
-                            skipinitialspace=True
-                        )
-
-                    elif file_extension in ['asc', 'raw']:
-                        file_content = uploaded_file.getvalue().decode("utf-8")
-                        
-                        data_start_marker = "#DATA"
-                        if data_start_marker not in file_content:
-                            raise ValueError(f"Marcatore #DATA non trovato in '{uploaded_file.name}'. Formato ASC non riconosciuto.")
-                            
-                        data_block = file_content.split(data_start_marker, 1)[1].strip()
-                        
-                        df_single = pd.read_csv(
-                            StringIO(data_block),
-                            sep=r'\t+|\s\s+', 
-                            header=None,
-                            engine='python',
-                            skipinitialspace=True
-                        )
-                        
-                        # Assegna i nomi delle colonne (Wavenumber e Intensity)
-                        df_single.columns = ['Wavenumber', 'Intensity']
-                        df_single = df_single.dropna(how='all').reset_index(drop=True)
+            for uploaded_file, is_streamed, cache_key, hit in zip(uploaded_files, streamed, cache_keys, cached):
+
+                if hit is not None:
+                    result = hit
+                elif is_streamed:
+                    try:
+                        df_single, parse_info = _stream_text_file(uploaded_file, delimiter, skip_rows, header_arg)
+                        df_single = parse_utils.clean_column_names(df_single, parse_utils.file_extension(uploaded_file.name), header_arg)
+                        result = {'df': df_single, 'info': parse_info, 'header': {}, 'error': None}
+                    except ValueError as ve:
+                        result = {'df': None, 'info': None, 'header': {}, 'error': ('format', str(ve))}
+                    except Exception as e:
+                        result = {'df': None, 'info': None, 'header': {}, 'error': ('generic', str(e))}
+                else:
+                    result = next(pooled_results)
 
+                if hit is None and result['error'] is None:
+                    cache_utils.parse_cache.put(cache_key, result, cache_utils.frame_nbytes(result['df']))
+                    if use_disk_cache:
+                        cache_utils.disk_cache.put(cache_key, result['df'], result.get('header'))
+
+                # Gli errori del singolo file tornano alla UI come prima, nell'ordine dei file
+                if result['error'] is not None:
+                    kind, message = result['error']
+                    if kind == 'unsupported':
+                        st.error(f"File '{uploaded_file.name}': Estensione '{message}' non supportata. File saltato.")
+                    elif kind == 'format':
+                        st.error(f"Errore di formato nel file '{uploaded_file.name}': {message}. File saltato.")
                     else:
-                        st.error(f"File '{uploaded_file.name}': Estensione '{file_extension}' non supportata. File saltato.")
-                        continue # Salta al prossimo file
-                    
-                    # --- Logica di Pulizia Finale (per singolo file) ---
-                    
-                    # Rinomina colonne se Pandas ha usato numeri (solo per CSV/TXT standard)
-                    if file_extension not in ['asc', 'raw'] and (header_arg is None or all(isinstance(col, int) for col in df_single.columns)):
-                        df_single.columns = [f'Colonna_{i+1}' for i in range(df_single.shape[1])]
-
-                    # Pulisci e normalizza i nomi delle colonne
-                    df_single.columns = df_single.columns.astype(str).str.strip().str.replace(r'[^A-Za-z0-9_]+', '', regex=True)
-                    
-                    # Aggiungi il df alla lista
-                    all_dfs.append(df_single)
-                    all_filenames.append(uploaded_file.name)
-                
-                except ValueError as ve:
-                    st.error(f"Errore di formato nel file '{uploaded_file.name}': {ve}. File saltato.")
-                
-                except Exception as e:
-                    st.error(f"Errore generico nel leggere il file '{uploaded_file.name}': {e}. File saltato.")
+                        st.error(f"Errore generico nel leggere il file '{uploaded_file.name}': {message}. File saltato.")
+                    continue
+
+                if hit is not None:
+                    origin = hit.get('origin', 'memoria')
+                    info = hit.get('info')
+                    text_format = f" — {parse_utils.format_text_format(info)}" if info and info.get('sep') else ""
+                    st.caption(f"'{uploaded_file.name}': letto dalla cache ({origin}, nessun nuovo parsing){text_format}.")
+                elif result['info'] is not None:
+                    st.caption(parse_utils.format_parse_info(uploaded_file.name, result['info']))
+
+                # Aggiungi il df alla lista
+                all_dfs.append(result['df'])
+                all_filenames.append(uploaded_file.name)
+                all_results.append(result)
+                all_keys.append(cache_key)
             
             # *** FINE MODIFICA: CICLO COMPLETATO ***
+
+            for local_file in local_files:
+                local_file.close()
             
             
             # --- 4. Concatena tutti i DataFrame alla fine ---
@@ -126,10 +401,34 @@ def load_data_flexible():
                 return None # Nessun file è stato letto con successo
             
             try:
-                final_df = pd.concat(all_dfs, ignore_index=True)
-                
+                # Impronta del dataset: hash dei file + opzioni. Se non è cambiata dal rerun
+                # precedente riusiamo il DataFrame finale senza riconcatenare nulla.
+                fingerprint = cache_utils.dataset_fingerprint(all_keys, spectral_mode)
+                memo = st.session_state.get('import_result')
+                if memo is not None and memo[0] == fingerprint:
+                    final_df = memo[1]
+                else:
+                    st.session_state.pop('spectral_matrix', None)
+                    st.session_state.pop('spectral_summary', None)
+                    final_df = None
+                    if spectral_mode:
+                        final_df = _build_spectral_frame(all_dfs, all_filenames)
+                    if final_df is None:
+                        # Con più file aggiungiamo la colonna categorica 'source' (codici interi, non stringhe ripetute)
+                        final_df = parse_utils.concat_with_source(all_dfs, all_filenames)
+                    # Metadati per file (dimensioni + parametri di acquisizione ASC)
+                    st.session_state.import_metadata = parse_utils.build_metadata_table(all_filenames, all_results)
+                    st.session_state.import_result = (fingerprint, final_df)
+                st.session_state.import_fingerprint = fingerprint
+
+                if 'spectral_summary' in st.session_state:
+                    st.caption(st.session_state.spectral_summary)
                 st.success(f"Caricati e uniti {len(all_dfs)} file: {', '.join(all_filenames)}")
                 st.info(f"DataFrame finale: {final_df.shape[0]} righe totali, {final_df.shape[1]} colonne.")
+
+                metadata_df = st.session_state.import_metadata
+                with st.expander(f"Metadati per file ({len(metadata_df)})"):
+                    st.dataframe(metadata_df, use_container_width=True)
                 
                 return final_df
                 
@@ -138,4 +437,128 @@ def load_data_flexible():
                 st.warning("Assicurati che i file abbiano strutture compatibili. (Es. stesso numero di colonne o stesse intestazioni)")
                 return None
     
-    return None # Ritorna None se nessun file è stato caricato
\ No newline at end of file
+    return None # Ritorna None se nessun file è stato caricato
+
+
+def _build_spectral_frame(dfs, filenames):
+    """
+    Formato matrice spettrale: restituisce il DataFrame largo (asse + una colonna
+    per spettro) e salva la SpectralMatrix in sessione. None se non applicabile.
+    """
+    asc_only = all(parse_utils.file_extension(name) in parse_utils.ASC_EXTENSIONS for name in filenames)
+    if len(dfs) < 2 or not asc_only:
+        st.warning("La matrice spettrale richiede almeno due file .asc/.raw (e solo quelli): uso il formato lungo.")
+        return None
+
+    x_col, y_col = parse_utils.ASC_COLUMNS
+    try:
+        matrix = spectra_utils.SpectralMatrix.from_spectra(
+            [(df[x_col].to_numpy(), df[y_col].to_numpy()) for df in dfs],
+            parse_utils.unique_labels(filenames),
+            axis_name=x_col
+        )
+    except ValueError as ve:
+        st.warning(f"Matrice spettrale non creata: {ve}. Uso il formato lungo.")
+        return None
+
+    st.session_state.spectral_matrix = matrix
+    long_mb = sum(cache_utils.frame_nbytes(df) for df in dfs) / 1024 / 1024
+    summary = (f"Matrice spettrale: {matrix.n_spectra} spettri x {matrix.n_points} punti "
+               f"({matrix.nbytes / 1024 / 1024:.1f} MB invece di {long_mb:.1f} MB in formato lungo).")
+    if matrix.interpolated:
+        summary += f" Interpolati sull'asse comune: {len(matrix.interpolated)}."
+    st.session_state.spectral_summary = summary
+    return matrix.to_frame()
+
+
+def show_cache_settings():
+    """Sezione della scheda Impostazioni: stato e limiti delle cache (memoria e disco)."""
+    st.markdown("**Cache di Parsing (in memoria)**")
+    st.caption("I file già letti con le stesse opzioni vengono riusati senza nuovo parsing.")
+
+    stats = cache_utils.parse_cache.stats()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Hit", stats['hits'])
+    c2.metric("Miss", stats['misses'])
+    c3.metric("Hit rate", f"{stats['hit_rate']:.0%}")
+    c4.metric("File in cache", stats['entries'])
+    st.progress(
+        min(stats['used_mb'] / stats['budget_mb'], 1.0) if stats['budget_mb'] else 0.0,
+        text=f"Memoria usata: {stats['used_mb']:.1f} / {stats['budget_mb']:.0f} MB (eliminati: {stats['evictions']})"
+    )
+
+    col_budget, col_clear = st.columns(2)
+    with col_budget:
+        budget_mb = st.number_input(
+            "Budget cache (MB)",
+            min_value=0,
+            value=int(stats['budget_mb']),
+            step=256,
+            key="parse_cache_budget_mb"
+        )
+        if budget_mb != int(stats['budget_mb']):
+            cache_utils.parse_cache.set_budget(int(budget_mb) * 1024 * 1024)
+    with col_clear:
+        if st.button("Svuota cache di parsing", use_container_width=True):
+            cache_utils.parse_cache.clear()
+            st.rerun()
+
+    st.markdown("---")
+    st.markdown("**Memoria delle Sessioni**")
+    st.caption("Budget condiviso dai dati di tutte le sessioni del server (solo la memoria non condivisa "
+               "con la cache di parsing): oltre il limite, le sessioni inattive da più di "
+               f"{memory_utils.session_memory.idle_seconds // 60} minuti vengono scaricate su disco "
+               "e ricaricate al loro prossimo utilizzo.")
+    mem_stats = memory_utils.session_memory.stats()
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Sessioni", mem_stats['sessions'])
+    m2.metric("Su disco", mem_stats['spilled_sessions'])
+    m3.metric("Ricaricate", mem_stats['restores'])
+    st.progress(
+        min(mem_stats['used_mb'] / mem_stats['budget_mb'], 1.0) if mem_stats['budget_mb'] else 0.0,
+        text=f"Memoria usata: {mem_stats['used_mb']:.1f} / {mem_stats['budget_mb']:.0f} MB "
+             f"(su disco: {mem_stats['disk_mb']:.1f} MB)"
+    )
+    memory_budget_mb = st.number_input(
+        "Budget memoria sessioni (MB)",
+        min_value=0,
+        value=int(mem_stats['budget_mb']),
+        step=512,
+        key="session_memory_budget_mb"
+    )
+    if memory_budget_mb != int(mem_stats['budget_mb']):
+        memory_utils.session_memory.set_budget(int(memory_budget_mb) * 1024 * 1024)
+
+    st.markdown("---")
+    st.markdown("**Cache su Disco (Arrow)**")
+    if not cache_utils.disk_cache.available:
+        st.warning("pyarrow non installato: la cache su disco non è disponibile.")
+        return
+
+    st.caption(f"Cartella: `{cache_utils.disk_cache.directory}`")
+    disk_stats = cache_utils.disk_cache.stats()
+    d1, d2, d3 = st.columns(3)
+    d1.metric("Hit (disco)", disk_stats['hits'])
+    d2.metric("Miss (disco)", disk_stats['misses'])
+    d3.metric("Dataset salvati", disk_stats['entries'])
+    st.progress(
+        min(disk_stats['used_mb'] / disk_stats['budget_mb'], 1.0) if disk_stats['budget_mb'] else 0.0,
+        text=f"Spazio usato: {disk_stats['used_mb']:.1f} / {disk_stats['budget_mb']:.0f} MB"
+    )
+
+    col_disk_budget, col_disk_clear = st.columns(2)
+    with col_disk_budget:
+        disk_budget_mb = st.number_input(
+            "Limite cache su disco (MB)",
+            min_value=0,
+            value=int(disk_stats['budget_mb']),
+            step=1024,
+            key="disk_cache_budget_mb"
+        )
+        if disk_budget_mb != int(disk_stats['budget_mb']):
+            cache_utils.disk_cache.set_budget(int(disk_budget_mb) * 1024 * 1024)
+    with col_disk_clear:
+        if st.button("Svuota cache su disco", use_container_width=True):
+            cache_utils.disk_cache.clear()
+            st.rerun()
+
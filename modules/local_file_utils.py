@@ -0,0 +1,94 @@
+import os
+
+# --- Apertura di file locali (app desktop) senza passare dal file_uploader ---
+
+# Impostata da run_desktop.py all'avvio del server Streamlit. Solo lì browser e server sono
+# la stessa macchina dello stesso utente: su un server condiviso un percorso scritto da un
+# client remoto leggerebbe file arbitrari del server.
+DESKTOP_ENV = 'DATAPLOTTER_DESKTOP'
+
+# Espressione eseguita nella pagina (iframe del componente): chiede i percorsi
+# alla finestra pywebview. Fuori dall'app desktop non esiste 'pywebview'.
+NO_DESKTOP = 'NO_DESKTOP'
+PICK_FILES_JS = (
+    "(window.parent && window.parent.pywebview && window.parent.pywebview.api)"
+    " ? window.parent.pywebview.api.pick_local_files()"
+    f" : '{NO_DESKTOP}'"
+)
+
+
+def desktop_mode():
+    """True se l'app gira nella build desktop (apertura da disco consentita)."""
+    return os.environ.get(DESKTOP_ENV) == '1'
+
+
+class LocalFile:
+    """
+    File letto direttamente dal disco, con la stessa interfaccia minima di un file
+    caricato con st.file_uploader (name, size, file_id, read/seek/tell, getvalue).
+    Il contenuto non viene mai copiato in memoria: il parsing riceve il percorso
+    e legge il file da disco (memory-map o lettura a blocchi).
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.name = os.path.basename(self.path)
+        stat = os.stat(self.path)
+        self.size = stat.st_size
+        # Cambia se il file viene modificato: l'hash memorizzato non viene riusato
+        self.file_id = f"local:{self.path}:{stat.st_mtime_ns}:{stat.st_size}"
+        self._handle = None
+
+    def _file(self):
+        if self._handle is None:
+            self._handle = open(self.path, 'rb')
+        return self._handle
+
+    def read(self, size=-1):
+        return self._file().read(size)
+
+    def seek(self, offset, whence=0):
+        return self._file().seek(offset, whence)
+
+    def tell(self):
+        return self._file().tell()
+
+    def getvalue(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+def split_paths(text):
+    """Percorsi dal campo di testo: uno per riga, virgolette (copia da Esplora risorse) rimosse."""
+    paths = []
+    for line in (text or '').splitlines():
+        path = line.strip().strip('"').strip("'")
+        if path and path not in paths:
+            paths.append(os.path.expanduser(path))
+    return paths
+
+
+def open_local_files(paths):
+    """
+    Apre i percorsi indicati. Restituisce (lista di LocalFile, lista di errori):
+    un percorso non valido non blocca gli altri. Fuori dalla build desktop ogni
+    percorso viene rifiutato.
+    """
+    files = []
+    errors = []
+    if not desktop_mode():
+        return files, [f"'{path}': apertura da disco disponibile solo nell'app desktop." for path in paths]
+    for path in paths:
+        if not os.path.isfile(path):
+            errors.append(f"'{path}': file non trovato.")
+            continue
+        try:
+            files.append(LocalFile(path))
+        except OSError as e:
+            errors.append(f"'{path}': {e}")
+    return files, errors
@@ -0,0 +1,354 @@
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from modules import cache_utils
+
+# pyarrow serve per lo spill su disco (Arrow IPC / Feather v2 compresso)
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# --- Budget di memoria per sessione con spill su disco ---
+
+# Budget complessivo dei DataFrame di tutte le sessioni del server
+DEFAULT_MEMORY_BUDGET_MB = int(os.environ.get('DATAPLOTTER_MEMORY_BUDGET_MB', 4096))
+# Una sessione senza rerun da almeno questo tempo è "inattiva" e può finire su disco
+DEFAULT_IDLE_SECONDS = int(os.environ.get('DATAPLOTTER_IDLE_SECONDS', 300))
+DEFAULT_SPILL_DIR = os.environ.get(
+    'DATAPLOTTER_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'dataplotter-spill')
+)
+
+# Chiavi di st.session_state con i DataFrame che vengono scaricati su disco
+SPILL_KEYS = ('original_df', 'processed_df')
+
+
+def frames_nbytes(frames, shared=()):
+    """
+    Occupazione complessiva di più DataFrame, contando una sola volta le colonne
+    condivise (copy-on-write, cronologia): le colonne NumPy sono identificate
+    dall'indirizzo del buffer, le altre (stringhe, categoriche) contate per intero.
+    I buffer in `shared` (tenuti anche da altri, es. la cache di parsing) non si contano.
+    """
+    seen = set(shared)
+    total = 0
+    for df in frames:
+        for i in range(df.shape[1]):
+            column = df.iloc[:, i]
+            if isinstance(column.dtype, np.dtype):
+                array = column.to_numpy()
+                key = (array.__array_interface__['data'][0], array.nbytes)
+                if key in seen:
+                    continue
+                seen.add(key)
+                total += array.nbytes
+            else:
+                total += int(column.memory_usage(index=False, deep=True))
+        total += int(df.index.memory_usage())
+    return total
+
+
+def session_frames(state):
+    """DataFrame tenuti in memoria da una sessione (dati, cronologia, risultato dell'import)."""
+    frames = [state[key] for key in SPILL_KEYS if key in state]
+    if 'history' in state:
+        frames.extend(state['history'].results.values())
+    if 'import_result' in state:
+        frames.append(state['import_result'][1])
+    return frames
+
+
+class _SessionRecord:
+    def __init__(self, state):
+        self.state = state
+        self.last_access = time.time()
+        self.nbytes = 0
+        self.frame_ids = ()
+        self.spilled = {}  # Chiave di session_state -> file su disco
+        self.spilled_bytes = 0
+        self.import_fingerprint = None
+        self.over_budget = False  # Da scaricare su disco alla fine del suo prossimo rerun (ripiego)
+        # Serializza spill e ricaricamento: chi scarica la sessione da un altro thread e il suo
+        # rerun che la ricarica non lavorano mai sullo stesso session_state nello stesso momento
+        self.lock = threading.Lock()
+
+
+class SessionMemoryManager:
+    """
+    Contabilità della memoria occupata dai DataFrame di ogni sessione, condivisa da tutto il server.
+    Si conta solo la memoria di cui la sessione è l'unica proprietaria: le colonne condivise con
+    la cache di parsing resterebbero in memoria comunque.
+    Quando il totale supera il budget, le sessioni inattive (le meno recenti per prime) vengono
+    scaricate su disco (Arrow compresso) subito, dal thread che applica il budget: i loro
+    DataFrame escono da session_state e la memoria si libera mentre restano inattive. Al loro
+    rerun successivo touch() li ricarica prima che l'app li usi. Il lock della sessione impedisce
+    che spill e ricaricamento si sovrappongano; se è occupato la sessione viene solo segnata e
+    si scarica da sola alla fine del suo prossimo rerun (release).
+    """
+
+    SUFFIX = '.arrow'
+
+    def __init__(self, budget_bytes=DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024,
+                 idle_seconds=DEFAULT_IDLE_SECONDS, directory=DEFAULT_SPILL_DIR):
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self.directory = directory
+        self._sessions = {}
+        self._lock = threading.RLock()
+        self.spills = 0
+        self.restores = 0
+
+    @property
+    def available(self):
+        return HAS_PYARROW
+
+    def touch(self, session_id, state):
+        """
+        Inizio di un rerun: segna la sessione come attiva e, se era su disco,
+        ricarica i suoi DataFrame. Restituisce True se c'è stato un ricaricamento.
+        """
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None:
+                record = self._sessions[session_id] = _SessionRecord(state)
+            record.state = state
+            record.last_access = time.time()
+        # Se un altro thread la sta scaricando proprio ora, si aspetta la fine e si ricarica
+        with record.lock:
+            if not record.spilled:
+                return False
+            self._restore(record)
+            return True
+
+    def update(self, session_id, state):
+        """
+        Ricalcola l'occupazione della sessione (solo se i suoi DataFrame o il contenuto
+        della cache di parsing sono cambiati).
+        """
+        frames = session_frames(state)
+        frame_ids = tuple(id(df) for df in frames) + (cache_utils.parse_cache.generation,)
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None:
+                record = self._sessions[session_id] = _SessionRecord(state)
+            record.last_access = time.time()
+            if frame_ids != record.frame_ids:
+                record.nbytes = frames_nbytes(frames, cache_utils.parse_cache.buffer_keys())
+                record.frame_ids = frame_ids
+            return record.nbytes
+
+    def enforce(self, current_id=None, is_active=None):
+        """
+        Applica il budget: scarica su disco le sessioni inattive (le meno recenti per prime)
+        finché il totale rientra. Quelle il cui lock è occupato (rerun appena ripartito) vengono
+        solo segnate e si scaricano da sole (release). is_active(session_id) permette di
+        dimenticare le sessioni chiuse. Restituisce gli id delle sessioni scaricate ora.
+        """
+        with self._lock:
+            if is_active is not None:
+                for session_id in [s for s in self._sessions if s != current_id and not is_active(s)]:
+                    self._forget(session_id)
+            total = sum(r.nbytes for r in self._sessions.values() if not r.spilled and not r.over_budget)
+            if total <= self.budget_bytes or not self.available:
+                return []
+            now = time.time()
+            idle = sorted(
+                (r.last_access, session_id) for session_id, r in self._sessions.items()
+                if session_id != current_id and not r.spilled and not r.over_budget and r.nbytes
+                and now - r.last_access >= self.idle_seconds
+            )
+            candidates = []
+            for _, session_id in idle:
+                if total <= self.budget_bytes:
+                    break
+                candidates.append((session_id, self._sessions[session_id]))
+                total -= self._sessions[session_id].nbytes
+
+        # La scrittura su disco avviene fuori dal lock globale: le altre sessioni non aspettano
+        return [session_id for session_id, record in candidates if self._spill_idle(session_id, record)]
+
+    def _spill_idle(self, session_id, record):
+        """Scarica una sessione inattiva da un altro thread, se nel frattempo non è ripartita."""
+        if not record.lock.acquire(blocking=False):
+            record.over_budget = True
+            return False
+        try:
+            if record.spilled or time.time() - record.last_access < self.idle_seconds:
+                return False
+            if not _can_spill(record.state):
+                return False
+            return self._spill(session_id, record)
+        finally:
+            record.lock.release()
+
+    def release(self, session_id, state):
+        """
+        Fine del rerun di una sessione (dal suo thread): se era stata segnata e il server è
+        ancora oltre il budget, scrive i suoi dati su disco. Restituisce True se li ha scaricati.
+        """
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None or not record.over_budget:
+                return False
+            record.over_budget = False
+            if self.used_bytes() <= self.budget_bytes or not _can_spill(state):
+                return False
+            record.state = state
+        with record.lock:
+            return self._spill(session_id, record)
+
+    def used_bytes(self):
+        with self._lock:
+            return sum(r.nbytes for r in self._sessions.values() if not r.spilled)
+
+    def session_bytes(self, session_id):
+        with self._lock:
+            record = self._sessions.get(session_id)
+            return record.nbytes if record is not None and not record.spilled else 0
+
+    def set_budget(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+
+    def stats(self):
+        with self._lock:
+            records = list(self._sessions.values())
+            return {
+                'sessions': len(records),
+                'spilled_sessions': sum(1 for r in records if r.spilled),
+                'over_budget_sessions': sum(1 for r in records if r.over_budget),
+                'used_mb': sum(r.nbytes for r in records if not r.spilled) / 1024 / 1024,
+                'disk_mb': sum(r.spilled_bytes for r in records) / 1024 / 1024,
+                'budget_mb': self.budget_bytes / 1024 / 1024,
+                'spills': self.spills,
+                'restores': self.restores,
+            }
+
+    def _path_for(self, session_id, key):
+        return os.path.join(self.directory, f"{session_id}-{key}{self.SUFFIX}")
+
+    def _spill(self, session_id, record):
+        """Scrive i DataFrame della sessione su disco e li toglie da session_state."""
+        state = record.state
+        os.makedirs(self.directory, exist_ok=True)
+        written = {}
+        try:
+            for key in SPILL_KEYS:
+                if key not in state:
+                    continue
+                path = self._path_for(session_id, key)
+                # Indice conservato: i dati processati possono avere righe filtrate
+                table = pa.Table.from_pandas(state[key], preserve_index=True)
+                feather.write_feather(table, path, compression='zstd')
+                written[key] = path
+        except Exception:
+            # Tipi non rappresentabili in Arrow o disco pieno: la sessione resta in memoria
+            for path in written.values():
+                _remove(path)
+            return False
+
+        # Il risultato dell'import e la cronologia puntano agli stessi DataFrame: li si stacca
+        # (senza ricalcolarli) per liberare davvero la memoria
+        import_result = state['import_result'] if 'import_result' in state else None
+        if import_result is not None and import_result[1] is state['original_df']:
+            record.import_fingerprint = import_result[0]
+            del state['import_result']
+        if 'history' in state:
+            state['history'].release()
+        for key in written:
+            del state[key]
+
+        record.spilled = written
+        record.spilled_bytes = sum(os.path.getsize(path) for path in written.values())
+        record.frame_ids = ()
+        with self._lock:
+            self.spills += 1
+        return True
+
+    def _restore(self, record):
+        state = record.state
+        try:
+            frames = {key: feather.read_table(path).to_pandas(split_blocks=True)
+                      for key, path in record.spilled.items()}
+        except Exception:
+            # File illeggibili: la sessione riparte dall'import come al primo caricamento
+            frames = {}
+            if 'history' in state:
+                del state['history']
+        for key, df in frames.items():
+            state[key] = df
+        for path in record.spilled.values():
+            _remove(path)
+        if record.import_fingerprint is not None and 'original_df' in frames:
+            state['import_result'] = (record.import_fingerprint, frames['original_df'])
+        if 'history' in state and 'processed_df' in frames:
+            state['history'].reattach(frames['original_df'], frames['processed_df'])
+        record.spilled = {}
+        record.spilled_bytes = 0
+        record.import_fingerprint = None
+        self.restores += 1
+
+    def _forget(self, session_id):
+        record = self._sessions.pop(session_id)
+        for path in record.spilled.values():
+            _remove(path)
+
+
+def _is_active_session(session_id):
+    # Fuori dal server Streamlit (test, script) non si può sapere: si considera attiva
+    return not runtime.exists() or runtime.get_instance().is_active_session(session_id)
+
+
+def restore_current_session():
+    """Da chiamare all'inizio di ogni rerun: ricarica i dati della sessione se erano su disco."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return False
+    return session_memory.touch(ctx.session_id, ctx.session_state)
+
+
+def track_current_session():
+    """
+    Da chiamare dopo aver aggiornato i dati della sessione: aggiorna la contabilità e
+    applica il budget alle altre sessioni. Restituisce i byte occupati da questa sessione.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return 0
+    nbytes = session_memory.update(ctx.session_id, ctx.session_state)
+    session_memory.enforce(ctx.session_id, is_active=_is_active_session)
+    return nbytes
+
+
+def release_current_session():
+    """
+    Da chiamare alla fine di ogni rerun, quando la pagina non usa più i dati. Ripiego per le
+    sessioni che enforce non ha potuto scaricare (lock occupato): se la sessione era stata
+    segnata e il server è ancora oltre il budget, scrive i suoi dati su disco.
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return False
+    return session_memory.release(ctx.session_id, ctx.session_state)
+
+
+def _can_spill(state):
+    # In modalità "segui file" la sessione aggiorna i dati da sola: resta in memoria
+    return 'original_df' in state and not ('follow_mode' in state and state['follow_mode'])
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+session_memory = SessionMemoryManager()
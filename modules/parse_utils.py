@@ -0,0 +1,1027 @@
+import csv
+import mmap
+import os
+import re
+import time
+import warnings
+from contextlib import contextmanager
+from io import BytesIO, StringIO
+import numpy as np
+import pandas as pd
+
+from modules import pool_utils
+
+# pyarrow è opzionale: se presente è il motore di parsing più veloce
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# calamine (lettore Excel in Rust) è opzionale: senza, si usa openpyxl in sola lettura
+try:
+    from python_calamine import CalamineWorkbook
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+# Versione dei parser: va incrementata quando cambia il DataFrame prodotto a parità di file
+# e opzioni, così le cache (memoria e disco) non servono risultati della versione precedente
+PARSER_VERSION = 2
+
+# Quanti byte leggiamo all'inizio del file per capirne il formato
+SNIFF_SAMPLE_BYTES = 64 * 1024
+SNIFF_MAX_LINES = 50
+
+# Delimitatori "classici" provati in ordine di preferenza
+CANDIDATE_DELIMITERS = [',', ';', '\t', '|']
+
+# Separatore regex storico: usato solo come ultima spiaggia (motore python, lento)
+FALLBACK_SEP = r'\s*,\s*|\t+|\s+'
+WHITESPACE_SEP = r'\s+'
+# Colonne allineate con più TAB: una sequenza di TAB è un solo separatore
+TABS_SEP = r'\t+'
+
+_NUMBER_DOT = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+_NUMBER_COMMA = re.compile(r'^[+-]?\d+,\d+([eE][+-]?\d+)?$')
+
+
+def _is_number(token, decimal='.'):
+    token = token.strip().strip('"')
+    if decimal == ',':
+        return bool(_NUMBER_COMMA.match(token) or _NUMBER_DOT.match(token))
+    return bool(_NUMBER_DOT.match(token))
+
+
+def _split_line(line, sep):
+    if sep == WHITESPACE_SEP:
+        return line.split()
+    if sep == TABS_SEP:
+        return re.split(TABS_SEP, line.strip('\t'))
+    if len(sep) == 1:
+        # Come il parser: un delimitatore tra virgolette fa parte del campo
+        return next(csv.reader([line], delimiter=sep), [])
+    return line.split(sep)
+
+
+def _field_counts(lines, sep):
+    """Campi per riga secondo csv.reader (virgolette rispettate); None se il testo non è CSV valido."""
+    try:
+        return [len(row) for row in csv.reader(lines, delimiter=sep)]
+    except csv.Error:
+        return None
+
+
+def _score(counts):
+    """
+    (coerenza, campi più frequenti) di un delimitatore, o None se non è plausibile: serve più
+    di un campo e lo stesso numero di campi su quasi tutte le righe, oppure il delimitatore
+    presente su ogni riga (file con qualche riga irregolare).
+    """
+    if not counts:
+        return None
+    mode_count = max(set(counts), key=counts.count)
+    consistency = counts.count(mode_count) / len(counts)
+    if mode_count > 1 and (consistency >= 0.9 or min(counts) > 1):
+        return consistency, mode_count
+    return None
+
+
+# --- File locali: il payload può essere un percorso invece dei byte ---
+
+def read_head(payload, n_bytes):
+    """Primi n_bytes di un payload (bytes o percorso), senza leggere tutto il file."""
+    if isinstance(payload, str):
+        with open(payload, 'rb') as f:
+            return f.read(n_bytes)
+    return payload[:n_bytes]
+
+
+def payload_size(payload):
+    return os.path.getsize(payload) if isinstance(payload, str) else len(payload)
+
+
+@contextmanager
+def mapped_payload(payload):
+    """
+    Byte del payload: per un percorso locale il file viene mappato in memoria
+    (sola lettura, nessuna copia), altrimenti si usano i byte così come sono.
+    """
+    if not isinstance(payload, str):
+        yield payload
+        return
+    with open(payload, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''  # mmap non accetta file vuoti
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def normalize_delimiter(delimiter):
+    """
+    Converte il delimitatore scritto dall'utente in quello reale.
+    Restituisce None se l'utente ha lasciato il campo vuoto (rilevazione automatica).
+    """
+    if delimiter is None or delimiter in ['', ' ']:
+        return None
+    if delimiter in ['\\t', 'tab', 'TAB']:
+        return '\t'
+    return delimiter
+
+
+def sniff_text_format(sample, delimiter=None, skip_rows=0):
+    """
+    Analizza un campione di testo (le prime righe del file) e ne deduce
+    delimitatore, riga di intestazione e separatore decimale.
+    Restituisce un dict con le chiavi 'sep', 'header' (0 o None) e 'decimal'.
+    """
+    lines = sample.splitlines()
+    # L'ultima riga del campione può essere troncata: la scartiamo se il file continua
+    if len(lines) > 1 and not sample.endswith(('\n', '\r')):
+        lines = lines[:-1]
+    lines = [l for l in lines[skip_rows:] if l.strip()][:SNIFF_MAX_LINES]
+
+    sep = normalize_delimiter(delimiter)
+
+    # 1. Delimitatore: cerchiamo quello che dà lo stesso numero di campi su ogni riga.
+    # I campi si contano con csv.reader, così una virgola tra virgolette non conta.
+    if sep is None:
+        viable = {}
+        for candidate in CANDIDATE_DELIMITERS:
+            score = _score(_field_counts(lines, candidate))
+            if score is not None:
+                viable[candidate] = score
+        # Colonne allineate con più TAB: se le sequenze di TAB danno campi almeno altrettanto
+        # coerenti, una sequenza è un solo separatore (niente colonne vuote in più)
+        if any('\t\t' in l for l in lines):
+            tabs = _score([len(_split_line(l, TABS_SEP)) for l in lines])
+            if tabs is not None and tabs[0] >= viable.get('\t', (0, 0))[0]:
+                viable.pop('\t', None)
+                viable[TABS_SEP] = tabs
+        # Se anche un altro delimitatore è coerente, la virgola è probabilmente il decimale
+        if ',' in viable and len(viable) > 1:
+            del viable[',']
+        sep = max(viable, key=viable.get) if viable else WHITESPACE_SEP
+
+    # 2. Separatore decimale: la virgola è possibile solo se non è il delimitatore
+    decimal = '.'
+    if sep != ',':
+        tokens = [t for l in lines[1:] for t in _split_line(l, sep)]
+        comma_numbers = sum(1 for t in tokens if _NUMBER_COMMA.match(t.strip()))
+        dot_numbers = sum(1 for t in tokens if '.' in t and _NUMBER_DOT.match(t.strip()))
+        if comma_numbers > 0 and comma_numbers >= dot_numbers:
+            decimal = ','
+
+    # 3. Intestazione: la prima riga è un'intestazione se non è interamente numerica
+    header = 0
+    if lines:
+        first = [t for t in _split_line(lines[0], sep) if t.strip()]
+        if first and all(_is_number(t, decimal) for t in first):
+            header = None
+
+    return {'sep': sep, 'header': header, 'decimal': decimal}
+
+
+def _read_csv_fast(raw, sep, header, decimal, skip_rows=0, names=None, auto_sep=False, dtype=None):
+    """
+    Esegue pd.read_csv sui bytes (o direttamente sul percorso di un file locale)
+    provando i motori in ordine di velocità. Se pyarrow e C non accettano il file si passa
+    al motore python con lo stesso separatore (es. delimitatori di più caratteri o regex);
+    solo se anche questo fallisce e c'è auto_sep (delimitatore rilevato, non scelto
+    dall'utente) si ripiega sul separatore regex storico.
+    Restituisce (DataFrame, motore usato, separatore effettivo).
+    """
+    is_path = isinstance(raw, str)
+    attempts = []
+    if HAS_PYARROW and len(sep) == 1:
+        attempts.append('pyarrow')
+    attempts.append('c')
+
+    for engine in attempts:
+        try:
+            kwargs = dict(sep=sep, skiprows=skip_rows, header=header, names=names, decimal=decimal, dtype=dtype,
+                          engine=engine)
+            if engine == 'c':
+                kwargs['skipinitialspace'] = True
+            return pd.read_csv(raw if is_path else BytesIO(raw), **kwargs), engine, sep
+        except (ValueError, pd.errors.ParserError):
+            continue
+
+    try:
+        df = pd.read_csv(
+            raw if is_path else StringIO(bytes(raw).decode('utf-8')),
+            sep=sep,
+            skiprows=skip_rows,
+            header=header,
+            names=names,
+            decimal=decimal,
+            dtype=dtype,
+            engine='python',
+            skipinitialspace=True
+        )
+        return df, 'python', sep
+    except (ValueError, pd.errors.ParserError) as error:
+        if not auto_sep:
+            raise
+        parse_error = error
+
+    # Ultima spiaggia (solo rilevazione automatica): il vecchio comportamento con separatore regex.
+    # Se fallisce anche questo si riporta l'errore del separatore rilevato, più comprensibile.
+    try:
+        df = pd.read_csv(
+            raw if is_path else StringIO(bytes(raw).decode('utf-8')),
+            sep=FALLBACK_SEP,
+            skiprows=skip_rows,
+            header=header,
+            names=names,
+            dtype=dtype,
+            engine='python',
+            skipinitialspace=True
+        )
+    except (ValueError, pd.errors.ParserError):
+        raise parse_error
+    return df, 'python', FALLBACK_SEP
+
+
+def _parse_info(engine, sep, header, decimal, elapsed, n_bytes, detected=False):
+    size_mb = n_bytes / 1e6
+    return {
+        'engine': engine,
+        'sep': sep,
+        'detected': detected,  # Delimitatore rilevato automaticamente (non scelto dall'utente)
+        'header': header,
+        'decimal': decimal,
+        'seconds': elapsed,
+        'size_mb': size_mb,
+        'mb_per_s': size_mb / elapsed if elapsed > 0 else float('inf'),
+    }
+
+
+def read_text_table(raw, delimiter, skip_rows, header_arg):
+    """
+    Legge un file CSV/TXT (bytes o percorso locale) con il motore più veloce disponibile.
+    Ordine: pyarrow -> C -> python (regex, solo come fallback).
+    Restituisce (DataFrame, info) dove info contiene motore, formato rilevato e throughput.
+    """
+    sample = bytes(read_head(raw, SNIFF_SAMPLE_BYTES)).decode('utf-8', errors='ignore')
+    fmt = sniff_text_format(sample, delimiter, skip_rows)
+    header = fmt['header'] if header_arg == 'infer' else header_arg
+
+    start = time.perf_counter()
+    auto_sep = normalize_delimiter(delimiter) is None
+    df, engine, sep = _read_csv_fast(raw, fmt['sep'], header, fmt['decimal'], skip_rows, auto_sep=auto_sep)
+    elapsed = time.perf_counter() - start
+
+    return df, _parse_info(engine, sep, header, fmt['decimal'], elapsed, payload_size(raw), detected=auto_sep)
+
+
+# --- Importazione in streaming (file di testo grandi) ---
+
+STREAM_CHUNK_BYTES = 8 * 1024 * 1024
+PREVIEW_ROWS = 200
+
+
+class ColumnStore:
+    """
+    Archivio colonnare preallocato: un array NumPy per colonna, riempito a blocchi.
+    La capacità iniziale è una stima; cresce in modo geometrico solo se non basta.
+    """
+
+    def __init__(self, capacity=0):
+        self.capacity = max(int(capacity), 1)
+        self.columns = None
+        self.arrays = {}
+        self.n_rows = 0
+
+    def __len__(self):
+        return self.n_rows
+
+    def _grow(self, min_capacity):
+        new_capacity = max(min_capacity, int(self.capacity * 1.5))
+        for name, arr in self.arrays.items():
+            grown = np.empty(new_capacity, dtype=arr.dtype)
+            grown[:self.n_rows] = arr[:self.n_rows]
+            self.arrays[name] = grown
+        self.capacity = new_capacity
+
+    def append(self, chunk):
+        """Copia un blocco (DataFrame) in coda agli array delle colonne."""
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            for name in self.columns:
+                self.arrays[name] = np.empty(self.capacity, dtype=chunk[name].to_numpy().dtype)
+
+        n_new = len(chunk)
+        if self.n_rows + n_new > self.capacity:
+            self._grow(self.n_rows + n_new)
+
+        for name in self.columns:
+            values = chunk[name].to_numpy()
+            arr = self.arrays[name]
+            # Se il blocco ha un tipo più "largo" (es. int -> float per un NaN) allarghiamo la colonna
+            target = np.result_type(arr.dtype, values.dtype)
+            if target != arr.dtype:
+                arr = arr.astype(target)
+                self.arrays[name] = arr
+            arr[self.n_rows:self.n_rows + n_new] = values
+        self.n_rows += n_new
+
+    def preview(self, n_rows=PREVIEW_ROWS):
+        """Prime righe già caricate (copia piccola, per la UI)."""
+        n = min(n_rows, self.n_rows)
+        return pd.DataFrame({name: self.arrays[name][:n].copy() for name in self.columns or []})
+
+    def to_frame(self, trim=True):
+        """
+        DataFrame finale: usa direttamente gli array, rifilando la capacità in eccesso.
+        Con trim=False restituisce solo viste (il ColumnStore può continuare a crescere).
+        """
+        data = {}
+        for name in self.columns or []:
+            arr = self.arrays[name][:self.n_rows]
+            if trim and self.capacity > self.n_rows * 1.25:
+                arr = arr.copy()  # Libera la parte non usata della stima
+            data[name] = arr
+        return pd.DataFrame(data, copy=False)
+
+
+def stream_text_table(fileobj, delimiter, skip_rows, header_arg,
+                      chunk_bytes=STREAM_CHUNK_BYTES, on_progress=None):
+    """
+    Legge un file CSV/TXT a blocchi di byte di dimensione fissa, senza decodificarlo tutto.
+    Ogni blocco (tagliato all'ultimo fine riga) viene parsato e accodato a un ColumnStore.
+    La memoria resta limitata solo se fileobj legge dal disco (file locale): un file caricato
+    via upload (UploadedFile) è già tutto in memoria, e lo streaming limita solo le copie
+    intermedie del parsing.
+    on_progress(bytes_letti, bytes_totali, righe, store) viene chiamata dopo ogni blocco.
+    Restituisce (DataFrame, info) come read_text_table; info['engine'] elenca i motori
+    usati dai blocchi (un blocco può ripiegare sul motore python).
+    """
+    fileobj.seek(0, 2)
+    total_bytes = fileobj.tell()
+    fileobj.seek(0)
+
+    start = time.perf_counter()
+    sample = fileobj.read(SNIFF_SAMPLE_BYTES).decode('utf-8', errors='ignore')
+    fmt = sniff_text_format(sample, delimiter, skip_rows)
+    header = fmt['header'] if header_arg == 'infer' else header_arg
+    auto_sep = normalize_delimiter(delimiter) is None
+
+    # Ogni blocco deduce i propri tipi: una colonna numerica nei primi blocchi e con testo più
+    # avanti diventerebbe un misto di numeri e stringhe. In quel caso la si rilegge da capo come
+    # testo, così il risultato è quello della lettura completa (raro: costa un secondo passaggio).
+    text_columns = set()
+    while True:
+        fileobj.seek(0)
+        store, engines, sep, conflicts = _stream_pass(fileobj, total_bytes, fmt, header, skip_rows, auto_sep,
+                                                      text_columns, chunk_bytes, on_progress)
+        if not conflicts:
+            break
+        text_columns |= conflicts
+
+    elapsed = time.perf_counter() - start
+    df = store.to_frame() if store is not None else pd.DataFrame()
+    return df, _parse_info(", ".join(engines) or None, sep, header, fmt['decimal'], elapsed, total_bytes,
+                           detected=auto_sep)
+
+
+def _is_numeric(values):
+    return pd.api.types.is_numeric_dtype(values.dtype)
+
+
+def _stream_pass(fileobj, total_bytes, fmt, header, skip_rows, auto_sep, text_columns, chunk_bytes, on_progress):
+    """
+    Un passaggio di stream_text_table sul file. Le colonne in text_columns, e quelle già di
+    testo nel primo blocco, si leggono come testo in tutti i blocchi. Si interrompe al primo
+    blocco con testo in una colonna finora numerica.
+    Restituisce (store, motori, separatore, colonne in conflitto).
+    """
+    store = None
+    names = None
+    dtype = None
+    engines = []  # Motori usati, in ordine di prima apparizione
+    sep = fmt['sep']
+    carry = b''
+    bytes_read = 0
+    block = fileobj.read(chunk_bytes)
+
+    while block:
+        bytes_read += len(block)
+        data = carry + block
+        if bytes_read < total_bytes:
+            # Tagliamo all'ultimo fine riga: il resto passa al blocco successivo
+            cut = data.rfind(b'\n') + 1
+            data, carry = data[:cut], data[cut:]
+        else:
+            carry = b''
+
+        if data.strip():
+            if names is None:
+                chunk, engine, sep = _read_csv_fast(data, sep, header, fmt['decimal'], skip_rows, auto_sep=auto_sep,
+                                                    dtype={name: str for name in text_columns} or None)
+                names = list(chunk.columns)
+                dtype = {name: str for name in names if name in text_columns or not _is_numeric(chunk[name])}
+                # Stima delle righe totali dalla densità del primo blocco
+                rows_per_byte = len(chunk) / max(len(data), 1)
+                store = ColumnStore(capacity=total_bytes * rows_per_byte * 1.05)
+            else:
+                chunk, engine, _ = _read_csv_fast(data, sep, None, fmt['decimal'], names=names, dtype=dtype or None)
+                conflicts = {name for name in names if name not in dtype and not _is_numeric(chunk[name])}
+                if conflicts:
+                    return store, engines, sep, conflicts
+            if engine not in engines:
+                engines.append(engine)
+            store.append(chunk)
+
+        if on_progress is not None and store is not None:
+            on_progress(bytes_read, total_bytes, len(store), store)
+
+        block = fileobj.read(chunk_bytes)
+
+    return store, engines, sep, set()
+
+
+def format_parse_info(filename, info):
+    """Testo breve per la UI: motore usato e velocità di parsing."""
+    if info.get('sheet') is not None:
+        return (
+            f"'{filename}': motore **{info['engine']}**, foglio `{info['sheet']}` — "
+            f"{info['size_mb']:.1f} MB in {info['seconds']:.2f} s ({info['mb_per_s']:.1f} MB/s)"
+        )
+    return (
+        f"'{filename}': motore **{info['engine']}**, {format_text_format(info)} — "
+        f"{info['size_mb']:.1f} MB in {info['seconds']:.2f} s ({info['mb_per_s']:.1f} MB/s)"
+    )
+
+
+def format_text_format(info):
+    """Delimitatore e decimale usati, per controllare a colpo d'occhio una rilevazione sbagliata."""
+    sep_label = {'\t': 'TAB', TABS_SEP: 'TAB multipli', WHITESPACE_SEP: 'spazi',
+                 FALLBACK_SEP: 'regex'}.get(info['sep'], info['sep'])
+    detected = " (rilevato)" if info.get('detected') else ""
+    return f"delimitatore `{sep_label}`{detected}, decimale `{info['decimal']}`"
+
+
+# --- Lettore ASC/RAW (spettroscopia) senza decodifica del testo ---
+
+ASC_DATA_MARKER = b'#DATA'
+ASC_COLUMNS = ['Wavenumber', 'Intensity']
+
+def _find_marker(buffer, marker, step=64 * 1024):
+    """
+    Cerca il marcatore nei byte grezzi. L'intestazione ASC è piccola, quindi
+    copiamo (e cerchiamo) solo finestre crescenti all'inizio del buffer.
+    """
+    if hasattr(buffer, 'find'):  # bytes, bytearray, mmap
+        return buffer.find(marker)
+    mv = memoryview(buffer)
+    window = step
+    while True:
+        pos = bytes(mv[:window]).find(marker)
+        if pos >= 0 or window >= len(mv):
+            return pos
+        window *= 4
+
+
+def tokenize_numbers(block):
+    """
+    Tokenizer numerico vettoriale (in C, dentro NumPy): converte un blocco di byte
+    con numeri separati da spazi/TAB/fine riga direttamente in un array float64.
+    Restituisce None se il blocco contiene token non numerici.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        try:
+            return np.fromstring(block, dtype=np.float64, sep=' ')
+        except (ValueError, DeprecationWarning):
+            return None
+
+
+_HEADER_LINE = re.compile(r'^([^=:\t]+?)\s*[=:\t]\s*(.+)$')
+
+
+def _to_number(value):
+    try:
+        return float(value.replace(',', '.')) if _NUMBER_COMMA.match(value) else float(value)
+    except ValueError:
+        return value
+
+
+def parse_asc_header(raw):
+    """
+    Estrae i parametri di acquisizione dall'intestazione ASC (righe prima di '#DATA'),
+    es. '#Exposure time (s)=1' o 'Accumulations: 10'. Solo l'intestazione viene decodificata.
+    """
+    with mapped_payload(raw) as buffer:
+        marker_pos = _find_marker(buffer, ASC_DATA_MARKER)
+        if marker_pos <= 0:
+            return {}
+        text = bytes(buffer[:marker_pos]).decode('utf-8', errors='replace')
+    header = {}
+    for line in text.splitlines():
+        line = line.strip().lstrip('#').strip()
+        match = _HEADER_LINE.match(line)
+        if match:
+            header[match.group(1).strip()] = _to_number(match.group(2).strip())
+    return header
+
+
+def read_asc(raw, n_columns=2):
+    """
+    Legge un file .asc/.raw dai byte grezzi (o dal file locale mappato in memoria):
+    trova '#DATA' tramite memoryview
+    e converte il blocco numerico direttamente in array float, senza decodificare il testo.
+    Se il blocco non è regolare ricade sul parser C di pandas.
+    """
+    with mapped_payload(raw) as buffer:
+        marker_pos = _find_marker(buffer, ASC_DATA_MARKER)
+        if marker_pos < 0:
+            raise ValueError("Marcatore #DATA non trovato. Formato ASC non riconosciuto.")
+        with memoryview(buffer) as mv:
+            block = mv[marker_pos + len(ASC_DATA_MARKER):].tobytes()
+    values = tokenize_numbers(block)
+
+    if values is not None and values.size % n_columns == 0:
+        # Controllo di forma: la prima riga di dati deve avere esattamente n_columns valori
+        first_line = block.lstrip().split(b'\n', 1)[0]
+        if len(first_line.split()) == n_columns:
+            matrix = values.reshape(-1, n_columns)
+            return pd.DataFrame(matrix, columns=ASC_COLUMNS[:n_columns])
+
+    # Fallback: blocco irregolare (testo, colonne variabili)
+    df = pd.read_csv(BytesIO(block), sep=WHITESPACE_SEP, header=None, engine='c')
+    df.columns = ASC_COLUMNS[:n_columns]
+    return df.dropna(how='all').reset_index(drop=True)
+
+
+# --- Lettore Excel veloce (calamine o openpyxl in sola lettura) ---
+
+EXCEL_BLOCK_ROWS = 50_000
+_CELL_RANGE = re.compile(r'^\s*([A-Za-z]*)(\d*)\s*(?::\s*([A-Za-z]*)(\d*))?\s*$')
+
+
+def _column_index(letters):
+    """'A' -> 0, 'AB' -> 27."""
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + (ord(char) - ord('A') + 1)
+    return index - 1
+
+
+def parse_cell_range(text):
+    """
+    Intervallo di celle in stile Excel ('A1:D5000', 'B:D', 'A10:').
+    Restituisce (prima riga, prima colonna, ultima riga, ultima colonna), 0-based
+    e inclusivi; None indica nessun limite. Stringa vuota -> foglio intero.
+    """
+    if not text or not text.strip():
+        return (0, 0, None, None)
+    match = _CELL_RANGE.match(text)
+    if not match or not any(match.groups()):
+        raise ValueError(f"Intervallo di celle '{text}' non valido (es. A1:D5000 oppure B:D)")
+    col_start, row_start, col_end, row_end = match.groups()
+    bounds = (
+        int(row_start) - 1 if row_start else 0,
+        _column_index(col_start) if col_start else 0,
+        int(row_end) - 1 if row_end else None,
+        _column_index(col_end) if col_end else None,
+    )
+    if bounds[0] < 0 or (bounds[2] is not None and bounds[2] < bounds[0]) \
+            or (bounds[3] is not None and bounds[3] < bounds[1]):
+        raise ValueError(f"Intervallo di celle '{text}' non valido")
+    return bounds
+
+
+def _excel_source(payload):
+    return payload if isinstance(payload, str) else BytesIO(payload)
+
+
+def excel_sheet_names(payload):
+    """Nomi dei fogli di una cartella di lavoro (senza leggerne il contenuto)."""
+    if HAS_CALAMINE:
+        workbook = (CalamineWorkbook.from_path(payload) if isinstance(payload, str)
+                    else CalamineWorkbook.from_filelike(BytesIO(payload)))
+        return list(workbook.sheet_names)
+    import openpyxl
+    workbook = openpyxl.load_workbook(_excel_source(payload), read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def _iter_excel_rows(payload, sheet, bounds):
+    """
+    Righe del foglio (liste di valori, celle vuote = None) tagliate all'intervallo.
+    Restituisce (motore, nome del foglio, stima del numero di righe, iteratore).
+    """
+    row_start, col_start, row_end, col_end = bounds
+    col_stop = None if col_end is None else col_end + 1
+
+    if HAS_CALAMINE:
+        workbook = (CalamineWorkbook.from_path(payload) if isinstance(payload, str)
+                    else CalamineWorkbook.from_filelike(BytesIO(payload)))
+        ws = workbook.get_sheet_by_name(sheet) if sheet else workbook.get_sheet_by_index(0)
+        # calamine restituisce le righe dalla prima riga del foglio, ma le colonne
+        # a partire dalla prima colonna non vuota (ws.start): riallineiamo come openpyxl
+        offset = ws.start[1] if ws.height else 0
+        left = max(col_start - offset, 0)
+        right = None if col_stop is None else max(col_stop - offset, 0)
+        pad = [None] * max(min(offset, col_stop if col_stop is not None else offset) - col_start, 0)
+        width = None if col_stop is None else col_stop - col_start
+        n_rows = ws.height if row_end is None else min(ws.height, row_end + 1)
+
+        def _rows():
+            for i, row in enumerate(ws.iter_rows()):
+                if i < row_start:
+                    continue
+                if row_end is not None and i > row_end:
+                    break
+                values = pad + [None if value == '' else value for value in row[left:right]]
+                if width is not None and len(values) < width:
+                    values += [None] * (width - len(values))  # Intervallo oltre l'area usata
+                yield values
+
+        return 'calamine', ws.name, max(n_rows - row_start, 0), _rows()
+
+    import openpyxl
+    workbook = openpyxl.load_workbook(_excel_source(payload), read_only=True, data_only=True)
+    ws = workbook[sheet] if sheet else workbook.worksheets[0]
+    n_rows = ws.max_row or 0
+
+    def _rows():
+        try:
+            for row in ws.iter_rows(min_row=row_start + 1, max_row=None if row_end is None else row_end + 1,
+                                    min_col=col_start + 1, max_col=col_stop, values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+
+    if row_end is not None:
+        n_rows = min(n_rows, row_end + 1)
+    return 'openpyxl (sola lettura)', ws.title, max(n_rows - row_start, 0), _rows()
+
+
+def _excel_names(header_row, width, header_arg):
+    """Nomi colonna dalla riga di intestazione (o Colonna_N se il foglio non ne ha)."""
+    if header_arg is None:
+        return [f'Colonna_{i+1}' for i in range(width)]
+    names = []
+    for i in range(width):
+        value = header_row[i] if i < len(header_row) else None
+        name = str(value).strip() if value is not None else f'Unnamed_{i}'
+        while name in names:
+            name = f'{name}_{i}'
+        names.append(name)
+    return names
+
+
+_EXCEL_NUMERIC_TYPES = {int, float, type(None)}
+
+
+def _excel_column(values):
+    """
+    Colonna di un blocco: float64 se contiene solo numeri o celle vuote (caso tipico),
+    altrimenti object. Il controllo è sul tipo esatto: testi come '001' e booleani
+    restano tali, come in pd.read_excel, invece di diventare numeri.
+    """
+    if set(map(type, values)) <= _EXCEL_NUMERIC_TYPES:
+        return np.array(values, dtype=np.float64)
+    return np.array(values, dtype=object)
+
+
+def excel_header(payload, sheet=None, cell_range='', header_arg='infer', skip_rows=0):
+    """Solo i nomi colonna (per la scelta delle colonne nella UI): legge una riga."""
+    _, _, _, rows = _iter_excel_rows(payload, sheet, parse_cell_range(cell_range))
+    try:
+        for _ in range(skip_rows):
+            next(rows, None)
+        first = next(rows, None) or []
+    finally:
+        rows.close()
+    return _excel_names(first, len(first), header_arg)
+
+
+def _chain_first(first, rows):
+    yield first
+    yield from rows
+
+
+def _excel_block(block, names):
+    """Blocco di righe -> DataFrame colonnare (una conversione NumPy per colonna)."""
+    columns = list(zip(*block))
+    return pd.DataFrame({name: _excel_column(values) for name, values in zip(names, columns)}, copy=False)
+
+
+def read_excel_fast(payload, sheet=None, cell_range='', columns=None, header_arg='infer', skip_rows=0,
+                    block_rows=EXCEL_BLOCK_ROWS):
+    """
+    Legge un foglio Excel (bytes o percorso locale) in streaming: righe a blocchi,
+    solo le colonne richieste, accodate a un ColumnStore come per i file di testo.
+    Motore: calamine (Rust) se installato, altrimenti openpyxl in sola lettura.
+    Restituisce (DataFrame, info).
+    """
+    start = time.perf_counter()
+    engine, sheet_name, n_rows, sheet_rows = _iter_excel_rows(payload, sheet, parse_cell_range(cell_range))
+
+    try:
+        for _ in range(skip_rows):
+            next(sheet_rows, None)
+        first = next(sheet_rows, None)
+        if first is None:
+            return pd.DataFrame(), None
+
+        names = _excel_names(first, len(first), header_arg)
+        # Senza intestazione la prima riga letta è già un dato
+        rows = _chain_first(first, sheet_rows) if header_arg is None else sheet_rows
+
+        keep = list(range(len(names)))
+        if columns:
+            missing = [c for c in columns if c not in names]
+            if missing:
+                raise ValueError(f"Colonne non trovate nel foglio '{sheet_name}': {', '.join(map(str, missing))}")
+            keep = [names.index(c) for c in columns]
+        keep_names = [names[i] for i in keep]
+
+        store = ColumnStore(capacity=n_rows)
+        block = []
+        for row in rows:
+            # Righe più corte dell'intestazione: le celle mancanti sono vuote
+            block.append([row[i] if i < len(row) else None for i in keep])
+            if len(block) >= block_rows:
+                store.append(_excel_block(block, keep_names))
+                block = []
+        if block:
+            store.append(_excel_block(block, keep_names))
+    finally:
+        sheet_rows.close()
+
+    df = store.to_frame()
+    # Colonne miste (date, testo con celle vuote): il tipo finale lo sceglie pandas
+    object_cols = [c for c in df.columns if df[c].dtype == object]
+    if object_cols:
+        df[object_cols] = df[object_cols].infer_objects()
+    # Righe completamente vuote (in fondo al foglio o dentro l'intervallo)
+    empty_rows = df.isna().all(axis=1).to_numpy()
+    if empty_rows.any():
+        df = df[~empty_rows].reset_index(drop=True)
+
+    elapsed = time.perf_counter() - start
+    info = _parse_info(engine, None, 0 if header_arg is not None else None, None, elapsed, payload_size(payload))
+    info['sheet'] = sheet_name
+    return df, info
+
+
+# --- Modalità "segui file" (file ancora in scrittura da uno strumento) ---
+
+class TailFollower:
+    """
+    Segue un file locale CSV/TXT o ASC/RAW mentre lo strumento lo scrive.
+    Ricorda l'offset (in byte) dell'ultima riga completa letta: ogni poll()
+    legge e parsa solo i byte aggiunti e li accoda a un ColumnStore.
+    Formato, separatore e nomi colonna sono quelli rilevati alla prima lettura.
+    """
+
+    def __init__(self, path, options):
+        self.path = path
+        self.options = dict(options)
+        self.extension = file_extension(path)
+        self.offset = 0
+        self.store = None
+        self.names = None    # Nomi grezzi del parser (per i blocchi successivi)
+        self.columns = None  # Nomi puliti, come clean_column_names
+        self.sep = None
+        self.decimal = '.'
+        self.header = {}
+        self.info = None
+        self.loaded_at = None  # Istante della prima lettura (distingue le riletture da capo)
+
+    def _read_from(self, offset):
+        """Byte dall'offset fino all'ultimo fine riga (la riga in scrittura resta per il prossimo giro)."""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            block = f.read()
+        cut = block.rfind(b'\n') + 1
+        return block[:cut]
+
+    def load(self):
+        """Prima lettura dell'intero file. Restituisce il DataFrame iniziale."""
+        if self.extension not in TEXT_EXTENSIONS + ASC_EXTENSIONS:
+            raise ValueError("La modalità 'segui file' supporta solo file CSV/TXT e ASC/RAW")
+        data = self._read_from(0)
+        if not data.strip():
+            raise ValueError("Il file non contiene ancora righe complete")
+
+        if self.extension in ASC_EXTENSIONS:
+            df = read_asc(data)
+            self.header = parse_asc_header(data)
+        else:
+            df, self.info = read_text_table(data, self.options['delimiter'], self.options['skip_rows'],
+                                            self.options['header_arg'])
+            self.sep, self.decimal = self.info['sep'], self.info['decimal']
+            self.names = list(df.columns)
+
+        df = clean_column_names(df, self.extension, self.options['header_arg'])
+        self.columns = list(df.columns)
+        self.store = ColumnStore(capacity=max(len(df), 1) * 2)
+        self.store.append(df)
+        self.offset = len(data)
+        self.loaded_at = time.time_ns()
+        return self.frame()
+
+    def poll(self):
+        """
+        Parsa le righe aggiunte dall'ultima lettura. Restituisce il numero di righe nuove.
+        Solleva ValueError se il file è stato troncato o sostituito (va riletto da capo).
+        """
+        size = os.path.getsize(self.path)
+        if size < self.offset:
+            raise ValueError("Il file è stato troncato o sostituito")
+        if size == self.offset:
+            return 0
+
+        data = self._read_from(self.offset)
+        if not data:
+            return 0  # Solo una riga ancora incompleta
+        self.offset += len(data)
+        if not data.strip():
+            return 0
+
+        if self.extension in ASC_EXTENSIONS:
+            n_columns = len(self.columns)
+            values = tokenize_numbers(data)
+            if values is not None and values.size % n_columns == 0:
+                chunk = pd.DataFrame(values.reshape(-1, n_columns), columns=self.columns)
+            else:
+                chunk = pd.read_csv(BytesIO(data), sep=WHITESPACE_SEP, header=None, engine='c')
+                chunk.columns = self.columns
+        else:
+            chunk, _, _ = _read_csv_fast(data, self.sep, None, self.decimal, names=self.names)
+            chunk.columns = self.columns
+
+        self.store.append(chunk)
+        return len(chunk)
+
+    def frame(self):
+        """DataFrame con tutte le righe lette finora (viste sugli array, nessuna copia)."""
+        return self.store.to_frame(trim=False)
+
+
+# --- Parsing di un singolo file (usato sia in serie sia dal pool di processi) ---
+
+TEXT_EXTENSIONS = ['csv', 'txt']
+EXCEL_EXTENSIONS = ['xlsx', 'xls']
+ASC_EXTENSIONS = ['asc', 'raw']
+SUPPORTED_EXTENSIONS = TEXT_EXTENSIONS + EXCEL_EXTENSIONS + ASC_EXTENSIONS
+
+
+def file_extension(filename):
+    return filename.split('.')[-1].lower()
+
+
+def clean_column_names(df, extension, header_arg):
+    """Logica di pulizia finale dei nomi colonna (per singolo file)."""
+    # Rinomina colonne se Pandas ha usato numeri (solo per CSV/TXT standard)
+    if extension not in ASC_EXTENSIONS and (header_arg is None or all(isinstance(col, int) for col in df.columns)):
+        df.columns = [f'Colonna_{i+1}' for i in range(df.shape[1])]
+
+    # Pulisci e normalizza i nomi delle colonne
+    df.columns = df.columns.astype(str).str.strip().str.replace(r'[^A-Za-z0-9_]+', '', regex=True)
+    return df
+
+
+def parse_file_payload(filename, payload, options):
+    """
+    Parsa un file (CSV/TXT, Excel o ASC) a partire dai suoi byte o dal percorso
+    di un file locale (letto direttamente dal disco), senza usare Streamlit.
+    options: dict con 'delimiter', 'skip_rows', 'header_arg'
+    (+ 'excel_sheet', 'excel_range', 'excel_columns' per i file Excel).
+    Restituisce (DataFrame con colonne pulite, info di parsing o None).
+    """
+    extension = file_extension(filename)
+    header_arg = options['header_arg']
+    info = None
+
+    if extension in EXCEL_EXTENSIONS and (HAS_CALAMINE or extension == 'xlsx'):
+        df, info = read_excel_fast(
+            payload,
+            sheet=options.get('excel_sheet'),
+            cell_range=options.get('excel_range', ''),
+            columns=options.get('excel_columns'),
+            header_arg=header_arg,
+            skip_rows=options['skip_rows'],
+        )
+        # I nomi sono già definitivi (Colonna_N senza intestazione): solo normalizzazione
+        return clean_column_names(df, extension, 0), info
+    elif extension in EXCEL_EXTENSIONS:
+        # .xls senza calamine: openpyxl non legge il vecchio formato
+        xls_header = 0 if header_arg == 'infer' else header_arg
+        source = payload if isinstance(payload, str) else BytesIO(payload)
+        df = pd.read_excel(source, sheet_name=options.get('excel_sheet') or 0,
+                           skiprows=options['skip_rows'], header=xls_header)
+    elif extension in TEXT_EXTENSIONS:
+        df, info = read_text_table(payload, options['delimiter'], options['skip_rows'], header_arg)
+    elif extension in ASC_EXTENSIONS:
+        df = read_asc(payload)
+    else:
+        raise ValueError(f"Estensione '{extension}' non supportata")
+
+    return clean_column_names(df, extension, header_arg), info
+
+
+def parse_job(job):
+    """
+    Punto di ingresso dei worker: non solleva mai eccezioni, così gli errori
+    del singolo file tornano alla UI come messaggi (come nel ciclo seriale).
+    job = (nome file, bytes o percorso locale, options).
+    Restituisce un dict con 'df', 'info', 'header' (metadati ASC) ed 'error'.
+    """
+    filename, payload, options = job
+    if file_extension(filename) not in SUPPORTED_EXTENSIONS:
+        return {'df': None, 'info': None, 'header': {}, 'error': ('unsupported', file_extension(filename))}
+    try:
+        df, info = parse_file_payload(filename, payload, options)
+        header = parse_asc_header(payload) if file_extension(filename) in ASC_EXTENSIONS else {}
+        return {'df': df, 'info': info, 'header': header, 'error': None}
+    except ValueError as ve:
+        return {'df': None, 'info': None, 'header': {}, 'error': ('format', str(ve))}
+    except Exception as e:
+        return {'df': None, 'info': None, 'header': {}, 'error': ('generic', str(e))}
+
+
+# --- Pool di processi per l'importazione di molti file ---
+
+DEFAULT_WORKERS = pool_utils.DEFAULT_WORKERS
+# Sotto questa dimensione totale i file si leggono in serie: avviare i processi ('spawn')
+# e spedire loro i dati costa più del parsing di pochi file piccoli
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+
+def _payload_size(payload):
+    """Byte da leggere: lunghezza dei bytes o dimensione del file locale."""
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return len(payload)
+    try:
+        return os.path.getsize(payload)
+    except OSError:
+        return 0
+
+
+def parse_jobs(jobs, max_workers=1, min_parallel_bytes=PARALLEL_MIN_BYTES):
+    """
+    Esegue parse_job su tutti i job, in parallelo (pool condiviso) se max_workers > 1 e i
+    file sono almeno min_parallel_bytes in totale, altrimenti in serie.
+    I risultati mantengono l'ordine dei job (concatenazione deterministica).
+    """
+    if sum(_payload_size(payload) for _, payload, _ in jobs) < min_parallel_bytes:
+        max_workers = 1
+    return pool_utils.run_jobs(parse_job, jobs, max_workers)
+
+
+# --- Identità del file sorgente per import multi-file ---
+
+SOURCE_COLUMN = 'source'
+
+
+def unique_labels(filenames):
+    """Nomi file univoci (lo stesso nome caricato due volte riceve un suffisso)."""
+    seen = {}
+    labels = []
+    for name in filenames:
+        seen[name] = seen.get(name, 0) + 1
+        labels.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return labels
+
+
+def concat_with_source(dfs, filenames):
+    """
+    Concatena i DataFrame aggiungendo la colonna categorica 'source':
+    codici interi (int8/int16) + una sola copia di ogni nome file.
+    """
+    final_df = pd.concat(dfs, ignore_index=True)
+    if len(dfs) < 2 or SOURCE_COLUMN in final_df.columns:
+        return final_df
+
+    lengths = np.array([len(df) for df in dfs])
+    code_dtype = np.int8 if len(dfs) < 127 else (np.int16 if len(dfs) < 32767 else np.int32)
+    codes = np.repeat(np.arange(len(dfs), dtype=code_dtype), lengths)
+    final_df[SOURCE_COLUMN] = pd.Categorical.from_codes(codes, categories=unique_labels(filenames))
+    return final_df
+
+
+def build_metadata_table(filenames, results):
+    """Tabella dei metadati: una riga per file (dimensioni + parametri dell'intestazione ASC)."""
+    records = []
+    for label, name, result in zip(unique_labels(filenames), filenames, results):
+        df = result['df']
+        record = {
+            SOURCE_COLUMN: label,
+            'formato': file_extension(name),
+            'righe': len(df),
+            'colonne': df.shape[1],
+        }
+        record.update(result.get('header') or {})
+        records.append(record)
+    return pd.DataFrame(records)
+
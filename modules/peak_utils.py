@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+# --- Rilevamento dei picchi su molte curve insieme ---
+# Le curve sono le righe di una matrice (curve x punti, completate con NaN se di lunghezze
+# diverse): massimi locali, prominenza e larghezza sono calcolati per tutti i picchi di tutte
+# le curve con operazioni NumPy, senza cicli Python sui picchi.
+#
+# La prominenza segue la definizione di scipy.signal.peak_prominences: da ogni picco si scende
+# a sinistra e a destra fino al primo punto più alto (o al bordo / alla finestra wlen); la base
+# è il più alto dei due minimi incontrati. La ricerca avviene in finestre crescenti (16, 64,
+# 256... campioni): i picchi di rumore si risolvono subito, solo i pochi picchi alti arrivano
+# alle finestre larghe, così il lavoro resta proporzionale alla distanza effettiva percorsa.
+
+FIRST_WINDOW = 16
+WINDOW_GROWTH = 4
+# Altezza relativa (frazione della prominenza) a cui si misura la larghezza: 0.5 = FWHM
+REL_HEIGHT = 0.5
+
+
+def _gather(values, rows, cols, direction, offsets, limit):
+    """
+    Valori dei campioni alle distanze `offsets` dopo (direction=+1) o prima (-1) di ogni picco:
+    matrice (picchi x distanze) e maschera dei campioni oltre il bordo, la finestra wlen o NaN.
+    """
+    n = values.shape[1]
+    positions = cols[:, None] + direction * offsets
+    gathered = values[rows[:, None], np.clip(positions, 0, n - 1)]
+    outside = (positions < 0) | (positions >= n) | np.isnan(gathered)
+    if limit is not None:
+        outside |= offsets > limit[:, None]
+    return gathered, outside
+
+
+def _bases(values, rows, cols, heights, direction, limit):
+    """Minimo tra il picco e il primo punto più alto su un lato: (valore, distanza in campioni)."""
+    base = heights.copy()
+    base_offset = np.zeros(len(rows), dtype=np.int64)
+    pending = np.arange(len(rows))
+    scanned, window = 0, FIRST_WINDOW
+    while len(pending):
+        # Si leggono solo le distanze non ancora esplorate: il minimo parziale è in base
+        offsets = np.arange(scanned + 1, scanned + window + 1)
+        h = heights[pending]
+        gathered, outside = _gather(values, rows[pending], cols[pending], direction, offsets,
+                                    None if limit is None else limit[pending])
+        # Fine della discesa: un punto più alto, il bordo, la finestra wlen o un NaN
+        blocked = np.logical_or.accumulate((gathered > h[:, None]) | outside, axis=1)
+        masked = np.where(blocked, np.inf, gathered)
+        lowest = masked.argmin(axis=1)
+        low = masked[np.arange(len(pending)), lowest]
+        lower = low < base[pending]
+        base[pending[lower]] = low[lower]
+        base_offset[pending[lower]] = offsets[lowest[lower]]
+        pending = pending[~blocked[:, -1]]
+        scanned += window
+        window *= WINDOW_GROWTH
+    return base, base_offset
+
+
+def _crossings(values, rows, cols, heights, reference, direction, limit):
+    """
+    Distanza (frazionaria, interpolata) a cui la curva scende sotto `reference` su un lato.
+    Il punto esiste sempre entro la base, perché la base è sotto il livello di riferimento.
+    """
+    crossing = np.zeros(len(rows))
+    previous = heights.copy()  # Ultimo valore sopra il riferimento (all'inizio il picco)
+    pending = np.arange(len(rows))
+    scanned, window = 0, FIRST_WINDOW
+    while len(pending):
+        offsets = np.arange(scanned + 1, scanned + window + 1)
+        ref = reference[pending]
+        gathered, outside = _gather(values, rows[pending], cols[pending], direction, offsets, limit[pending])
+        below = (gathered <= ref[:, None]) | outside
+        found = below.any(axis=1)
+        first = below.argmax(axis=1)
+        index = np.arange(len(pending))
+        after = gathered[index, first]
+        before = np.where(first > 0, gathered[index, np.maximum(first - 1, 0)], previous[pending])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.where(outside[index, first], 0.0, (before - ref) / (before - after))
+        crossing[pending[found]] = (offsets[first] - 1 + np.nan_to_num(fraction, nan=0.0))[found]
+        previous[pending] = gathered[:, -1]
+        pending = pending[~found]
+        scanned += window
+        window *= WINDOW_GROWTH
+    return crossing
+
+
+def _x_at(x, rows, positions):
+    """Coordinata x in posizioni frazionarie (interpolazione lineare tra i campioni vicini)."""
+    n = x.shape[1]
+    low = np.clip(np.floor(positions).astype(np.int64), 0, n - 1)
+    high = np.minimum(low + 1, n - 1)
+    fraction = positions - low
+    x_low, x_high = x[rows, low], x[rows, high]
+    return x_low + fraction * (x_high - x_low)
+
+
+def find_peaks(values, x=None, height=None, prominence=None, width=None, wlen=None, rel_height=REL_HEIGHT):
+    """
+    Picchi di ogni riga di `values` (curve x punti). Soglie minime opzionali su altezza,
+    prominenza e larghezza (in unità di x, misurata a rel_height della prominenza).
+    wlen limita la ricerca della base a una finestra di wlen campioni centrata sul picco.
+    I picchi con prominenza nulla (gradini, plateau in salita) sono scartati.
+    Restituisce un dict di array paralleli: row, index, x, height, prominence, width, left, right.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[None, :]
+    m, n = values.shape
+    x = np.broadcast_to(np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64), (m, n))
+
+    # Massimi locali (il primo campione di un plateau); i bordi non sono mai picchi
+    center = values[:, 1:-1]
+    rows, cols = np.nonzero((center > values[:, :-2]) & (center >= values[:, 2:]))
+    cols = cols + 1
+    heights = values[rows, cols]
+    if height is not None:
+        keep = heights >= height
+        rows, cols, heights = rows[keep], cols[keep], heights[keep]
+
+    minimum = 0 if prominence is None else max(prominence, 0)
+    limit = None if wlen is None else np.full(len(rows), max(int(wlen) // 2, 1))
+    left_base, left_offset = _bases(values, rows, cols, heights, -1, limit)
+    # La prominenza non supera la discesa a sinistra: i picchi già sotto soglia non si esplorano a destra
+    keep = (heights > left_base) & (heights - left_base >= minimum)
+    rows, cols, heights, left_base, left_offset = rows[keep], cols[keep], heights[keep], left_base[keep], left_offset[keep]
+    right_base, right_offset = _bases(values, rows, cols, heights, +1, None if limit is None else limit[keep])
+    prominences = heights - np.maximum(left_base, right_base)
+    keep = (prominences > 0) & (prominences >= minimum)
+    rows, cols, heights, prominences = rows[keep], cols[keep], heights[keep], prominences[keep]
+    left_offset, right_offset = left_offset[keep], right_offset[keep]
+
+    reference = heights - prominences * rel_height
+    left = cols - _crossings(values, rows, cols, heights, reference, -1, left_offset)
+    right = cols + _crossings(values, rows, cols, heights, reference, +1, right_offset)
+    x_left, x_right = _x_at(x, rows, left), _x_at(x, rows, right)
+    widths = np.abs(x_right - x_left)
+    keep = widths >= width if width is not None else np.ones(len(rows), dtype=bool)
+
+    return {
+        'row': rows[keep],
+        'index': cols[keep],
+        'x': x[rows[keep], cols[keep]],
+        'height': heights[keep],
+        'prominence': prominences[keep],
+        'width': widths[keep],
+        'left': x_left[keep],
+        'right': x_right[keep],
+    }
+
+
+def curves_matrix(df, x_col, y_cols, groups=None):
+    """
+    Curve del DataFrame come matrice: una riga per colonna y (oppure per colonna y e file,
+    se groups = [(nome, posizioni), ...] come da plotting.source_groups). Le righe più corte
+    sono completate con NaN; ogni riga è ordinata per x se non è già monotona.
+    Restituisce (x, valori, etichette).
+    """
+    x_all = df[x_col].to_numpy(dtype=np.float64, na_value=np.nan)
+    y_all = [df[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in y_cols]
+    if not groups:
+        x = np.broadcast_to(x_all, (len(y_cols), len(x_all)))
+        values = np.vstack(y_all) if y_all else np.empty((0, len(x_all)))
+        labels = list(y_cols)
+    else:
+        width = max(len(positions) for _, positions in groups)
+        count = len(y_cols) * len(groups)
+        x = np.full((count, width), np.nan)
+        values = np.full((count, width), np.nan)
+        labels = []
+        row = 0
+        for c, y in zip(y_cols, y_all):
+            for label, positions in groups:
+                x[row, :len(positions)] = x_all[positions]
+                values[row, :len(positions)] = y[positions]
+                labels.append(f"{c} — {label}")
+                row += 1
+
+    # Campioni senza x o y (es. righe di altri file in un import unito): si compattano in fondo
+    valid = ~(np.isnan(x) | np.isnan(values))
+    if not valid.all():
+        order = np.argsort(~valid, axis=1, kind='stable')
+        valid = np.take_along_axis(valid, order, axis=1)
+        x = np.where(valid, np.take_along_axis(x, order, axis=1), np.nan)
+        values = np.where(valid, np.take_along_axis(values, order, axis=1), np.nan)
+
+    steps = np.diff(x, axis=1)
+    monotonic = np.all((steps >= 0) | np.isnan(steps), axis=1) | np.all((steps <= 0) | np.isnan(steps), axis=1)
+    if not monotonic.all():
+        x = np.array(x)
+        unsorted = np.flatnonzero(~monotonic)
+        order = np.argsort(x[unsorted], axis=1, kind='stable')  # NaN in fondo
+        x[unsorted] = np.take_along_axis(x[unsorted], order, axis=1)
+        values[unsorted] = np.take_along_axis(values[unsorted], order, axis=1)
+    return x, values, labels
+
+
+def peak_table(df, x_col, y_cols, groups=None, **thresholds):
+    """Tabella dei picchi di tutte le curve (una riga per picco, ordinata per curva e x)."""
+    x, values, labels = curves_matrix(df, x_col, y_cols, groups)
+    peaks = find_peaks(values, x, **thresholds)
+    table = pd.DataFrame({
+        'Curva': np.asarray(labels, dtype=object)[peaks['row']],
+        'X Picco': peaks['x'],
+        'Y Picco': peaks['height'],
+        'Prominenza': peaks['prominence'],
+        'Larghezza': peaks['width'],
+    })
+    return table.sort_values(['Curva', 'X Picco'], kind='stable', ignore_index=True)
@@ -8,6 +8,10 @@ from io import BytesIO
 
 import modules.export_utils as export_utils 
 import modules.annotation_utils as au 
+import modules.stats_utils as stats_utils
+import modules.peak_utils as peak_utils
+import modules.fit_utils as fit_utils
+from modules.parse_utils import SOURCE_COLUMN
 
 # Assicurati che la funzione calculate_and_plot_intersections sia definita qui sopra
 def calculate_and_plot_intersections(fig, df, x_axis_name, ref_type, val1, val2, show_points, show_table):
@@ -97,6 +101,133 @@ def calculate_and_plot_intersections(fig, df, x_axis_name, ref_type, val1, val2,
     return intersection_results
 
 
+def source_groups(df):
+    """
+    Righe di ciascun file sorgente (colonna categorica 'source').
+    Un solo argsort stabile sui codici interi, poi semplici slice: niente groupby su stringhe.
+    Restituisce una lista di (nome file, array di indici posizionali).
+    """
+    if SOURCE_COLUMN not in df.columns or not isinstance(df[SOURCE_COLUMN].dtype, pd.CategoricalDtype):
+        return []
+    codes = df[SOURCE_COLUMN].cat.codes.to_numpy()
+    categories = df[SOURCE_COLUMN].cat.categories
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+    bounds = np.concatenate([[0], np.cumsum(counts)]) + np.count_nonzero(codes < 0)
+    return [(categories[i], order[bounds[i]:bounds[i + 1]]) for i in range(len(categories)) if counts[i]]
+
+
+def _add_2d_traces(fig, df, x_axis, y_col, name, yaxis, mode, color, width, groups=None):
+    """Aggiunge la curva y_col: una sola traccia, oppure una per file se 'groups' è valorizzato."""
+    if not groups:
+        fig.add_trace(go.Scatter(
+            x=df[x_axis], y=df[y_col], mode=mode,
+            name=name, yaxis=yaxis, 
+            line=dict(color=color, width=width) if mode == 'lines' else None,
+            marker=dict(color=color, size=width) if mode == 'markers' else None
+        ))
+        return
+
+    x_values = df[x_axis].to_numpy()
+    y_values = df[y_col].to_numpy()
+    palette = px.colors.qualitative.Plotly
+    for g, (label, idx) in enumerate(groups):
+        group_color = palette[g % len(palette)]
+        fig.add_trace(go.Scatter(
+            x=x_values[idx], y=y_values[idx], mode=mode,
+            name=f"{name} — {label}", yaxis=yaxis, legendgroup=str(label),
+            line=dict(color=group_color, width=width) if mode == 'lines' else None,
+            marker=dict(color=group_color, size=width) if mode == 'markers' else None
+        ))
+
+
+def _show_peak_controls():
+    """Soglie del rilevamento picchi nella sidebar (None se il rilevamento è spento)."""
+    st.sidebar.header("6. Rilevamento Picchi")
+    if not st.sidebar.checkbox("Rileva picchi sulle curve", key="peaks_enabled"):
+        return None
+    prominence = st.sidebar.number_input("Prominenza minima", min_value=0.0, value=0.0, format="%g", key="peaks_prominence")
+    height = st.sidebar.number_input("Altezza minima (opzionale)", value=None, format="%g", key="peaks_height")
+    width = st.sidebar.number_input("Larghezza minima (unità di X, opzionale)", min_value=0.0, value=None,
+                                    format="%g", key="peaks_width")
+    wlen = st.sidebar.number_input("Finestra per la base (campioni, opzionale)", min_value=3, value=None, step=1,
+                                   key="peaks_wlen", help="Limita la ricerca della base del picco: utile con linee di base molto inclinate.")
+    return {'prominence': prominence or None, 'height': height, 'width': width, 'wlen': wlen}
+
+
+def _add_peak_traces(fig, df, x_axis, y_axes_left, y_axes_right, groups, settings):
+    """
+    Picchi di tutte le curve (e di tutti i file, se divise per file) in un'unica passata
+    vettoriale per asse: una sola traccia di marker per asse Y e la tabella dei picchi.
+    """
+    tables = []
+    for columns, yaxis, suffix in ((y_axes_left, 'y1', ""), (y_axes_right, 'y2', " (Destra)")):
+        if not columns:
+            continue
+        try:
+            table = peak_utils.peak_table(df, x_axis, columns, groups, **settings)
+        except (ValueError, TypeError) as e:
+            st.warning(f"Rilevamento picchi non disponibile per l'asse X '{x_axis}': {e}")
+            return None
+        fig.add_trace(go.Scatter(
+            x=table['X Picco'], y=table['Y Picco'], mode='markers',
+            name=f"Picchi{suffix}", yaxis=yaxis, text=table['Curva'],
+            hovertemplate="%{text}<br>X=%{x:.4g}<br>Y=%{y:.4g}<extra></extra>",
+            marker=dict(size=9, color='red', symbol='triangle-down')
+        ))
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True) if tables else None
+
+
+def _show_fit_controls():
+    """Modello del fit multi-picco nella sidebar (None se il fit è spento)."""
+    st.sidebar.header("7. Fit dei Picchi")
+    if not st.sidebar.checkbox("Adatta un modello alle curve (asse sinistro)", key="fit_enabled"):
+        return None
+    shape = st.sidebar.selectbox("Forma dei picchi", list(fit_utils.SHAPES), key="fit_shape")
+    n_peaks = st.sidebar.number_input("Numero di picchi", min_value=1, max_value=20, value=1, step=1, key="fit_peaks")
+    degree = st.sidebar.selectbox("Linea di base (grado del polinomio)", [0, 1, 2], index=1, key="fit_degree")
+    workers = st.sidebar.number_input("Processi in parallelo", min_value=1, max_value=fit_utils.DEFAULT_WORKERS,
+                                      value=fit_utils.DEFAULT_WORKERS, step=1, key="fit_workers",
+                                      help="Le curve sono divise in blocchi contigui, uno per processo.")
+    return {'shape': fit_utils.SHAPES[shape], 'n_peaks': int(n_peaks), 'degree': degree, 'max_workers': int(workers)}
+
+
+def _add_fit_traces(fig, df, x_axis, y_axes_left, groups, settings):
+    """
+    Fit di tutte le curve dell'asse sinistro (e di tutti i file, se divise per file) con lo
+    stesso modello; per la curva scelta si disegnano fit totale, componenti e residuo.
+    Restituisce la tabella dei fit.
+    """
+    if not y_axes_left:
+        return None
+    try:
+        x, values, labels = peak_utils.curves_matrix(df, x_axis, y_axes_left, groups)
+        with st.spinner(f"Fit di {len(labels)} curve..."):
+            model, results = fit_utils.fit_series(x, values, **settings)
+    except (ValueError, TypeError) as e:
+        st.warning(f"Fit non disponibile per l'asse X '{x_axis}': {e}")
+        return None
+
+    shown = st.sidebar.selectbox("Curva da mostrare", labels, key="fit_curve_shown")
+    i = labels.index(shown)
+    valid = ~(np.isnan(x[i]) | np.isnan(values[i]))
+    x_fit, y_fit = x[i][valid], values[i][valid]
+    params = results[i]['params']
+    baseline, components = model.components(x_fit, params)
+    total = baseline + components.sum(axis=0)
+    fig.add_trace(go.Scatter(x=x_fit, y=total, mode='lines', name=f"Fit — {shown}", yaxis='y1',
+                             line=dict(color='black', width=2, dash='dash')))
+    fig.add_trace(go.Scatter(x=x_fit, y=baseline, mode='lines', name="Linea di base", yaxis='y1',
+                             line=dict(color='gray', width=1, dash='dot')))
+    for k, component in enumerate(components, start=1):
+        fig.add_trace(go.Scatter(x=x_fit, y=baseline + component, mode='lines', name=f"Picco {k}",
+                                 yaxis='y1', line=dict(width=1), legendgroup="fit_components"))
+    fig.add_trace(go.Scatter(x=x_fit, y=y_fit - total, mode='lines', name="Residuo", yaxis='y1',
+                             line=dict(color='red', width=1)))
+    return fit_utils.fit_table(labels, model, results)
+
+
 def show_plotting_ui(df):
     
     st.header("Costruttore di Grafici")
@@ -158,6 +289,14 @@ def show_plotting_ui(df):
             default=[],
             key="y_axes_right"
         )
+
+    # Import multi-file: una traccia per ogni file (colonna 'source')
+    split_by_source = False
+    if is_2d and SOURCE_COLUMN in column_list:
+        split_by_source = st.sidebar.checkbox(
+            "Una traccia per file (source)", value=False, key="split_by_source",
+            help="Disegna ogni curva separatamente per ciascun file importato."
+        )
     
     if is_3d:
         
@@ -336,6 +475,14 @@ def show_plotting_ui(df):
     ref_equation = annotation_settings['ref_equation']
     show_points = annotation_settings['show_points']
     show_table = annotation_settings['show_table']
+
+    # ===== BLOCCO 6: RILEVAMENTO PICCHI (solo 2D) =====
+    peak_settings = _show_peak_controls() if is_2d else None
+    peaks_df = None
+
+    # ===== BLOCCO 7: FIT DEI PICCHI (solo 2D) =====
+    fit_settings = _show_fit_controls() if is_2d else None
+    fit_df = None
     
     # -----------------------------------------------------------------
     # FINE BLOCCHI SIDEBAR
@@ -350,6 +497,7 @@ def show_plotting_ui(df):
         if is_2d:
             fig = go.Figure() 
             mode = 'lines' if plot_type == "Linea 2D" else 'markers'
+            groups = source_groups(df) if split_by_source else None
             
             # Loop per ASSE SINISTRO (y1)
             for y_col in y_axes_left:
@@ -357,12 +505,7 @@ def show_plotting_ui(df):
                 color = settings.get('color', 'blue') 
                 width = settings.get('width', 2.0)
                 
-                fig.add_trace(go.Scatter(
-                    x=df[x_axis], y=df[y_col], mode=mode,
-                    name=y_col, yaxis='y1', 
-                    line=dict(color=color, width=width) if mode == 'lines' else None,
-                    marker=dict(color=color, size=width) if mode == 'markers' else None
-                ))
+                _add_2d_traces(fig, df, x_axis, y_col, y_col, 'y1', mode, color, width, groups)
             
             # Loop per ASSE DESTRO (y2)
             for y_col in y_axes_right:
@@ -372,12 +515,7 @@ def show_plotting_ui(df):
                 color = settings.get('color', default_color) 
                 width = settings.get('width', 2.0)
                 
-                fig.add_trace(go.Scatter(
-                    x=df[x_axis], y=df[y_col], mode=mode,
-                    name=f"{y_col} (Destra)", yaxis='y2', 
-                    line=dict(color=color, width=width) if mode == 'lines' else None,
-                    marker=dict(color=color, size=width) if mode == 'markers' else None
-                ))
+                _add_2d_traces(fig, df, x_axis, y_col, f"{y_col} (Destra)", 'y2', mode, color, width, groups)
             
             # Annotazioni e Intersezioni (solo su y1)
             annotation_trace = au.get_annotations_trace(custom_points, is_3d=False) 
@@ -393,6 +531,12 @@ def show_plotting_ui(df):
                 
                 calculate_and_plot_intersections(fig, df, x_axis, ref_type, val1, val2, show_points, show_table)
 
+            if peak_settings is not None:
+                peaks_df = _add_peak_traces(fig, df, x_axis, y_axes_left, y_axes_right, groups, peak_settings)
+
+            if fit_settings is not None:
+                fit_df = _add_fit_traces(fig, df, x_axis, y_axes_left, groups, fit_settings)
+
 
         # ----------------------------------------------------
         # LOGICA 3D (Multi-Traccia con Dettagli Curva)
@@ -455,8 +599,7 @@ def show_plotting_ui(df):
                         except Exception:
                             st.warning(f"Asse colore '{color_axis}' non valido. Uso '{z_col}'.")
                     
-                    min_intensity = intensity_data.min()
-                    max_intensity = intensity_data.max()
+                    min_intensity, max_intensity = stats_utils.column_range(intensity_data)
 
                     fig.add_trace(go_trace_type(
                         x=df[x_col],
@@ -494,7 +637,10 @@ def show_plotting_ui(df):
             fig.update_layout(
                 title=plot_title,
                 showlegend=show_legend,
-                colorway=px.colors.qualitative.Plotly
+                colorway=px.colors.qualitative.Plotly,
+                # Stesso uirevision finché il dataset non cambia: con righe accodate ("segui file")
+                # Plotly aggiorna solo i dati e mantiene zoom, pan e tracce nascoste
+                uirevision=f"{st.session_state.get('dataset_revision', 0)}|{plot_type}"
             )
             
             # --- Configurazione Colore per Kaleido (Correzione) ---
@@ -528,12 +674,13 @@ def show_plotting_ui(df):
                     all_y_cols = [c['y'] for c in st.session_state.plot_3d_curves]
                     all_z_cols = [c['z'] for c in st.session_state.plot_3d_curves]
                     
-                    min_x = min(df[col].min() for col in all_x_cols)
-                    max_x = max(df[col].max() for col in all_x_cols)
-                    min_y = min(df[col].min() for col in all_y_cols)
-                    max_y = max(df[col].max() for col in all_y_cols)
-                    min_z = min(df[col].min() for col in all_z_cols)
-                    max_z = max(df[col].max() for col in all_z_cols)
+                    # Statistiche in cache per colonna: nessun ricalcolo ai rerun
+                    x_ranges = [stats_utils.column_range(df[col]) for col in all_x_cols]
+                    y_ranges = [stats_utils.column_range(df[col]) for col in all_y_cols]
+                    z_ranges = [stats_utils.column_range(df[col]) for col in all_z_cols]
+                    min_x, max_x = min(r[0] for r in x_ranges), max(r[1] for r in x_ranges)
+                    min_y, max_y = min(r[0] for r in y_ranges), max(r[1] for r in y_ranges)
+                    min_z, max_z = min(r[0] for r in z_ranges), max(r[1] for r in z_ranges)
                     
                     # Estendi i range per includere lo zero
                     plot_min_x = min(0, min_x)
@@ -636,6 +783,14 @@ def show_plotting_ui(df):
             config = {'displaylogo': False, 'modeBarButtonsToRemove': ['toImage']}
             st.plotly_chart(fig, use_container_width=True, config=config)
 
+            if peaks_df is not None:
+                st.subheader(f"Tabella dei Picchi ({len(peaks_df)})")
+                st.dataframe(peaks_df, use_container_width=True, hide_index=True)
+
+            if fit_df is not None:
+                st.subheader(f"Risultati del Fit ({len(fit_df)} curve)")
+                st.dataframe(fit_df, use_container_width=True, hide_index=True)
+
             export_utils.show_download_ui(fig, plot_title)
 
     except IndexError:
@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+# --- Pool di processi condiviso (import multi-file, fit in batch) ---
+# Un solo pool per tutto il server, dimensionato una volta sul numero di CPU e mai ricreato
+# per cambiare dimensione: ricrearlo annullerebbe i lavori in corso delle altre sessioni.
+# Il numero di processi scelto da una sessione limita solo quanti job ha in volo.
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+_lock = threading.Lock()
+_executor = None
+
+
+def get_executor():
+    """Pool condiviso, creato al primo uso e riutilizzato tra rerun e sessioni."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            # 'spawn' evita di duplicare i thread del server Streamlit con fork
+            _executor = ProcessPoolExecutor(max_workers=DEFAULT_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _discard(executor):
+    """Scarta un pool rotto (un worker è morto): il prossimo uso ne crea uno nuovo."""
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def run_jobs(func, jobs, max_workers=1):
+    """
+    func(job) per tutti i job, nell'ordine dei job. Con max_workers > 1 i job girano nel
+    pool condiviso con al più max_workers in volo per questa chiamata; con max_workers <= 1
+    (o un solo job) in serie nel processo corrente. Se il pool si rompe si ripiega sulla serie.
+    func deve essere importabile a livello di modulo (i processi sono avviati con 'spawn').
+    """
+    max_workers = min(max_workers, DEFAULT_WORKERS)
+    if max_workers <= 1 or len(jobs) < 2:
+        return [func(job) for job in jobs]
+
+    executor = get_executor()
+    results = [None] * len(jobs)
+    pending = {}
+    queue = iter(enumerate(jobs))
+    try:
+        for i, job in queue:
+            pending[executor.submit(func, job)] = i
+            if len(pending) >= max_workers:
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+                for i, job in queue:
+                    pending[executor.submit(func, job)] = i
+                    break
+    except BrokenProcessPool:
+        _discard(executor)
+        return [func(job) for job in jobs]
+    return results
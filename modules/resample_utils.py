@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from modules.parse_utils import SOURCE_COLUMN
+
+# --- Ricampionamento su una griglia di x comune ---
+# Curve con x diverse vengono portate sulla stessa griglia prima di sovrapporle o combinarle:
+# ogni metodo è un searchsorted/interp (o un bincount) sull'intera colonna, nessun ciclo sui punti.
+
+# Metodi: nome visualizzato -> chiave
+METHODS = {
+    "Lineare": 'linear',
+    "Punto più vicino": 'nearest',
+    "Media per intervallo": 'mean',
+}
+
+
+def uniform_grid(start, stop, points):
+    """Griglia uniforme di `points` valori tra start e stop (estremi inclusi)."""
+    points = int(points)
+    if points < 2:
+        raise ValueError("La griglia deve avere almeno 2 punti.")
+    if not stop > start:
+        raise ValueError("L'estremo finale della griglia deve essere maggiore di quello iniziale.")
+    return np.linspace(float(start), float(stop), points)
+
+
+def parse_grid(text):
+    """Griglia scritta dall'utente: numeri separati da virgole, spazi o a capo (ordinati)."""
+    try:
+        grid = np.array([float(v) for v in text.replace(';', ' ').replace(',', ' ').split()])
+    except ValueError:
+        raise ValueError("Griglia non valida: inserisci solo numeri separati da spazi o virgole.")
+    grid = np.unique(grid)
+    if len(grid) < 2:
+        raise ValueError("La griglia deve avere almeno 2 punti distinti.")
+    return grid
+
+
+def _sorted_xy(x, y):
+    """Coppie (x, y) valide ordinate per x (l'ordinamento si salta se x è già crescente)."""
+    valid = ~(np.isnan(x) | np.isnan(y))
+    if not valid.all():
+        x, y = x[valid], y[valid]
+    if len(x) > 1 and not (np.diff(x) >= 0).all():
+        order = np.argsort(x, kind='stable')
+        x, y = x[order], y[order]
+    return x, y
+
+
+def resample(x, y, grid, method='linear'):
+    """
+    Valori di y sulla griglia. Fuori dall'intervallo delle x (o in intervalli vuoti per la media)
+    il risultato è NaN: non si estrapola.
+      linear  - interpolazione lineare (np.interp)
+      nearest - valore del campione più vicino
+      mean    - media dei campioni nella cella di ogni punto (celle delimitate dai punti medi)
+    """
+    x, y = _sorted_xy(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    grid = np.asarray(grid, dtype=np.float64)
+    result = np.full(len(grid), np.nan)
+    if not len(x):
+        return result
+
+    if method == 'mean':
+        # Confini delle celle a metà tra punti consecutivi; prima e ultima cella di ampiezza simmetrica
+        middle = (grid[1:] + grid[:-1]) / 2
+        edges = np.concatenate(([2 * grid[0] - middle[0]], middle, [2 * grid[-1] - middle[-1]]))
+        cells = np.searchsorted(edges, x, side='right') - 1
+        inside = (cells >= 0) & (cells < len(grid))
+        counts = np.bincount(cells[inside], minlength=len(grid))
+        sums = np.bincount(cells[inside], weights=y[inside], minlength=len(grid))
+        np.divide(sums, counts, out=result, where=counts > 0)
+        return result
+
+    inside = (grid >= x[0]) & (grid <= x[-1])
+    if method == 'linear':
+        result[inside] = np.interp(grid[inside], x, y)
+    elif method == 'nearest':
+        targets = grid[inside]
+        right = np.clip(np.searchsorted(x, targets), 1, len(x) - 1) if len(x) > 1 else np.zeros(len(targets), int)
+        left = np.maximum(right - 1, 0)
+        nearest = np.where(targets - x[left] <= x[right] - targets, left, right)
+        result[inside] = y[nearest]
+    else:
+        raise ValueError(f"Metodo di ricampionamento sconosciuto: {method}")
+    return result
+
+
+def resample_frame(df, x, columns, grid, method='linear', by_source=False):
+    """
+    Nuovo DataFrame con la colonna x uguale alla griglia e le colonne indicate ricampionate.
+    Con by_source ogni file (colonna 'source') è ricampionato per conto suo e i risultati sono
+    impilati: tutti i file hanno le stesse x. Le altre colonne non vengono riportate.
+    """
+    missing = [c for c in [x] + list(columns) if c not in df.columns]
+    if missing:
+        raise ValueError(f"Colonne non trovate: {', '.join(map(str, missing))}")
+    not_numeric = [c for c in [x] + list(columns) if not pd.api.types.is_numeric_dtype(df[c])]
+    if not_numeric:
+        raise ValueError(f"Colonne non numeriche: {', '.join(map(str, not_numeric))}")
+    grid = np.asarray(grid, dtype=np.float64)
+
+    x_values = df[x].to_numpy(dtype=np.float64, na_value=np.nan)
+    y_values = {c: df[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in columns}
+    if not by_source or SOURCE_COLUMN not in df.columns:
+        return pd.DataFrame({x: grid, **{c: resample(x_values, y, grid, method) for c, y in y_values.items()}})
+
+    # Posizioni delle righe di ogni file (un solo passaggio sui codici della colonna source)
+    groups = df.groupby(SOURCE_COLUMN, observed=True, sort=False).indices
+    labels = list(groups)
+    result = {x: np.tile(grid, len(labels))}
+    for c, y in y_values.items():
+        result[c] = np.concatenate([resample(x_values[rows], y[rows], grid, method) for rows in groups.values()])
+    source = df[SOURCE_COLUMN]
+    codes = np.repeat(np.arange(len(labels)), len(grid))
+    if isinstance(source.dtype, pd.CategoricalDtype):
+        result[SOURCE_COLUMN] = pd.Categorical.from_codes(codes, categories=pd.Index(labels))
+    else:
+        result[SOURCE_COLUMN] = np.asarray(labels, dtype=object)[codes]
+    return pd.DataFrame(result)
+
+
+def describe_resample(x, columns, method, n_points):
+    names = {key: label for label, key in METHODS.items()}
+    return f"Ricampiona {len(columns)} colonne su {n_points} punti di '{x}' ({names.get(method, method).lower()})"
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+# --- Elaborazione di segnali/spettri per la calcolatrice ---
+# Tutte le funzioni ricevono e restituiscono array della stessa lunghezza della colonna,
+# così si possono usare direttamente nelle formule (es. `liscio = savgol(y, 21, 3)`).
+# Nessun ciclo Python sugli elementi: convoluzioni, cumsum, FFT e finestre mobili di pandas.
+
+
+def _as_float(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def _axis(x, n):
+    """Asse x come float (indice dei campioni se non indicato)."""
+    if x is None:
+        return np.arange(n, dtype=np.float64)
+    x = _as_float(x)
+    if x.shape != (n,):
+        raise ValueError("L'asse x deve avere la stessa lunghezza del segnale.")
+    return x
+
+
+def _window(window, n):
+    window = int(window)
+    if window < 1:
+        raise ValueError("La finestra deve essere di almeno 1 campione.")
+    return min(window, max(n, 1))
+
+
+def rolling_mean(y, window):
+    """Media mobile centrata (ai bordi la finestra si accorcia). O(n)."""
+    y = _as_float(y)
+    return pd.Series(y).rolling(_window(window, len(y)), center=True, min_periods=1).mean().to_numpy()
+
+
+def rolling_median(y, window):
+    """Mediana mobile centrata: robusta agli spike. O(n log w) (skiplist di pandas)."""
+    y = _as_float(y)
+    return pd.Series(y).rolling(_window(window, len(y)), center=True, min_periods=1).median().to_numpy()
+
+
+def savgol(y, window, polyorder=2, deriv=0, delta=1.0):
+    """
+    Filtro di Savitzky-Golay: polinomio di grado polyorder sui minimi quadrati in una
+    finestra mobile (dispari). deriv > 0 dà la derivata liscia (delta = passo dell'asse x).
+    Al centro è una convoluzione O(n·w); ai bordi si valuta il polinomio della prima/ultima finestra.
+    """
+    y = _as_float(y)
+    n = len(y)
+    window = int(window)
+    if window % 2 == 0:
+        window += 1
+    if window <= polyorder:
+        raise ValueError("savgol: la finestra deve essere più ampia del grado del polinomio.")
+    if n < window:
+        raise ValueError(f"savgol: servono almeno {window} campioni.")
+    half = window // 2
+    factor = np.prod(np.arange(1, deriv + 1), dtype=np.float64) / delta ** deriv
+
+    # Coefficienti: riga deriv della pseudo-inversa della matrice di Vandermonde centrata
+    offsets = np.arange(-half, half + 1, dtype=np.float64)
+    projection = np.linalg.pinv(np.vander(offsets, polyorder + 1, increasing=True))
+    coeffs = projection[deriv] * factor
+    result = np.convolve(y, coeffs[::-1], mode='same')
+
+    # Bordi: stesso polinomio adattato alla prima e all'ultima finestra completa
+    edge = np.arange(half, dtype=np.float64)
+    for segment, positions, target in (
+        (y[:window], edge - half, slice(0, half)),
+        (y[-window:], edge + 1, slice(n - half, n)),
+    ):
+        poly = np.polynomial.Polynomial(projection @ segment)
+        result[target] = poly.deriv(deriv)(positions) / delta ** deriv if deriv else poly(positions)
+    return result
+
+
+def gradient(y, x=None):
+    """Derivata dy/dx con differenze centrate (asse x anche non uniforme). O(n)."""
+    y = _as_float(y)
+    return np.gradient(y, _axis(x, len(y))) if len(y) > 1 else np.zeros_like(y)
+
+
+def cumtrapz(y, x=None):
+    """Integrale cumulativo con la regola dei trapezi (0 nel primo punto). O(n)."""
+    y = _as_float(y)
+    if len(y) == 0:
+        return y
+    x = _axis(x, len(y))
+    steps = (y[1:] + y[:-1]) * 0.5 * np.diff(x)
+    return np.concatenate(([0.0], np.cumsum(steps)))
+
+
+def fft_mag(y):
+    """
+    Modulo della FFT (normalizzato per n), con la frequenza zero al centro:
+    da abbinare a fft_freq(x) per il grafico dello spettro. O(n log n).
+    I NaN vengono trattati come zero.
+    """
+    y = np.nan_to_num(_as_float(y))
+    return np.fft.fftshift(np.abs(np.fft.fft(y))) / max(len(y), 1)
+
+
+def fft_freq(x):
+    """Asse delle frequenze per fft_mag (passo medio di x, frequenza zero al centro)."""
+    x = _as_float(x)
+    n = len(x)
+    step = (x[-1] - x[0]) / (n - 1) if n > 1 else 1.0
+    return np.fft.fftshift(np.fft.fftfreq(n, d=step if step else 1.0))
+
+
+def baseline(y, x=None, degree=2, iterations=100, tolerance=1e-3):
+    """
+    Linea di base polinomiale (metodo "modpoly"): si adatta un polinomio e si tagliano
+    iterativamente i punti sopra il polinomio (i picchi), finché la curva si stabilizza.
+    La fattorizzazione QR della matrice di Vandermonde si calcola una volta: ogni iterazione
+    costa due prodotti matrice-vettore O(n·grado).
+    """
+    y = _as_float(y)
+    x = _axis(x, len(y))
+    degree = int(degree)
+    valid = np.isfinite(y) & np.isfinite(x)
+    if valid.sum() <= degree:
+        raise ValueError("baseline: troppi pochi punti validi per il grado richiesto.")
+    # Asse riscalato in [-1, 1]: la matrice di Vandermonde resta ben condizionata
+    low, high = x[valid].min(), x[valid].max()
+    center, scale = (high + low) / 2, ((high - low) / 2) or 1.0
+    q, r = np.linalg.qr(np.vander((x[valid] - center) / scale, degree + 1, increasing=True))
+    work = y[valid].copy()
+    for _ in range(int(iterations)):
+        clipped = np.minimum(work, q @ (q.T @ work))
+        change = np.linalg.norm(clipped - work)
+        work = clipped
+        if change <= tolerance * np.linalg.norm(work):
+            break
+    coeffs = np.linalg.solve(r, q.T @ work)
+    return np.polynomial.polynomial.polyval((x - center) / scale, coeffs)
+
+
+def remove_baseline(y, x=None, degree=2, iterations=100):
+    """Segnale meno la sua linea di base polinomiale (vedi baseline)."""
+    return _as_float(y) - baseline(y, x, degree, iterations)
+
+
+# Funzioni esposte nelle formule della calcolatrice: nome -> funzione
+SIGNAL_FUNCTIONS = {
+    'rolling_mean': rolling_mean,
+    'rolling_median': rolling_median,
+    'savgol': savgol,
+    'gradient': gradient,
+    'derivative': gradient,
+    'cumtrapz': cumtrapz,
+    'fft_mag': fft_mag,
+    'fft_freq': fft_freq,
+    'baseline': baseline,
+    'remove_baseline': remove_baseline,
+}
+
+# Guida rapida mostrata nella calcolatrice
+SIGNAL_HELP = {
+    'rolling_mean(y, finestra)': "media mobile centrata",
+    'rolling_median(y, finestra)': "mediana mobile (toglie gli spike)",
+    'savgol(y, finestra, grado, deriv=0, delta=1)': "smoothing di Savitzky-Golay (o sua derivata)",
+    'gradient(y, x)': "derivata dy/dx (alias `derivative`)",
+    'cumtrapz(y, x)': "integrale cumulativo (trapezi)",
+    'fft_mag(y)` / `fft_freq(x)': "modulo della FFT e asse delle frequenze",
+    'remove_baseline(y, x, grado)': "sottrae la linea di base polinomiale (`baseline` la restituisce)",
+}
@@ -0,0 +1,157 @@
+import re
+import numpy as np
+import pandas as pd
+
+# --- Matrice spettrale: batch di spettri su un asse comune ---
+
+# Due assi sono "uguali" se differiscono meno di questa frazione del passo medio
+GRID_TOLERANCE = 0.01
+
+# np.trapz è stato rinominato in NumPy 2
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+
+def spectrum_column_names(labels):
+    """Nomi colonna per gli spettri: nome file senza estensione, ripulito e univoco."""
+    names = []
+    for label in labels:
+        stem = re.sub(r'\.[A-Za-z0-9]+$', '', str(label))
+        name = re.sub(r'[^A-Za-z0-9_]+', '', stem) or 'spettro'
+        candidate, k = name, 2
+        while candidate in names:
+            candidate = f"{name}_{k}"
+            k += 1
+        names.append(candidate)
+    return names
+
+
+def _same_grid(axis, reference, tolerance):
+    if len(axis) != len(reference):
+        return False
+    step = abs(reference[-1] - reference[0]) / max(len(reference) - 1, 1)
+    return bool(np.max(np.abs(axis - reference)) <= tolerance * step) if step > 0 else np.array_equal(axis, reference)
+
+
+class SpectralMatrix:
+    """
+    Batch di spettri in formato "largo": un solo asse (punti,) e una matrice
+    float64 contigua (spettri x punti). Le operazioni sull'intero batch
+    (normalizzazione, media, differenze) sono singole operazioni NumPy.
+    """
+
+    def __init__(self, axis, values, labels, axis_name='Wavenumber', interpolated=()):
+        self.axis = np.asarray(axis, dtype=np.float64)
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.labels = list(labels)
+        self.axis_name = axis_name
+        self.interpolated = list(interpolated)  # Etichette degli spettri ricampionati
+        self.column_names = spectrum_column_names(self.labels)
+
+    @property
+    def n_spectra(self):
+        return self.values.shape[0]
+
+    @property
+    def n_points(self):
+        return self.values.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.axis.nbytes
+
+    @classmethod
+    def from_spectra(cls, spectra, labels, axis_name='Wavenumber', tolerance=GRID_TOLERANCE):
+        """
+        spectra: lista di coppie (x, y). L'asse comune è quello del primo spettro,
+        ristretto all'intervallo coperto da tutti; gli spettri con griglia diversa
+        vengono interpolati linearmente su di esso.
+        """
+        prepared = []
+        for x, y in spectra:
+            x = np.asarray(x, dtype=np.float64)
+            y = np.asarray(y, dtype=np.float64)
+            if len(x) > 1 and x[0] > x[-1]:  # np.interp vuole un asse crescente
+                x, y = x[::-1], y[::-1]
+            prepared.append((x, y))
+
+        reference = prepared[0][0]
+        margin = tolerance * abs(reference[-1] - reference[0]) / max(len(reference) - 1, 1)
+        low = max(x[0] for x, _ in prepared) - margin
+        high = min(x[-1] for x, _ in prepared) + margin
+        if low > reference[0] or high < reference[-1]:
+            reference = reference[(reference >= low) & (reference <= high)]
+        if len(reference) < 2:
+            raise ValueError("Gli spettri non hanno un intervallo di numeri d'onda in comune")
+
+        values = np.empty((len(prepared), len(reference)), dtype=np.float64)
+        interpolated = []
+        for i, ((x, y), label) in enumerate(zip(prepared, labels)):
+            # Stessa griglia (eventualmente più estesa): basta una slice, niente interpolazione
+            start = int(np.searchsorted(x, reference[0] - margin))
+            if _same_grid(x[start:start + len(reference)], reference, tolerance):
+                values[i] = y[start:start + len(reference)]
+            else:
+                values[i] = np.interp(reference, x, y)
+                interpolated.append(label)
+        return cls(reference, values, labels, axis_name, interpolated)
+
+    @classmethod
+    def from_frame(cls, df, axis_name, columns, labels=None):
+        """Matrice dalle colonne di un DataFrame largo (nessuna copia se già contigue)."""
+        values = df[list(columns)].to_numpy(dtype=np.float64).T
+        matrix = cls(df[axis_name].to_numpy(dtype=np.float64), values, labels or columns, axis_name)
+        matrix.column_names = list(columns)
+        return matrix
+
+    def with_values(self, values):
+        """Stesso asse e stesse etichette, nuovi valori."""
+        matrix = SpectralMatrix(self.axis, values, self.labels, self.axis_name, self.interpolated)
+        matrix.column_names = list(self.column_names)
+        return matrix
+
+    def to_frame(self):
+        """
+        DataFrame largo: asse + una colonna per spettro.
+        Le colonne degli spettri condividono la memoria con self.values.
+        """
+        spectra = pd.DataFrame(self.values.T, columns=self.column_names, copy=False)
+        spectra.insert(0, self.axis_name, self.axis)
+        return spectra
+
+    def mean(self):
+        return self.values.mean(axis=0)
+
+    def std(self):
+        return self.values.std(axis=0, ddof=1) if self.n_spectra > 1 else np.zeros(self.n_points)
+
+    def normalize(self, method):
+        """Normalizza tutti gli spettri in una volta (vedi NORMALIZATIONS)."""
+        return self.with_values(NORMALIZATIONS[method](self.values, self.axis))
+
+    def subtract(self, reference):
+        """Differenza di ogni spettro rispetto a uno spettro di riferimento (broadcast)."""
+        return self.with_values(self.values - np.asarray(reference, dtype=np.float64)[np.newaxis, :])
+
+
+def _safe_divide(values, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return values / denominator
+
+
+# Normalizzazioni per riga (uno spettro = una riga): nome visualizzato -> funzione(values, axis)
+NORMALIZATIONS = {
+    "Massimo (y / max)": lambda v, x: _safe_divide(v, v.max(axis=1, keepdims=True)),
+    "Min-max (0-1)": lambda v, x: _safe_divide(v - v.min(axis=1, keepdims=True), np.ptp(v, axis=1, keepdims=True)),
+    "Area (integrale = 1)": lambda v, x: _safe_divide(v, np.abs(_trapezoid(v, x, axis=1))[:, np.newaxis]),
+    "Norma vettoriale (L2)": lambda v, x: _safe_divide(v, np.linalg.norm(v, axis=1, keepdims=True)),
+    "SNV (media 0, dev. std 1)": lambda v, x: _safe_divide(v - v.mean(axis=1, keepdims=True), v.std(axis=1, keepdims=True)),
+}
+
+
+def replace_spectra(df, matrix):
+    """
+    Sostituisce le colonne degli spettri di df con i valori della matrice
+    (stesso indice di df), lasciando invariate le altre colonne.
+    """
+    spectra = pd.DataFrame(matrix.values.T, index=df.index, columns=matrix.column_names, copy=False)
+    return pd.concat([df.drop(columns=matrix.column_names), spectra], axis=1)
@@ -0,0 +1,157 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from modules.cache_utils import column_token
+
+# --- Statistiche delle colonne calcolate una volta e riusate ---
+# min, max, media, deviazione standard, NaN, monotonia e istogramma in un solo passaggio a
+# blocchi (ogni blocco resta in cache della CPU). Il risultato è in cache per identità del
+# buffer della colonna: cambia solo se la colonna cambia, qualunque passo si faccia sulle altre.
+
+# Righe per blocco del passaggio unico
+CHUNK_ROWS = 65_536
+# Intervalli dell'istogramma "grezzo"
+HISTOGRAM_BINS = 32
+MAX_CACHED_STATS = 256
+
+
+class ColumnStats:
+    """Statistiche di una colonna. Per le colonne non numeriche solo count e nan_count."""
+
+    def __init__(self, count, nan_count, minimum=None, maximum=None, mean=None, std=None,
+                 increasing=False, decreasing=False, histogram=None):
+        self.count = count
+        self.nan_count = nan_count
+        self.min = minimum
+        self.max = maximum
+        self.mean = mean
+        self.std = std
+        self.increasing = increasing
+        self.decreasing = decreasing
+        self.histogram = histogram  # (conteggi, bordi) oppure None
+
+    @property
+    def numeric(self):
+        return self.min is not None
+
+    @property
+    def monotonic(self):
+        return self.increasing or self.decreasing
+
+
+def compute_stats(series, bins=HISTOGRAM_BINS, chunk_rows=CHUNK_ROWS):
+    """
+    Statistiche di una colonna in un passaggio a blocchi. Media e varianza si combinano tra
+    blocchi con la formula di Chan (stabile anche su milioni di righe). La monotonia, come in
+    pandas, è falsa se ci sono NaN. L'istogramma richiede min e max: è l'unico secondo passaggio.
+    """
+    n = len(series)
+    if not isinstance(series.dtype, np.dtype) or series.dtype.kind not in 'biuf':
+        return ColumnStats(n, int(series.isna().sum()))
+    values = series.to_numpy()
+
+    nan_count = 0
+    count, mean, m2 = 0, 0.0, 0.0
+    minimum, maximum = np.inf, -np.inf
+    increasing = decreasing = True
+    for start in range(0, n, chunk_rows):
+        chunk = values[start:start + chunk_rows].astype(np.float64, copy=False)
+        nan = np.isnan(chunk)
+        chunk_nan = int(np.count_nonzero(nan))
+        valid = chunk[~nan] if chunk_nan else chunk
+        nan_count += chunk_nan
+
+        if increasing or decreasing:
+            # Si include l'ultimo valore del blocco precedente per il confronto al confine
+            steps = np.diff(values[max(start - 1, 0):start + chunk_rows].astype(np.float64, copy=False))
+            increasing = increasing and not chunk_nan and bool((steps >= 0).all())
+            decreasing = decreasing and not chunk_nan and bool((steps <= 0).all())
+
+        k = len(valid)
+        if not k:
+            continue
+        minimum = min(minimum, float(valid.min()))
+        maximum = max(maximum, float(valid.max()))
+        chunk_mean = float(valid.mean())
+        chunk_m2 = float(np.square(valid - chunk_mean).sum())
+        delta = chunk_mean - mean
+        total = count + k
+        mean += delta * k / total
+        m2 += chunk_m2 + delta * delta * count * k / total
+        count = total
+
+    if not count:
+        return ColumnStats(n, nan_count)
+    histogram = None
+    if np.isfinite(minimum) and np.isfinite(maximum):
+        finite = values if not nan_count else values[~np.isnan(values)]
+        histogram = np.histogram(finite, bins=bins, range=(minimum, maximum if maximum > minimum else minimum + 1))
+    std = float(np.sqrt(m2 / (count - 1))) if count > 1 else 0.0
+    return ColumnStats(n, nan_count, minimum, maximum, mean, std, increasing, decreasing, histogram)
+
+
+def _root_array(series):
+    """Array NumPy che possiede il buffer della colonna (le viste puntano a lui)."""
+    array = series.to_numpy()
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+class _StatsCache:
+    """
+    Statistiche per identità del buffer della colonna (LRU, condivisa tra le sessioni).
+    Il buffer è tenuto con un riferimento debole: la cache non impedisce di liberare i dati,
+    e una voce il cui buffer è stato liberato (indirizzo riusabile) non viene più usata.
+    """
+
+    def __init__(self, max_items=MAX_CACHED_STATS):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, series):
+        token = column_token(series)
+        if token is None:
+            return compute_stats(series)
+        with self._lock:
+            item = self._items.get(token)
+            if item is not None and item[0]() is not None:
+                self._items.move_to_end(token)
+                self.hits += 1
+                return item[1]
+        self.misses += 1
+        stats = compute_stats(series)
+        try:
+            owner = weakref.ref(_root_array(series))
+        except TypeError:
+            return stats
+        with self._lock:
+            self._items[token] = (owner, stats)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return stats
+
+
+_stats_cache = _StatsCache()
+
+
+def column_stats(series):
+    """Statistiche della colonna (calcolate solo se la colonna è nuova o è cambiata)."""
+    return _stats_cache.get(series)
+
+
+def column_range(series):
+    """
+    (minimo, massimo) di una colonna: dalle statistiche in cache se è numerica,
+    altrimenti (date, testo) con min()/max() di pandas.
+    """
+    stats = column_stats(series)
+    if stats.numeric:
+        return stats.min, stats.max
+    return series.min(), series.max()
@@ -0,0 +1,97 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+from modules import filter_engine
+
+# --- Tabella paginata lato server ---
+# Al browser arriva solo la pagina visibile: l'ordinamento è una permutazione delle righe
+# calcolata una volta per colonna (e riusata cambiando pagina), la pagina un solo iloc.
+
+PAGE_SIZES = (50, 100, 500, 1000)
+DEFAULT_PAGE_SIZE = 100
+# Permutazioni conservate (LRU): ognuna occupa 8 byte per riga
+MAX_PERMUTATIONS = 8
+
+
+class _PermutationCache:
+    """
+    Permutazioni di ordinamento per (DataFrame, colonna, verso). Il DataFrame è tenuto
+    con un riferimento debole: quando la cronologia lo scarta, la voce non è più valida.
+    """
+
+    def __init__(self, max_items=MAX_PERMUTATIONS):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, df, column, ascending):
+        key = (id(df), column, ascending)
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0]() is df:
+                self._items.move_to_end(key)
+                return item[1]
+        order = _argsort(df[column], ascending)
+        with self._lock:
+            self._items[key] = (weakref.ref(df), order)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return order
+
+
+def _argsort(series, ascending):
+    """Posizioni delle righe in ordine (stabile); NaN sempre in fondo."""
+    # Colonne numeriche grandi: si riusa l'indice ordinato dei filtri, se già costruito lo è gratis
+    index = filter_engine.sorted_index(series)
+    if index is not None:
+        valid = index.sorter[:index.n_valid]
+        if not ascending:
+            valid = _descending(valid, index.sorted[:index.n_valid])
+        return np.concatenate((valid, index.nan()))
+    positions = series.reset_index(drop=True).sort_values(ascending=ascending, kind='stable', na_position='last')
+    return positions.index.to_numpy()
+
+
+def _descending(sorter, values):
+    """
+    Ordine decrescente stabile da quello crescente stabile (values = valori ordinati): si
+    invertono i gruppi di valori uguali, non le righe al loro interno. Tempo lineare.
+    """
+    if not len(sorter):
+        return sorter
+    starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+    lengths = np.diff(np.append(starts, len(values)))
+    starts, lengths = starts[::-1], lengths[::-1]
+    offsets = np.arange(len(values)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return sorter[np.repeat(starts, lengths) + offsets]
+
+
+_permutations = _PermutationCache()
+
+
+def sort_permutation(df, column, ascending=True):
+    """Permutazione che ordina df per una colonna (calcolata al primo uso, poi in cache)."""
+    return _permutations.get(df, column, ascending)
+
+
+def page_count(n_rows, page_size):
+    return max(1, -(-n_rows // page_size))
+
+
+def page_rows(df, page, page_size=DEFAULT_PAGE_SIZE, columns=None, sort_by=None, ascending=True):
+    """
+    Righe della pagina richiesta (numerata da 1), eventualmente ordinate e ristrette ad alcune
+    colonne. Si copiano solo page_size righe, qualunque sia la dimensione di df.
+    """
+    start = (page - 1) * page_size
+    stop = min(start + page_size, len(df))
+    if sort_by is None:
+        rows = slice(start, stop)
+    else:
+        rows = sort_permutation(df, sort_by, ascending)[start:stop]
+    if columns is None:
+        return df.iloc[rows]
+    return df.iloc[rows, [df.columns.get_loc(c) for c in columns]]
@@ -5,6 +5,7 @@ import sys
 import os
 import threading
 import subprocess
+import multiprocessing
 import requests  # Per scaricare il file
 
 # --- FIX (v25/v31): Importiamo tkinter per la finestra "Salva con nome" ---
@@ -32,6 +33,9 @@ def start_streamlit_server():
     
     os.chdir(resource_path('.')) 
     os.environ['STREAMLIT_SERVER_HEADLESS'] = 'true'
+    # Abilita l'apertura di file per percorso (modules/local_file_utils.py): solo qui
+    # server e finestra sono la stessa macchina, mai nel deployment Streamlit condiviso
+    os.environ['DATAPLOTTER_DESKTOP'] = '1'
     
     flag_options = {}
     flag_options['global.developmentMode'] = False
@@ -105,12 +109,30 @@ class Api:
     """
     Classe esposta a JavaScript.
     JS chiamerà pywebview.api.handle_download(url, filename)
+    e pywebview.api.pick_local_files() (importazione diretta da disco)
     """
     def handle_download(self, url, filename): # <-- Nome file aggiunto
         print(f"API Python chiamata da JS: {url}, Nome: {filename}")
         # Avvia il download "professionale" (con Tkinter) in un thread
         threading.Thread(target=download_in_thread, args=(url, filename), daemon=True).start()
 
+    def pick_local_files(self):
+        """
+        Chiamata dall'importer (pywebview.api.pick_local_files()).
+        Apre il dialogo nativo di apertura file e restituisce i percorsi scelti:
+        i file vengono poi letti direttamente dal disco, senza passare dall'upload HTTP.
+        """
+        print("API Python: selezione file locali richiesta da JS")
+        paths = window.create_file_dialog(
+            webview.OPEN_DIALOG,
+            allow_multiple=True,
+            file_types=(
+                "File di dati (*.csv;*.txt;*.xlsx;*.xls;*.asc;*.raw)",
+                "Tutti i file (*.*)",
+            ),
+        )
+        return list(paths or [])
+
 # Flag per assicurarci di iniettare lo script JS solo una volta
 js_injected = False
 
@@ -243,6 +265,10 @@ def start_main_app():
 
 # --- PUNTO DI INGRESSO GLOBALE ---
 if __name__ == '__main__':
+    # Necessario per il pool di processi dell'importer nell'eseguibile PyInstaller:
+    # i processi worker non devono rieseguire l'avvio dell'app
+    multiprocessing.freeze_support()
+
     # Questo controllo previene il loop infinito.
     if os.environ.get("AM_I_STREAMLIT_SERVER") == "true":
         start_streamlit_server()